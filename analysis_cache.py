@@ -0,0 +1,129 @@
+import atexit
+import copy
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from search_index import tokenize
+from ttl_cache import TTLCache
+
+# Memoized ResourceAgent.analyze_query results. Students re-ask the same
+# research-topic questions with small rewordings ("papers on graph neural
+# networks" / "Graph neural network papers?"), so entries are keyed on the
+# query's sorted content words. With ANALYSIS_CACHE_PATH set, entries are
+# also written to a JSON file and reloaded on the next start. The file is
+# written from a timer thread a few seconds after a store, so a burst of
+# stores costs one write and none of them block the event loop.
+
+ANALYSIS_CACHE_SIZE = int(os.environ.get("ANALYSIS_CACHE_SIZE", "1024"))
+ANALYSIS_CACHE_TTL = float(os.environ.get("ANALYSIS_CACHE_TTL", str(24 * 3600)))
+ANALYSIS_CACHE_PATH = os.environ.get("ANALYSIS_CACHE_PATH", "")
+ANALYSIS_CACHE_SAVE_DELAY = float(os.environ.get("ANALYSIS_CACHE_SAVE_DELAY", "5"))
+
+
+def analysis_key(query: str) -> str:
+    """Case-folded content words of the query, deduplicated and sorted."""
+    return " ".join(sorted(set(tokenize(query or ""))))
+
+
+class AnalysisCache(TTLCache):
+    def __init__(self, max_entries: int = ANALYSIS_CACHE_SIZE, ttl: float = ANALYSIS_CACHE_TTL,
+                 path: str = ANALYSIS_CACHE_PATH):
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self.path = path
+        self.file_lock = threading.Lock()
+        self.timer_lock = threading.Lock()
+        self.save_timer = None
+        self.loaded = False
+        if path:
+            atexit.register(self.flush)
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        key = analysis_key(query)
+        if not key:
+            return None
+        self.load()
+        analysis = self.get(key)
+        # Callers may fill in defaults, so each gets its own copy
+        return copy.deepcopy(analysis) if analysis is not None else None
+
+    def store(self, query: str, analysis: Dict[str, Any]):
+        key = analysis_key(query)
+        if not key or not analysis:
+            return
+        self.load()
+        self.set(key, copy.deepcopy(analysis))
+        self.schedule_save()
+
+    def load(self):
+        if self.loaded or not self.path:
+            return
+        with self.file_lock:
+            if self.loaded:
+                return
+            self.loaded = True
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    rows = json.load(f)
+            except FileNotFoundError:
+                return
+            except (OSError, ValueError) as e:
+                print(f"[ANALYSIS CACHE] Could not read {self.path}: {e}")
+                return
+            # Expiry is stored as wall-clock time and converted back to the
+            # monotonic clock the entries use in memory. A lowered TTL also
+            # applies to entries written before it changed.
+            now = time.time()
+            for key, expires_at, analysis in rows:
+                if expires_at > now:
+                    self.set(key, analysis, ttl=min(expires_at - now, self.ttl))
+            self.hits = self.misses = self.evictions = 0
+            print(f"[ANALYSIS CACHE] Loaded {len(self)} analyses from {self.path}")
+
+    def schedule_save(self):
+        if not self.path:
+            return
+        with self.timer_lock:
+            if self.save_timer is not None:
+                return
+            self.save_timer = threading.Timer(ANALYSIS_CACHE_SAVE_DELAY, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def flush(self):
+        """Write out stores still waiting for the timer."""
+        with self.timer_lock:
+            timer, self.save_timer = self.save_timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        offset = time.time() - time.monotonic()
+        with self.lock:
+            rows = [[key, expires_at + offset, analysis]
+                    for key, (expires_at, analysis) in self.entries.items()]
+        with self.file_lock:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # Written aside and renamed so a crash never leaves half a file
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(rows, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"[ANALYSIS CACHE] Could not write {self.path}: {e}")
+
+
+cache = AnalysisCache()
+
+
+def analysis_cache_stats() -> Dict[str, Any]:
+    return cache.stats()
@@ -1,24 +1,11 @@
 import gradio as gr
-import os
-from openai import AzureOpenAI
 from dotenv import load_dotenv
+from async_runtime import run_sync
+from llm import chat_completion
 
 # load env variables
 load_dotenv()
 
-# Azure OpenAI details
-endpoint = "https://gradgpt-openai.openai.azure.com/"
-deployment = "gradgpt-chat"
-api_version = "2024-12-01-preview"
-subscription_key = os.environ.get("Azure_API_Key")
-
-# Instantiate client
-client = AzureOpenAI(
-    api_version=api_version,
-    azure_endpoint=endpoint,
-    api_key=subscription_key,
-)
-
 # System message to define agent behavior
 SYSTEM_MESSAGE = (
     """os
@@ -40,14 +27,14 @@ def ask_assistant(user_message: str):
     """
     Method to ask the Azure OpenAI assistant a question, return response
     """
-    response = client.chat.completions.create(
-        messages=[
+    response = run_sync(chat_completion(
+        "ask_assistant",
+        [
             {"role": "system", "content": SYSTEM_MESSAGE},
             {"role": "user", "content": user_message},
         ],
-        max_completion_tokens=1024,
-        model=deployment
-    )
+        max_completion_tokens=1024
+    ))
     return response.choices[0].message.content
 
 
@@ -0,0 +1,133 @@
+import asyncio
+import contextvars
+import threading
+import weakref
+from concurrent.futures import Future, CancelledError
+
+# One long-lived event loop on a daemon thread serves every conversation.
+# Sync entry points (Gradio callbacks, scripts, tests) hand their coroutine
+# to this loop and wait for the result, so the async pipeline is shared no
+# matter who calls it. The caller's contextvars travel with the coroutine.
+
+runtime_loop = None
+runtime_thread = None
+runtime_lock = threading.Lock()
+
+
+def get_runtime_loop() -> asyncio.AbstractEventLoop:
+    global runtime_loop, runtime_thread
+    if runtime_loop is None:
+        with runtime_lock:
+            if runtime_loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="gradgpt-async-runtime", daemon=True
+                )
+                thread.start()
+                runtime_thread = thread
+                runtime_loop = loop
+    return runtime_loop
+
+
+def in_runtime_thread() -> bool:
+    return runtime_thread is not None and threading.current_thread() is runtime_thread
+
+
+def submit(coro, context=None) -> Future:
+    """Schedule a coroutine on the runtime loop and return a thread-safe future."""
+    loop = get_runtime_loop()
+    ctx = context if context is not None else contextvars.copy_context()
+    future = Future()
+
+    def start():
+        if not future.set_running_or_notify_cancel():
+            coro.close()
+            return
+        task = loop.create_task(coro, context=ctx)
+
+        def finish(t):
+            if t.cancelled():
+                future.set_exception(CancelledError())
+            elif t.exception() is not None:
+                future.set_exception(t.exception())
+            else:
+                future.set_result(t.result())
+
+        task.add_done_callback(finish)
+
+    loop.call_soon_threadsafe(start)
+    return future
+
+
+def run_sync(coro, context=None):
+    """Run a coroutine on the runtime loop from synchronous code."""
+    if in_runtime_thread():
+        coro.close()
+        raise RuntimeError(
+            "run_sync() was called from the async runtime thread; await the coroutine instead"
+        )
+    return submit(coro, context).result()
+
+
+async def run_in_runtime(coro):
+    """Await a coroutine on the runtime loop from another event loop."""
+    if in_runtime_thread():
+        return await coro
+    return await asyncio.wrap_future(submit(coro))
+
+
+async def _anext(agen):
+    return await agen.__anext__()
+
+
+def iterate_sync(agen):
+    """Drive an async generator on the runtime loop from a sync generator."""
+    ctx = contextvars.copy_context()
+    try:
+        while True:
+            try:
+                item = run_sync(_anext(agen), context=ctx)
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        run_sync(agen.aclose(), context=ctx)
+
+
+async def iterate_in_runtime(agen):
+    """Drive an async generator on the runtime loop from another event loop."""
+    if in_runtime_thread():
+        async for item in agen:
+            yield item
+        return
+    ctx = contextvars.copy_context()
+    try:
+        while True:
+            try:
+                item = await asyncio.wrap_future(submit(_anext(agen), ctx))
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        await asyncio.wrap_future(submit(agen.aclose(), ctx))
+
+
+def loop_local(factory):
+    """
+    Return a getter that builds one instance per running event loop.
+    Async HTTP clients bind their connection pools to the loop that first
+    uses them, so they must not be shared between loops.
+    """
+    instances = weakref.WeakKeyDictionary()
+    lock = threading.Lock()
+
+    def get():
+        loop = asyncio.get_running_loop()
+        with lock:
+            instance = instances.get(loop)
+            if instance is None:
+                instance = factory()
+                instances[loop] = instance
+        return instance
+
+    return get
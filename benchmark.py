@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import analysis_cache
+import coordinator
+import db
+import degree_agent
+import fast_router
+import llm
+import llm_usage
+import rate_limit
+import resource_agent
+import response_cache
+import scholarly_cache
+import speculation
+import tracing
+import turn_deadline
+from async_runtime import get_runtime_loop, run_sync
+from fakes import FakeLLMClient, FakeScholarlyHTTP, InMemorySupabase
+from resource_agent import RESOURCE_PIPELINES, ResourceAgent
+from single_flight import reset_single_flight_stats, single_flight_stats
+from ttl_cache import TTLCache
+
+# Offline end-to-end benchmark for process_message. Azure OpenAI, Supabase
+# and the scholarly search APIs are replaced by the fakes in fakes.py, a
+# query corpus is replayed at a fixed concurrency, and the report gives turn
+# latency percentiles, throughput and per-stage latency from the traces.
+#
+#   python benchmark.py --queries 200 --concurrency 16 --llm-latency 0.2
+#
+# --fail-above-p95-ms makes the run exit non-zero, for use as a CI gate.
+
+QUERY_CORPUS = [
+    "When is the thesis proposal form due?",
+    "How do I apply for graduation?",
+    "What forms do I need to submit before my defense?",
+    "Which machine learning courses can I take next quarter?",
+    "How many units of 500-level courses do I need?",
+    "What are the prerequisites for Advanced Deep Learning?",
+    "Can you recommend papers and datasets for my machine learning thesis?",
+    "What tools can I use to manage citations for my thesis?",
+    "Find me a survey paper on machine learning for research.",
+    "What classes should I take and when is the graduation application due?",
+    "I need research tools for my thesis and course suggestions for AI electives.",
+    "How do I petition to substitute a required course?",
+]
+
+
+class OfflineFakes:
+    def __init__(self, llm_client, supabase, http, trace_file):
+        self.llm = llm_client
+        self.supabase = supabase
+        self.http = http
+        self.trace_file = trace_file
+
+
+def new_trace_file() -> str:
+    with tempfile.NamedTemporaryFile(prefix="bench-traces-", suffix=".jsonl", delete=False) as f:
+        return f.name
+
+
+@contextlib.contextmanager
+def offline_environment(
+    llm_latency: float = 0.05,
+    llm_jitter: float = 0.0,
+    stream_delay: float = 0.0,
+    db_latency: float = 0.005,
+    http_latency: float = 0.05,
+    use_cache: bool = False,
+    fast_routing: bool = True,
+    speculate: bool = False,
+    rate_limits: bool = False,
+    turn_deadline_s: Optional[float] = None,
+    resource_pipeline: Optional[str] = None,
+    trace_file: Optional[str] = None,
+):
+    """Swap every external dependency for an in-process fake, restoring them afterwards."""
+    fake_llm = FakeLLMClient(latency=llm_latency, jitter=llm_jitter, stream_delay=stream_delay)
+    fake_db = InMemorySupabase(latency=db_latency)
+    sync_db = InMemorySupabase(is_async=False)
+    sync_db.tables = fake_db.tables
+    fake_http = FakeScholarlyHTTP(latency=http_latency)
+
+    async def download(self, url, provider=""):
+        return await fake_http.fetch(url, provider)
+
+    cache_ttl = response_cache.RESPONSE_CACHE_TTL if use_cache else 0
+    loop = get_runtime_loop()
+    saved = {
+        (llm, "get_client"): llm.get_client,
+        (db, "supabase"): db.supabase,
+        (ResourceAgent, "_download_async"): ResourceAgent._download_async,
+        (coordinator, "res_agent"): coordinator.res_agent,
+        (resource_agent, "RESOURCE_REFRESH_INTERVAL"): resource_agent.RESOURCE_REFRESH_INTERVAL,
+        (degree_agent, "KB_CACHE"): degree_agent.KB_CACHE,
+        (response_cache, "answer_cache"): response_cache.answer_cache,
+        (tracing, "TRACE_FILE"): tracing.TRACE_FILE,
+        (tracing, "TRACING_ENABLED"): tracing.TRACING_ENABLED,
+        (llm_usage, "ledger"): llm_usage.ledger,
+        (fast_router, "FAST_ROUTER_ENABLED"): fast_router.FAST_ROUTER_ENABLED,
+        (speculation, "SPECULATIVE_AGENTS"): speculation.SPECULATIVE_AGENTS,
+        (speculation, "stats"): speculation.stats,
+        (turn_deadline, "TURN_DEADLINE_SECONDS"): turn_deadline.TURN_DEADLINE_SECONDS,
+        (rate_limit, "RATE_LIMITS"): rate_limit.RATE_LIMITS,
+        (rate_limit, "limiters"): rate_limit.limiters,
+        (scholarly_cache, "cache"): scholarly_cache.cache,
+        (analysis_cache, "cache"): analysis_cache.cache,
+    }
+    saved_async_db = db.async_clients.get(loop)
+
+    llm.get_client = lambda: fake_llm
+    db.supabase = sync_db
+    db.async_clients[loop] = fake_db
+    ResourceAgent._download_async = download
+    # The fake agent's resources never change behind its back
+    resource_agent.RESOURCE_REFRESH_INTERVAL = 0
+    coordinator.res_agent = ResourceAgent(pipeline=resource_pipeline)
+    degree_agent.KB_CACHE = None
+    response_cache.answer_cache = TTLCache(ttl=cache_ttl)
+    tracing.TRACE_FILE = trace_file or new_trace_file()
+    tracing.TRACING_ENABLED = True
+    llm_usage.ledger = llm_usage.UsageLedger()
+    fast_router.FAST_ROUTER_ENABLED = fast_routing
+    speculation.SPECULATIVE_AGENTS = speculate
+    speculation.stats = speculation.SpeculationStats()
+    reset_single_flight_stats()
+    # Fresh buckets, or none at all so the fakes are not throttled
+    rate_limit.RATE_LIMITS = rate_limit.RATE_LIMITS if rate_limits else {}
+    rate_limit.limiters = {}
+    scholarly_cache.cache = scholarly_cache.ScholarlyCache(":memory:") if use_cache else None
+    analysis_cache.cache = analysis_cache.AnalysisCache(ttl=cache_ttl, path="")
+    if turn_deadline_s is not None:
+        turn_deadline.TURN_DEADLINE_SECONDS = turn_deadline_s
+    try:
+        yield OfflineFakes(fake_llm, fake_db, fake_http, tracing.TRACE_FILE)
+    finally:
+        for (owner, name), value in saved.items():
+            setattr(owner, name, value)
+        if saved_async_db is None:
+            db.async_clients.pop(loop, None)
+        else:
+            db.async_clients[loop] = saved_async_db
+
+
+async def replay_async(queries: List[str], concurrency: int, user_id=None) -> List[Dict[str, Any]]:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(index, query):
+        async with slots:
+            started = time.perf_counter()
+            error = None
+            try:
+                history = await coordinator.process_message_async(
+                    query, [], user_id=user_id, request_id=f"bench-{index}")
+                if not history or not history[-1].get("content"):
+                    error = "empty reply"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            return {
+                "query": query,
+                "latency_ms": (time.perf_counter() - started) * 1000,
+                "error": error,
+            }
+
+    return await asyncio.gather(*[one(i, q) for i, q in enumerate(queries)])
+
+
+def agent_errors(trace_file: str) -> int:
+    if not os.path.exists(trace_file):
+        return 0
+    with open(trace_file, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sum(1 for r in records if r["name"] == "agent" and r.get("error"))
+
+
+def run_benchmark(
+    num_queries: int = 48,
+    concurrency: int = 8,
+    corpus: Optional[List[str]] = None,
+    user_id=1,
+    verbose: bool = False,
+    **environment,
+) -> Dict[str, Any]:
+    corpus = corpus or QUERY_CORPUS
+    queries = [corpus[i % len(corpus)] for i in range(num_queries)]
+
+    with offline_environment(**environment) as fakes:
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            started = time.perf_counter()
+            results = run_sync(replay_async(queries, concurrency, user_id=user_id))
+            wall_s = time.perf_counter() - started
+
+        latencies = [r["latency_ms"] for r in results]
+        tracing.flush()
+        stages = tracing.summarize_traces(fakes.trace_file) if os.path.exists(fakes.trace_file) else {}
+        return {
+            "queries": num_queries,
+            "concurrency": concurrency,
+            "wall_s": round(wall_s, 3),
+            "throughput_qps": round(num_queries / wall_s, 2) if wall_s else 0.0,
+            "turn_p50_ms": round(tracing.percentile(latencies, 50), 1),
+            "turn_p95_ms": round(tracing.percentile(latencies, 95), 1),
+            "turn_p99_ms": round(tracing.percentile(latencies, 99), 1),
+            "errors": [r for r in results if r["error"]],
+            "agent_errors": agent_errors(fakes.trace_file),
+            "llm_calls": dict(fakes.llm.calls),
+            "supabase_queries": dict(fakes.supabase.queries),
+            "http_calls": dict(fakes.http.calls),
+            "tokens": llm_usage.usage_report("call_site"),
+            "speculation": speculation.speculation_stats(),
+            "single_flight": single_flight_stats(),
+            "analysis_cache": analysis_cache.analysis_cache_stats(),
+            "rate_limits": rate_limit.rate_limit_stats(),
+            "stages": stages,
+            "trace_file": fakes.trace_file,
+        }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"[BENCH] {report['queries']} queries at concurrency {report['concurrency']} "
+          f"in {report['wall_s']:.2f}s ({report['throughput_qps']:.2f} q/s)")
+    print(f"[BENCH] turn latency p50 {report['turn_p50_ms']:.1f} ms, "
+          f"p95 {report['turn_p95_ms']:.1f} ms, p99 {report['turn_p99_ms']:.1f} ms")
+    print(f"[BENCH] errors: {len(report['errors'])} turns, {report['agent_errors']} agent calls")
+    print(f"[BENCH] LLM calls: {report['llm_calls']}")
+    print(f"[BENCH] Supabase queries: {report['supabase_queries']}")
+    print(f"[BENCH] HTTP calls: {report['http_calls']}")
+    spec = report["speculation"]
+    if spec["started"]:
+        print(f"[BENCH] speculation: {spec['hits']}/{spec['started']} hits, "
+              f"~{spec['saved_ms_avg']:.0f} ms saved per hit")
+    for group, row in report["single_flight"].items():
+        if row["collapsed"]:
+            print(f"[BENCH] single-flight {group}: {row['collapsed']}/{row['calls']} calls collapsed")
+    analysis = report["analysis_cache"]
+    if analysis["hits"]:
+        print(f"[BENCH] analysis cache: {analysis['hits']}/{analysis['hits'] + analysis['misses']} "
+              f"analyses reused ({analysis['hit_rate']:.0%})")
+    for provider, row in report["rate_limits"].items():
+        print(f"[BENCH] rate limit {provider}: {row['acquired']} requests, "
+              f"{row['waited_s']:.2f}s spent waiting")
+    print()
+    print(f"{'stage':<45} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'tokens':>10}")
+    for stage, row in sorted(report["stages"].items(), key=lambda item: -item[1]["p95_ms"]):
+        print(
+            f"{stage:<45} {row['count']:>7} {row['p50_ms']:>10.1f} "
+            f"{row['p95_ms']:>10.1f} {row['tokens']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for process_message")
+    parser.add_argument("--queries", type=int, default=48)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per LLM call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--stream-delay", type=float, default=0.0, help="seconds per streamed word")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="seconds per Supabase query")
+    parser.add_argument("--http-latency", type=float, default=0.05, help="seconds per scholarly API call")
+    parser.add_argument("--cache", action="store_true", help="keep the answer and scholarly caches enabled")
+    parser.add_argument("--no-fast-router", action="store_true", help="send every turn to the LLM router")
+    parser.add_argument("--speculate", action="store_true", help="enable speculative agent execution")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="apply the scholarly providers' rate limits to the fake HTTP calls")
+    parser.add_argument("--turn-deadline", type=float, default=None, help="seconds per turn")
+    parser.add_argument("--resource-pipeline", choices=RESOURCE_PIPELINES, default=None)
+    parser.add_argument("--trace-file", default=None)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline logging")
+    parser.add_argument("--fail-above-p95-ms", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        num_queries=args.queries,
+        concurrency=args.concurrency,
+        verbose=args.verbose,
+        llm_latency=args.llm_latency,
+        llm_jitter=args.llm_jitter,
+        stream_delay=args.stream_delay,
+        db_latency=args.db_latency,
+        http_latency=args.http_latency,
+        use_cache=args.cache,
+        fast_routing=not args.no_fast_router,
+        speculate=args.speculate,
+        rate_limits=args.rate_limit,
+        turn_deadline_s=args.turn_deadline,
+        resource_pipeline=args.resource_pipeline,
+        trace_file=args.trace_file,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+
+    if report["errors"]:
+        return 1
+    if args.fail_above_p95_ms is not None and report["turn_p95_ms"] > args.fail_above_p95_ms:
+        print(f"[BENCH] p95 {report['turn_p95_ms']:.1f} ms is above {args.fail_above_p95_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
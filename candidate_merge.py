@@ -0,0 +1,112 @@
+import re
+import urllib.parse
+from typing import Any, Dict, List, Optional
+
+from search_index import normalize_phrase
+
+# Cross-source deduplication of resource candidates. The same paper often
+# comes back from arXiv, Semantic Scholar and Google Scholar and may also be
+# a local KnowledgeBase entry. Candidates that share a DOI, an arXiv id, a
+# URL or a normalized title are clustered, and each cluster becomes one
+# candidate built from its richest record.
+
+DOI_RE = re.compile(r"\b(10\.\d{4,9}/[^\s\"<>?#]+)", re.IGNORECASE)
+ARXIV_RE = re.compile(
+    r"arxiv\.org/(?:abs|pdf)/((?:\d{4}\.\d{4,5})|(?:[a-z\-]+(?:\.[a-z]{2})?/\d{7}))", re.IGNORECASE)
+
+# Shorter titles ("Overleaf", "Datasets") are too generic to merge on
+MIN_TITLE_WORDS = 3
+
+
+def doi_of(candidate: Dict[str, Any]) -> Optional[str]:
+    # Descriptions often cite other papers' DOIs, so only the record's own
+    # doi and link fields identify it
+    match = DOI_RE.search(f"{candidate.get('doi', '') or ''} {candidate.get('link', '') or ''}")
+    return match.group(1).rstrip(".").lower() if match else None
+
+
+def arxiv_id_of(candidate: Dict[str, Any]) -> Optional[str]:
+    match = ARXIV_RE.search(candidate.get("link", "") or "")
+    return match.group(1).lower() if match else None
+
+
+def normalize_url(url: str) -> Optional[str]:
+    if not url:
+        return None
+    parts = urllib.parse.urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    if not host:
+        return None
+    return f"{host}{path}" + (f"?{parts.query}" if parts.query else "")
+
+
+def identity_keys(candidate: Dict[str, Any]) -> List[str]:
+    keys = []
+    doi = doi_of(candidate)
+    if doi:
+        keys.append(f"doi:{doi}")
+    arxiv_id = arxiv_id_of(candidate)
+    if arxiv_id:
+        keys.append(f"arxiv:{arxiv_id}")
+    url = normalize_url(candidate.get("link", ""))
+    if url:
+        keys.append(f"url:{url}")
+    title = normalize_phrase(candidate.get("title", "") or "")
+    if len(title.split()) >= MIN_TITLE_WORDS:
+        keys.append(f"title:{title}")
+    return keys
+
+
+def richness(candidate: Dict[str, Any]):
+    return (len(candidate.get("description", "") or ""), bool(candidate.get("link")),
+            candidate.get("source") == "local")
+
+
+def merge_cluster(cluster: List[Dict[str, Any]]) -> Dict[str, Any]:
+    merged = dict(max(cluster, key=richness))
+    if not merged.get("link"):
+        merged["link"] = next((c["link"] for c in cluster if c.get("link")), "")
+    tags = []
+    for c in cluster:
+        tags.extend(t for t in c.get("tags", []) if t not in tags)
+    merged["tags"] = tags
+    merged["score"] = max(c.get("score", 0.0) or 0.0 for c in cluster)
+    sources = []
+    for c in cluster:
+        if c.get("source") and c["source"] not in sources:
+            sources.append(c["source"])
+    if len(sources) > 1:
+        merged["sources"] = sources
+    return merged
+
+
+def merge_candidates(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Collapse duplicates across sources, keeping the order in which each
+    resource first appeared.
+    """
+    parent = list(range(len(candidates)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: Dict[str, int] = {}
+    for i, candidate in enumerate(candidates):
+        for key in identity_keys(candidate):
+            if key in owner:
+                a, b = find(owner[key]), find(i)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+            else:
+                owner[key] = i
+
+    clusters: Dict[int, List[Dict[str, Any]]] = {}
+    for i, candidate in enumerate(candidates):
+        clusters.setdefault(find(i), []).append(candidate)
+    return [merge_cluster(clusters[root]) for root in sorted(clusters)]
@@ -0,0 +1,101 @@
+import os
+from typing import List, Dict, Any, Tuple
+
+from tokens import estimate_message_tokens, estimate_tokens, truncate_to_tokens
+
+# Builds the history sent to the routing call. The router only needs to know
+# what the student has been asking about, so recent turns are kept verbatim,
+# older turns collapse into a rolling summary of earlier questions, and long
+# assistant answers are cut down to their opening line.
+
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "1500"))
+
+# Number of most recent messages (user + assistant) kept verbatim
+RECENT_MESSAGES = int(os.environ.get("HISTORY_RECENT_MESSAGES", "6"))
+
+# Assistant answers longer than this are replaced by a short excerpt
+LONG_ANSWER_TOKENS = 150
+ANSWER_EXCERPT_TOKENS = 40
+
+# Each earlier question in the summary is cut to this length
+SUMMARY_QUESTION_TOKENS = 40
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content")
+    return content if isinstance(content, str) else str(content or "")
+
+
+def compact_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    text = message_text(message)
+    if message.get("role") == "assistant" and estimate_tokens(text) > LONG_ANSWER_TOKENS:
+        first_line = next((line for line in text.splitlines() if line.strip()), "")
+        excerpt = truncate_to_tokens(first_line, ANSWER_EXCERPT_TOKENS)
+        text = f"[Earlier answer omitted for brevity. It began: {excerpt}]"
+    return {"role": message.get("role"), "content": text}
+
+
+def summarize_messages(messages: List[Dict[str, Any]], budget: int) -> str:
+    """
+    Summarize older turns as the list of questions the student asked.
+    Newest questions are kept first when the budget runs out.
+    """
+    header = "Summary of earlier conversation. The student previously asked about:"
+    lines = []
+    used = estimate_tokens(header)
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            continue
+        line = "- " + truncate_to_tokens(message_text(message), SUMMARY_QUESTION_TOKENS)
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    if not lines:
+        return ""
+    return "\n".join([header] + list(reversed(lines)))
+
+
+def build_routing_history(
+    history: List[Dict[str, Any]], budget: int = HISTORY_TOKEN_BUDGET
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Fit the conversation into the routing token budget.
+    Returns the messages to send and a report of the prompt tokens saved.
+    """
+    history = history or []
+    original_tokens = estimate_message_tokens(
+        [{"content": message_text(m)} for m in history]
+    )
+
+    recent = [compact_message(m) for m in history[-RECENT_MESSAGES:]]
+    older = list(history[:-RECENT_MESSAGES]) if len(history) > RECENT_MESSAGES else []
+
+    # Move the oldest verbatim turns into the summary until they fit
+    while recent and estimate_message_tokens(recent) > budget:
+        older.append(recent.pop(0))
+
+    # Never start the verbatim window with an answer whose question was cut
+    while recent and recent[0].get("role") == "assistant":
+        older.append(recent.pop(0))
+
+    remaining = budget - estimate_message_tokens(recent)
+    summary = summarize_messages(older, remaining) if older else ""
+
+    messages = []
+    if summary:
+        messages.append({"role": "system", "content": summary})
+    messages.extend(recent)
+
+    sent_tokens = estimate_message_tokens(messages)
+    report = {
+        "original_tokens": original_tokens,
+        "sent_tokens": sent_tokens,
+        "saved_tokens": max(original_tokens - sent_tokens, 0),
+        "summarized_messages": len(older),
+    }
+    print(
+        f"[HISTORY] {len(history)} messages: ~{original_tokens} -> ~{sent_tokens} tokens "
+        f"(saved ~{report['saved_tokens']}, {len(older)} summarized)")
+    return messages, report
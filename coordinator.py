@@ -2,28 +2,103 @@
 
 import os
 import json
+import random
+import time
+import asyncio
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-from degree_agent import run_degree_planning_agent
-from deadlines_agent import run_forms_and_deadlines_agent
-from resource_agent import ResourceAgent
+from degree_agent import (
+    run_degree_planning_agent_async, load_user_context_async, get_kb_cache_async,
+    load_degree_inputs_async,
+)
+from deadlines_agent import run_forms_and_deadlines_agent_async, load_knowledge_base_from_supabase_async
+from resource_agent import ResourceAgent, warm_up_http
+from fast_router import fast_route, record_llm_route, router_stats, FAST_ROUTER_SHADOW_RATE
+import response_cache
+from conversation_history import build_routing_history
+from async_runtime import loop_local, run_sync, iterate_sync
+import llm
+from llm import chat_completion, stream_chat_completion
+from db import get_async_supabase
+from tracing import span, start_request
+from llm_usage import start_turn, set_agent
+from single_flight import single_flight_stats
+from analysis_cache import analysis_cache_stats
+import turn_deadline
+from turn_deadline import (
+    DeadlineExceeded, ROUTING_TIMEOUT_SECONDS, SYNTHESIS_RESERVE_SECONDS, stage_deadline, start_deadline,
+)
+from speculation import Speculation, speculation_stats, SPECULATIVE_AGENTS
 
 # Load environment variables
 load_dotenv()
 
+# Cheap to construct; resources load on first use or during warm-up
 res_agent = ResourceAgent()
 
-# Azure OpenAI Configuration
-endpoint = "https://gradgpt-openai.openai.azure.com/"
-deployment = "gradgpt-chat"
-api_version = "2024-12-01-preview"
-subscription_key = os.environ.get("Azure_API_Key")
+# Loaders the dashboard runs in the background once it is serving, so the
+# first questions do not pay for them
+WARM_UP_LOADERS = {
+    "supabase_client": get_async_supabase,
+    "llm_client": llm.warm_up,
+    "resource_agent_resources": res_agent.ensure_loaded_async,
+    "scholarly_http_client": warm_up_http,
+    "degree_agent_kb": get_kb_cache_async,
+}
 
-client = AzureOpenAI(
-    api_version=api_version,
-    azure_endpoint=endpoint,
-    api_key=subscription_key,
-)
+# Subqueries run concurrently, bounded across all conversations, so a
+# multi-intent turn takes about as long as its slowest agent instead of the
+# sum of all of them.
+MAX_AGENT_WORKERS = int(os.environ.get("MAX_AGENT_WORKERS", "8"))
+
+
+# Seconds each agent gets, measured from the moment the subqueries are
+# dispatched, so a quick agent is not allowed to run as long as a slow one.
+# Each is cut down to the time left before the synthesis reserve.
+AGENT_TIMEOUTS = {
+    "forms_agent": 12,
+    "degree_planning_agent": 20,
+    "resource_agent": 20,
+}
+DEFAULT_AGENT_TIMEOUT = 15
+
+
+def agent_time_limit():
+    """
+    Seconds the agents get together, measured from the moment the subqueries
+    are dispatched: the turn budget minus the synthesis reserve. Inside a
+    turn the binding bound is the time actually left before the reserve (see
+    turn_deadline.py), which is never more than this.
+    """
+    return max(turn_deadline.TURN_DEADLINE_SECONDS - SYNTHESIS_RESERVE_SECONDS, 0)
+
+# Single-agent turns skip the synthesis LLM call and render the agent's
+# answer directly; synthesis only runs when it merges several answers.
+SYNTHESIS_PASSTHROUGH = os.environ.get("SYNTHESIS_PASSTHROUGH", "1") == "1"
+
+# Agents whose answers are written for the student and can be shown as-is.
+# Degree planning answers carry raw course listings and the student's
+# profile block, which synthesis turns into prose.
+PASSTHROUGH_AGENTS = {"forms_agent", "resource_agent"}
+
+AGENT_LABELS = {
+    "forms_agent": "forms and deadlines",
+    "degree_planning_agent": "degree planning",
+    "resource_agent": "research resources",
+}
+
+# Loads each agent needs whatever the router decides, started early by
+# speculative execution. Each takes the user_id and returns what the
+# agent's run accepts as `prefetched`; none of them calls the LLM.
+PREFETCHERS = {
+    "forms_agent": lambda user_id: load_knowledge_base_from_supabase_async(),
+    "degree_planning_agent": load_degree_inputs_async,
+    "resource_agent": lambda user_id: res_agent.ensure_loaded_async(),
+}
+
+get_agent_slots = loop_local(lambda: asyncio.Semaphore(MAX_AGENT_WORKERS))
+
+# Background tasks (shadow routing) are kept referenced until they finish
+background_tasks = set()
 
 # =========================
 # SYSTEM PROMPTS
@@ -75,11 +150,42 @@ If the question is understandable and can be routed, output ONLY valid JSON in t
   "subqueries": [
     {
       "agent": "forms_agent | degree_planning_agent | resource_agent",
-      "query": "concise reformulation of the user's question"
+      "query": "concise reformulation of the user's question",
+      "params": { agent-specific parameters, see below }
     }
   ]
 }
 
+Agent parameters (include "params" on every subquery; the agent uses them
+instead of classifying the question again):
+
+degree_planning_agent:
+  {
+    "intent": "COURSE_ONLY" | "KB_ONLY" | "HYBRID",
+    "levels": ["400", "500"] | null,
+    "topic": string | null
+  }
+  - COURSE_ONLY: only asks for courses to take or about a specific course
+  - KB_ONLY: asks about policies, requirements, faculty, or procedures
+  - HYBRID: asks about courses AND policies/requirements
+  - levels are hundred-levels; null if none are mentioned
+  - topic is short (e.g. "Machine Learning"); null if none is mentioned
+
+forms_agent:
+  {"tags": ["2 to 7 short lowercase topic tags, e.g. thesis, deadlines, graduation"]}
+
+resource_agent:
+  {
+    "is_resource_request": true/false,
+    "user_needs": "short sentence",
+    "topics": ["topic1"],
+    "keywords": ["keyword1", "keyword2"],
+    "use_online": true/false,
+    "arxiv_query": "search string or empty",
+    "semantic_scholar_query": "search string or empty",
+    "google_scholar_query": "search string or empty"
+  }
+
 Rules for writing subqueries:
 - Keep the query concise.
 - Preserve the student's original intent.
@@ -132,26 +238,31 @@ Rules:
 """
 
 
-def ask_coordinator(user_message, history):
+async def ask_coordinator_async(user_message, history):
 
     messages = [{"role": "system", "content": SYSTEM_MESSAGE}]
 
-    # history is already in correct dict format
+    # Recent turns verbatim, older ones summarized, within the token budget
     if history:
-        messages.extend(history)
+        routing_history, _ = build_routing_history(history)
+        messages.extend(routing_history)
 
     messages.append({"role": "user", "content": user_message})
 
-    response = client.chat.completions.create(
-        messages=messages,
-        max_completion_tokens=8000,
-        model=deployment
+    response = await chat_completion(
+        "ask_coordinator",
+        messages,
+        max_completion_tokens=8000
     )
 
     return response.choices[0].message.content
 
 
-def synthesize_response(original_user_query, agent_responses):
+def ask_coordinator(user_message, history):
+    return run_sync(ask_coordinator_async(user_message, history))
+
+
+def build_synthesis_messages(original_user_query, agent_responses, missing=None):
 
     formatted_input = f"""
     The student asked:
@@ -166,12 +277,25 @@ def synthesize_response(original_user_query, agent_responses):
     Combine this information into a clear, organized response.
     """
 
-    response = client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": SYNTHESIS_SYSTEM_MESSAGE},
-            {"role": "user", "content": formatted_input},
-        ],
-        model=deployment,
+    if missing:
+        labels = ", ".join(AGENT_LABELS.get(agent, agent) for agent in missing)
+        formatted_input += f"""
+    Information about {labels} could not be gathered in time. Answer with
+    what is available, then add one short sentence saying which part is
+    missing and that the student can ask about it again.
+    """
+
+    return [
+        {"role": "system", "content": SYNTHESIS_SYSTEM_MESSAGE},
+        {"role": "user", "content": formatted_input},
+    ]
+
+
+async def synthesize_response_async(original_user_query, agent_responses, missing=None):
+
+    response = await chat_completion(
+        "synthesize_response",
+        build_synthesis_messages(original_user_query, agent_responses, missing),
         max_completion_tokens=8000
     )
 
@@ -180,92 +304,190 @@ def synthesize_response(original_user_query, agent_responses):
     return response.choices[0].message.content
 
 
+def synthesize_response(original_user_query, agent_responses, missing=None):
+    return run_sync(synthesize_response_async(original_user_query, agent_responses, missing))
+
+
+async def synthesize_response_stream_async(original_user_query, agent_responses, missing=None):
+    """
+    Streaming variant of synthesize_response.
+    Yields text deltas as the completion is generated.
+    """
+
+    async for delta in stream_chat_completion(
+        "synthesize_response_stream",
+        build_synthesis_messages(original_user_query, agent_responses, missing),
+        max_completion_tokens=8000
+    ):
+        yield delta
+
+
+def synthesize_response_stream(original_user_query, agent_responses, missing=None):
+    return iterate_sync(synthesize_response_stream_async(original_user_query, agent_responses, missing))
+
+
 # DELEGATION HANDLER
 
 
-def handle_delegation(parsed_json, original_query, user_id=None):
-    responses = []
-    print(
-        f"Handle Delegation with parsed json: {parsed_json} and OG query: {original_query}")
-    for sub in parsed_json["subqueries"]:
-        agent = sub["agent"]
-        query = sub["query"]
+def format_ranked_resources(structured):
+    ranked_resources = structured.get("ranked", [])
+    if not ranked_resources:
+        return structured.get("message", "No relevant resources found.")
+    lines = []
+    for i, r in enumerate(ranked_resources, start=1):
+        lines.append(
+            f"{i}. {r.get('title', 'Untitled')}\n"
+            f"   Link: {r.get('link', '')}\n"
+            f"   Source: {r.get('source', '')}\n"
+            f"   Why: {r.get('why', '')}"
+        )
+    return "\n".join(lines)
+
+
+def format_resources_for_chat(structured):
+    return structured.get("message") or "No relevant resources found."
+
+
+# Agents whose results are not already text. Synthesis input is plain text
+# for the LLM; chat output is the markdown shown to the student.
+SYNTHESIS_FORMATTERS = {"resource_agent": format_ranked_resources}
+CHAT_FORMATTERS = {"resource_agent": format_resources_for_chat}
+
+
+def format_agent_response(agent, result, formatters):
+    # Notes about failed agents are already text
+    if isinstance(result, str):
+        return result
+    return formatters.get(agent, str)(result)
+
+
+def combine_responses(responses):
+    """Text of every agent's answer, in subquery order, for synthesis."""
+    return "\n\n".join(
+        format_agent_response(agent, result, SYNTHESIS_FORMATTERS) for agent, result in responses)
 
+
+def passthrough_response(responses):
+    """The reply for a single-agent turn, or None when synthesis is needed."""
+    if not SYNTHESIS_PASSTHROUGH or len(responses) != 1:
+        return None
+    agent, result = responses[0]
+    if agent not in PASSTHROUGH_AGENTS:
+        return None
+    return format_agent_response(agent, result, CHAT_FORMATTERS)
+
+
+async def run_subquery_async(agent, query, user_id=None, prefetched=None, params=None):
+    # params are the agent-specific parameters from the coordinator's routing
+    # call; agents fall back to classifying the query themselves without them
+    set_agent(agent)
+    with span("agent", agent=agent, prefetched=prefetched is not None, params=params is not None):
         if agent == "forms_agent":
-            response = run_forms_and_deadlines_agent(query)
-
-        elif agent == "degree_planning_agent":
-            response = run_degree_planning_agent(
-                query, user_id=user_id)  # pass user_id here
-
-        elif agent == "resource_agent":
-            #
-            structured = res_agent.run_structured(query)
-            ranked_resources = structured.get("ranked", [])
-            if ranked_resources:
-                lines = []
-                for i, r in enumerate(ranked_resources, start=1):
-                    lines.append(
-                        f"{i}. {r.get('title', 'Untitled')}\n"
-                        f"   Link: {r.get('link', '')}\n"
-                        f"   Source: {r.get('source', '')}\n"
-                        f"   Why: {r.get('why', '')}"
-                    )
-                response = "\n".join(lines)
-            else:
-                response = structured.get(
-                    "message", "No relevant resources found.")
+            return await run_forms_and_deadlines_agent_async(
+                query, prefetched=prefetched, params=params)
 
-        else:
-            response = "Unknown agent."
+        if agent == "degree_planning_agent":
+            return await run_degree_planning_agent_async(
+                query, user_id=user_id, prefetched=prefetched, params=params)  # pass user_id here
 
-        responses.append(response)
-    print(f"Combined Responses: {responses}")
+        if agent == "resource_agent":
+            # Its prefetch loads the resource list the agent keeps
+            return await res_agent.run_structured_async(query, params=params)
 
-    combined = "\n\n".join(responses)
+        return "Unknown agent."
 
-    return synthesize_response(original_query, combined)
 
+def unavailable_response(agent, reason):
+    label = AGENT_LABELS.get(agent, "this topic")
+    return f"(Information about {label} is unavailable right now: {reason}.)"
+
+
+async def run_bounded_subquery_async(agent, query, user_id=None, speculation=None, params=None):
+    async with get_agent_slots():
+        prefetched = await speculation.take(agent) if speculation is not None else None
+        return await run_subquery_async(
+            agent, query, user_id=user_id, prefetched=prefetched, params=params)
 
-# MAIN entry
 
+async def run_timed_subquery_async(agent, query, timeout, **kwargs):
+    # The agent's own deadline, so its LLM, HTTP and Supabase calls are cut
+    # short along with it
+    with stage_deadline(limit=timeout):
+        return await asyncio.wait_for(
+            run_bounded_subquery_async(agent, query, **kwargs), timeout=timeout)
 
-def process_message(user_message, history, user_id=None):
+
+async def gather_agent_responses_async(parsed_json, original_query, user_id=None, speculation=None):
     """
-    Main function to be called by Gradio UI.
-    Returns updated history list.
+    Run every subquery and return ([(agent, result)], agents that failed).
+    Results are whatever the agent returns; failed agents get a text note.
     """
+    print(
+        f"Handle Delegation with parsed json: {parsed_json} and OG query: {original_query}")
 
-    if history is None:
-        history = []
+    started = time.monotonic()
+    agents = [sub["agent"] for sub in parsed_json["subqueries"]]
+    # Outside a turn (e.g. handle_delegation) the limit alone applies
+    with stage_deadline(reserve=SYNTHESIS_RESERVE_SECONDS, limit=agent_time_limit()) as remaining:
+        timeouts = [round(min(AGENT_TIMEOUTS.get(agent, DEFAULT_AGENT_TIMEOUT), remaining), 2)
+                    for agent in agents]
+        # Timeouts start at dispatch, so time spent waiting for a slot counts too
+        results = await asyncio.gather(
+            *[
+                run_timed_subquery_async(
+                    sub["agent"], sub["query"], timeout, user_id=user_id,
+                    speculation=speculation, params=sub.get("params"))
+                for sub, timeout in zip(parsed_json["subqueries"], timeouts)
+            ],
+            return_exceptions=True,
+        )
+
+    # Results come back in the original subquery order; a timeout or crash in
+    # one agent only replaces that agent's answer with a note.
+    responses = []
+    failed = []
+    for agent, timeout, result in zip(agents, timeouts, results):
+        if isinstance(result, TimeoutError):
+            print(f"[DELEGATION] {agent} missed its deadline of {timeout}s")
+            result = unavailable_response(agent, "it did not finish in time")
+            failed.append(agent)
+        elif isinstance(result, BaseException):
+            print(f"[DELEGATION] {agent} failed: {type(result).__name__}: {result}")
+            result = unavailable_response(agent, "an internal error occurred")
+            failed.append(agent)
+        responses.append((agent, result))
 
-    assistant_response = ask_coordinator(user_message, history)
+    print(
+        f"[DELEGATION] {len(agents)} subqueries finished in {time.monotonic() - started:.2f}s")
+    print(f"Combined Responses: {responses}")
 
-    # Append user message first
-    history.append({"role": "user", "content": user_message})
+    return responses, failed
 
-    # Try parsing JSON to see if delegation is required
-    delegated_agents = []
 
-    try:
-        parsed = json.loads(assistant_response)
+def gather_agent_responses(parsed_json, original_query, user_id=None):
+    return run_sync(gather_agent_responses_async(parsed_json, original_query, user_id=user_id))
 
-        if parsed.get("delegate") is True:
-            delegated_agents = [sub["agent"]
-                                for sub in parsed.get("subqueries", [])]
 
-            final_response = handle_delegation(
-                parsed, user_message, user_id=user_id
-            )
+async def handle_delegation_async(parsed_json, original_query, user_id=None):
+    responses, failed = await gather_agent_responses_async(
+        parsed_json, original_query, user_id=user_id)
 
-            history.append({"role": "assistant", "content": final_response})
+    reply = passthrough_response(responses)
+    if reply is not None:
+        return reply
+
+    return await synthesize_response_async(
+        original_query, combine_responses(responses), missing=failed)
+
+
+def handle_delegation(parsed_json, original_query, user_id=None):
+    return run_sync(handle_delegation_async(parsed_json, original_query, user_id=user_id))
+
+
+# MAIN entry
 
-        else:
-            history.append(
-                {"role": "assistant", "content": assistant_response})
 
-    except json.JSONDecodeError:
-        history.append({"role": "assistant", "content": assistant_response})
+def print_routing_banner(user_message, delegated_agents, request_id=None):
 
     # Output for coordinator routing testing
 
@@ -273,6 +495,7 @@ def process_message(user_message, history, user_id=None):
     print("==============================================================")
     print("============== GRAD-GPT COORDINATOR ROUTING ====================")
     print("==============================================================")
+    print(f"REQUEST ID: {request_id}")
     print("USER MESSAGE:")
     print(user_message)
     print("--------------------------------------------------------------")
@@ -284,7 +507,194 @@ def process_message(user_message, history, user_id=None):
     else:
         print("AGENTS DELEGATED TO: NONE (coordinator handled or clarifying)")
 
+    fast = router_stats()
+    print(
+        f"FAST ROUTER: hit rate {fast['hit_rate']:.0%} over {fast['total']} turns, "
+        f"LLM agreement {fast['agreement']:.0%} over {fast['compared']} compared")
+    if SPECULATIVE_AGENTS:
+        spec = speculation_stats()
+        print(
+            f"SPECULATION: hit rate {spec['hit_rate']:.0%} over {spec['started']} started, "
+            f"~{spec['saved_ms_avg']:.0f} ms saved per hit")
+    collapsed = ", ".join(
+        f"{group} {row['collapsed']}/{row['calls']}" for group, row in single_flight_stats().items())
+    print(f"SINGLE-FLIGHT COLLAPSED: {collapsed}")
+    analysis = analysis_cache_stats()
+    print(f"ANALYSIS CACHE: hit rate {analysis['hit_rate']:.0%} over "
+          f"{analysis['hits'] + analysis['misses']} lookups, {analysis['entries']} entries")
     print("==============================================================")
     print("\n" * 5)
 
+
+def parse_routing(assistant_response):
+    # Try parsing JSON to see if delegation is required
+    try:
+        return json.loads(assistant_response)
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+
+async def shadow_route_async(prediction, user_message, history):
+    try:
+        record_llm_route(prediction, parse_routing(
+            await ask_coordinator_async(user_message, history)))
+    except Exception as e:
+        print(f"[FAST ROUTER] Shadow routing failed: {e}")
+
+
+async def route_message_async(user_message, history, speculation=None):
+    """
+    Decide where a message goes.
+    Clearly routable questions are answered by the local fast router and the
+    rest go to the LLM coordinator. Returns (parsed routing JSON or None, raw reply).
+    """
+    with span("route") as s:
+        prediction = fast_route(user_message, history)
+
+        if prediction["parsed"] is not None:
+            s.set(method="fast_router")
+            if random.random() < FAST_ROUTER_SHADOW_RATE:
+                task = asyncio.create_task(
+                    shadow_route_async(prediction, user_message, list(history)))
+                background_tasks.add(task)
+                task.add_done_callback(background_tasks.discard)
+            return prediction["parsed"], json.dumps(prediction["parsed"])
+
+        s.set(method="llm")
+        if speculation is not None:
+            speculation.start(prediction)
+        assistant_response = await ask_coordinator_async(user_message, history)
+        parsed = parse_routing(assistant_response)
+        record_llm_route(prediction, parsed)
+
+        return parsed, assistant_response
+
+
+def route_message(user_message, history):
+    return run_sync(route_message_async(user_message, history))
+
+
+async def cache_key_for_async(user_message, history, parsed, user_id=None):
+    # Any turn with history may lean on it ("what about for BMS students?")
+    # in ways the key cannot capture, so only first turns are cached
+    if history:
+        return None
+
+    user = None
+    if user_id and response_cache.needs_profile(parsed):
+        user = await load_user_context_async(user_id)
+
+    return response_cache.answer_key(user_message, parsed, user)
+
+
+async def process_message_stream_async(user_message, history, user_id=None, request_id=None):
+    """
+    Streaming entry point for the Gradio UI.
+    Yields the updated history list each time the assistant reply grows,
+    so the chat can render synthesis tokens as they arrive.
+    """
+
+    if history is None:
+        history = []
+
+    request_id = start_request(request_id)
+    budget = start_turn(user_id)
+    start_deadline()
+
+    with span("turn", user_id=user_id) as turn, Speculation(PREFETCHERS, user_id) as speculation:
+        # Routing gets its own share, and like the agents has to leave time
+        # for synthesis
+        with stage_deadline(reserve=SYNTHESIS_RESERVE_SECONDS, limit=ROUTING_TIMEOUT_SECONDS):
+            parsed, assistant_response = await route_message_async(
+                user_message, history, speculation=speculation)
+
+        # Append user message first
+        history.append({"role": "user", "content": user_message})
+
+        delegated_agents = []
+
+        if isinstance(parsed, dict) and parsed.get("delegate") is True:
+            delegated_agents = [sub["agent"]
+                                for sub in parsed.get("subqueries", [])]
+            turn.set(agents=delegated_agents)
+            print_routing_banner(user_message, delegated_agents, request_id)
+
+            key = await cache_key_for_async(
+                user_message, history[:-1], parsed, user_id=user_id)
+            cached = response_cache.get_answer(key) if key else None
+            if cached is not None:
+                turn.set(cache_hit=True, tokens=budget.used)
+                history.append({"role": "assistant", "content": cached})
+                yield history
+                return
+
+            responses, failed = await gather_agent_responses_async(
+                parsed, user_message, user_id=user_id, speculation=speculation)
+            speculation.discard()
+            if failed:
+                turn.set(missing=failed)
+
+            cut_off = False
+            partial = passthrough_response(responses)
+            if partial is not None:
+                turn.set(synthesis="passthrough")
+                history.append({"role": "assistant", "content": partial})
+                yield history
+            else:
+                # Synthesis runs on whatever arrived, noting what is missing
+                history.append({"role": "assistant", "content": ""})
+                partial = ""
+                try:
+                    async for delta in synthesize_response_stream_async(
+                            user_message, combine_responses(responses), missing=failed):
+                        partial += delta
+                        history[-1] = {"role": "assistant", "content": partial}
+                        yield history
+                except DeadlineExceeded as e:
+                    # The student keeps what was streamed before the deadline
+                    print(f"[SYNTHESIS] {e}")
+                    turn.set(synthesis="cut_off")
+                    cut_off = True
+
+                if not partial:
+                    yield history
+
+            # Incomplete answers are not worth reusing
+            if key and not failed and not cut_off:
+                response_cache.store_answer(key, partial)
+
+        else:
+            print_routing_banner(user_message, delegated_agents, request_id)
+            history.append({"role": "assistant", "content": assistant_response})
+            yield history
+
+        turn.set(tokens=budget.used)
+        print(f"[USAGE] Turn used {budget.used}/{budget.limit} tokens")
+
+
+def process_message_stream(user_message, history, user_id=None, request_id=None):
+    return iterate_sync(process_message_stream_async(
+        user_message, history, user_id=user_id, request_id=request_id))
+
+
+async def process_message_async(user_message, history, user_id=None, request_id=None):
+    """
+    Async entry point for a whole turn.
+    Returns updated history list.
+    """
+
+    async for history in process_message_stream_async(
+            user_message, history, user_id=user_id, request_id=request_id):
+        pass
+
     return history
+
+
+def process_message(user_message, history, user_id=None, request_id=None):
+    """
+    Main function to be called by Gradio UI.
+    Returns updated history list.
+    """
+
+    return run_sync(process_message_async(
+        user_message, history, user_id=user_id, request_id=request_id))
@@ -1,10 +1,59 @@
+import asyncio
 import os
-from supabase import create_client
+import weakref
+from supabase import create_client, acreate_client, AsyncClient
 from dotenv import load_dotenv
 
+from single_flight import stable_key, supabase_flight
+from tracing import span
+from turn_deadline import time_allowance
+
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Seconds a read may take when no turn deadline is shorter
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", "15"))
+
+# Async clients are created lazily, one per event loop
+async_clients = weakref.WeakKeyDictionary()
+
+
+async def get_async_supabase() -> AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = async_clients.get(loop)
+    if client is None:
+        client = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+        async_clients[loop] = client
+    return client
+
+
+async def select_async(table, columns="*", eq=None, contains=None, gte=None, single=False,
+                       call_site=None):
+    """
+    Read rows from a table. eq, contains and gte map column names to filter
+    values. Concurrent reads with the same table and filters share one query.
+    """
+    async def query():
+        client = await get_async_supabase()
+        with span("supabase", table=table, call_site=call_site) as s:
+            request = client.table(table).select(columns)
+            for column, value in (eq or {}).items():
+                request = request.eq(column, value)
+            for column, value in (contains or {}).items():
+                request = request.contains(column, value)
+            for column, value in (gte or {}).items():
+                request = request.gte(column, value)
+            if single:
+                request = request.single()
+            timeout = time_allowance(SUPABASE_TIMEOUT, f"{table} read")
+            response = await asyncio.wait_for(request.execute(), timeout=timeout)
+            data = response.data
+            s.set(rows=1 if single and data else len(data or []))
+            return data
+
+    key = stable_key(table, columns, eq, contains, gte, single)
+    return await supabase_flight.do(key, query)
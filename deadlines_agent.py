@@ -1,29 +1,14 @@
-import gradio as gr
 import json
-import os
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-from supabase import create_client, Client
+from async_runtime import run_sync
+from llm import chat_completion
+from db import select_async
+from llm_usage import context_allowance, SYNTHESIS_RESERVE_TOKENS
+from tokens import CHARS_PER_TOKEN
 
 
 load_dotenv()
 
-endpoint = "https://gradgpt-openai.openai.azure.com/"
-deployment = "gradgpt-chat"
-api_version = "2024-12-01-preview"
-subscription_key = os.environ.get("Azure_API_Key")
-
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-
-supabase: Client = create_client(supabase_url, supabase_key)
-
-client = AzureOpenAI(
-    api_version=api_version,
-    azure_endpoint=endpoint,
-    api_key=subscription_key,
-)
-
 TAG_EXTRACTION_PROMPT = """
 You are an academic advisor assistant for Cal Poly Computer Science MS and BMS students.
 
@@ -71,19 +56,18 @@ KNOWLEDGE BASE (use only this information to answer):
 """
 
 
-def load_knowledge_base_from_supabase():
-    response = (
-        supabase
-        .table("KnowledgeBase")
-        .select("*")
-        .contains("agentIds", ["4"])  # 4 = "forms and deadlines agent"
-        .execute()
-    )
+async def load_knowledge_base_from_supabase_async():
+    # 4 = "forms and deadlines agent"
+    data = await select_async("KnowledgeBase", contains={"agentIds": ["4"]})
 
-    if response.data is None:
+    if data is None:
         return []
 
-    return response.data
+    return data
+
+
+def load_knowledge_base_from_supabase():
+    return run_sync(load_knowledge_base_from_supabase_async())
 
 
 def extract_all_tags(chunks):
@@ -94,29 +78,37 @@ def extract_all_tags(chunks):
     return sorted(tag_set)
 
 
-def azure_chat(system_message, user_message):
-    response = client.chat.completions.create(
-        model=deployment,
-        messages=[
+ANSWER_COMPLETION_TOKENS = 2048
+
+
+async def azure_chat_async(system_message, user_message, call_site="azure_chat"):
+    response = await chat_completion(
+        call_site,
+        [
             {"role": "system", "content": system_message},
             {"role": "user", "content": user_message},
         ],
         # changed from 1024 to 2048 for better handling of longer contexts
-        max_completion_tokens=2048,
+        max_completion_tokens=ANSWER_COMPLETION_TOKENS,
     )
 
     return response.choices[0].message.content
 
 
-def extract_relevant_tags(query, all_tags):
+def azure_chat(system_message, user_message, call_site="azure_chat"):
+    return run_sync(azure_chat_async(system_message, user_message, call_site))
+
+
+async def extract_relevant_tags_async(query, all_tags):
     prompt = TAG_EXTRACTION_PROMPT.format(
         query=query,
         available_tags=", ".join(all_tags)
     )
 
-    raw = azure_chat(
+    raw = await azure_chat_async(
         system_message="You extract structured JSON only.",
-        user_message=prompt
+        user_message=prompt,
+        call_site="extract_relevant_tags"
     )
 
     raw = raw.strip().replace("```json", "").replace("```", "").strip()
@@ -128,6 +120,16 @@ def extract_relevant_tags(query, all_tags):
         return []
 
 
+def extract_relevant_tags(query, all_tags):
+    return run_sync(extract_relevant_tags_async(query, all_tags))
+
+
+def match_known_tags(tags, all_tags):
+    """Tags suggested by the coordinator that exist in the knowledge base."""
+    known = set(all_tags)
+    return [t.lower() for t in tags or [] if isinstance(t, str) and t.lower() in known]
+
+
 def filter_chunks(chunks, selected_tags, limit=8):
     if not selected_tags:
         return chunks[:limit]
@@ -145,8 +147,12 @@ def filter_chunks(chunks, selected_tags, limit=8):
     return [chunk for _, chunk in scored[:limit]]
 
 
+# Default knowledge context size, trimmed when the turn's token budget runs low
+KNOWLEDGE_CONTEXT_TOKENS = 1000
+
+
 # Converting chunks into easier to read sections
-def build_knowledge_context(chunks, max_chars=4000):
+def build_knowledge_context(chunks, max_chars=KNOWLEDGE_CONTEXT_TOKENS * CHARS_PER_TOKEN):
     if not chunks:
         return "NO RELEVANT INFO FOUND. Contact bellardo@calpoly.edu"
 
@@ -163,35 +169,66 @@ def build_knowledge_context(chunks, max_chars=4000):
     return "".join(blocks)
 
 
-def answer_student_query(query, knowledge_context):
+async def answer_student_query_async(query, knowledge_context):
     system_prompt = DEADLINES_PROMPT.format(
         query=query,
         knowledge_context=knowledge_context
     )
 
-    return azure_chat(
+    return await azure_chat_async(
         system_message=system_prompt,
-        user_message="Please answer based on the knowledge base provided above."
+        user_message="Please answer based on the knowledge base provided above.",
+        call_site="answer_student_query"
     )
 
 
-def run_forms_and_deadlines_agent(query):
-    chunks = load_knowledge_base_from_supabase()
+def answer_student_query(query, knowledge_context):
+    return run_sync(answer_student_query_async(query, knowledge_context))
+
+
+async def retrieve_knowledge_context_async(query, tags=None, chunks=None):
+    """
+    Retrieval half of the agent: load the KB, pick tags, build the context.
+    Tags suggested by the coordinator's routing call are used when any of
+    them exist in the KB, which saves the tag extraction call. KB rows
+    already loaded are passed as `chunks`.
+    """
+    if chunks is None:
+        chunks = await load_knowledge_base_from_supabase_async()
     print(f"[DEBUG] Loaded {len(chunks)} chunks from Supabase")
 
     all_tags = extract_all_tags(chunks)
     print(f"[DEBUG] Total unique tags: {len(all_tags)}")
 
-    selected_tags = extract_relevant_tags(query, all_tags)
+    selected_tags = match_known_tags(tags, all_tags)
+    if not selected_tags:
+        selected_tags = await extract_relevant_tags_async(query, all_tags)
     print(f"[DEBUG] Selected tags: {selected_tags}")
 
     relevant_chunks = filter_chunks(chunks, selected_tags)
     print(f"[DEBUG] Retrieved {len(relevant_chunks)} relevant chunks")
 
-    context = build_knowledge_context(relevant_chunks)
+    context_tokens = context_allowance(
+        KNOWLEDGE_CONTEXT_TOKENS, ANSWER_COMPLETION_TOKENS + SYNTHESIS_RESERVE_TOKENS)
+    if context_tokens < KNOWLEDGE_CONTEXT_TOKENS:
+        print(f"[BUDGET] Trimming knowledge context to ~{context_tokens} tokens")
+    context = build_knowledge_context(
+        relevant_chunks, max_chars=context_tokens * CHARS_PER_TOKEN)
     print(f"[DEBUG] Context length: {len(context)} characters")
+    return context
+
 
-    answer = answer_student_query(query, context)
+async def run_forms_and_deadlines_agent_async(query, prefetched=None, params=None):
+    # prefetched is the KB loaded ahead of time by speculative execution;
+    # params are the coordinator's routing parameters
+    context = await retrieve_knowledge_context_async(
+        query, tags=(params or {}).get("tags"), chunks=prefetched)
+
+    answer = await answer_student_query_async(query, context)
     print(f"[DEBUG] Azure response: {answer}")
 
     return answer
+
+
+def run_forms_and_deadlines_agent(query, prefetched=None, params=None):
+    return run_sync(run_forms_and_deadlines_agent_async(query, prefetched, params))
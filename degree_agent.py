@@ -1,30 +1,17 @@
-import gradio as gr
+import asyncio
 import json
-import os
 import re
 import traceback
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-from supabase import create_client, Client
+from async_runtime import loop_local, run_sync
+from llm import chat_completion
+from db import select_async
+from llm_usage import budget_nearly_spent, context_allowance, SYNTHESIS_RESERVE_TOKENS
+from tokens import estimate_tokens
+from turn_deadline import DeadlineExceeded
 
 load_dotenv()
 
-endpoint = "https://gradgpt-openai.openai.azure.com/"
-deployment = "gradgpt-chat"
-api_version = "2024-12-01-preview"
-subscription_key = os.environ.get("Azure_API_Key")
-
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-
-supabase: Client = create_client(supabase_url, supabase_key)
-
-client = AzureOpenAI(
-    api_version=api_version,
-    azure_endpoint=endpoint,
-    api_key=subscription_key,
-)
-
 ROUTER_AND_FILTER_PROMPT = """
 Classify the student question and extract structured course filters.
 
@@ -78,49 +65,75 @@ Be generous — include reasonably related courses.
 """
 
 
-def load_knowledge_base_from_supabase():
+async def load_knowledge_base_from_supabase_async():
     try:
         print("[KB] Loading knowledge base from Supabase...")
-        response = (
-            supabase
-            .table("KnowledgeBase")
-            .select("id, title, content, sourceURL, tags, agentIds")
-            .contains("agentIds", ["3"])  # agentId 3 = degree planning
-            .execute()
-        )
-        entries = response.data or []
+        entries = await select_async(
+            "KnowledgeBase",
+            "id, title, content, sourceURL, tags, agentIds",
+            contains={"agentIds": ["3"]},  # agentId 3 = degree planning
+        ) or []
         print(f"[KB] Loaded {len(entries)} KB entries")
         if entries:
             print(
                 f"[KB] Sample entry titles: {[e.get('title', 'N/A') for e in entries[:3]]}")
         return entries
+    except (DeadlineExceeded, asyncio.CancelledError):
+        # A missed deadline has to reach the coordinator, so synthesis can
+        # say this part is missing instead of passing on an error string
+        raise
     except Exception as e:
         print(f"[KB] ERROR loading KB: {str(e)}")
         return []
 
 
-KB_CACHE = load_knowledge_base_from_supabase()
+def load_knowledge_base_from_supabase():
+    return run_sync(load_knowledge_base_from_supabase_async())
+
 
+# Loaded on first use (or by the dashboard's background warm-up) rather
+# than at import, so importing this module never waits on Supabase
+KB_CACHE = None
+get_kb_cache_lock = loop_local(asyncio.Lock)
 
-def load_user_context(user_id: int):
+
+async def get_kb_cache_async():
+    global KB_CACHE
+    if KB_CACHE:
+        return KB_CACHE
+    async with get_kb_cache_lock():
+        if not KB_CACHE:
+            # An empty result is not kept, so a failed load is retried
+            KB_CACHE = await load_knowledge_base_from_supabase_async() or None
+    return KB_CACHE or []
+
+
+def get_kb_cache():
+    return run_sync(get_kb_cache_async())
+
+
+async def load_user_context_async(user_id: int):
     try:
         print(f"[USER] Loading user data for id: {user_id}")
-        response = (
-            supabase
-            .table("Users")
-            .select("id, completedCourses, currentCourses, graduationTarget, startTerm, plannedCourses")
-            .eq("id", user_id)
-            .single()
-            .execute()
+        user = await select_async(
+            "Users",
+            "id, completedCourses, currentCourses, graduationTarget, startTerm, plannedCourses",
+            eq={"id": user_id},
+            single=True,
         )
-        user = response.data
         print(f"[USER] Loaded user: {user}")
         return user
+    except (DeadlineExceeded, asyncio.CancelledError):
+        raise
     except Exception as e:
         print(f"[USER] ERROR loading user: {str(e)}")
         return None
 
 
+def load_user_context(user_id: int):
+    return run_sync(load_user_context_async(user_id))
+
+
 def format_user_context(user):
     if not user:
         return ""
@@ -135,17 +148,17 @@ def format_user_context(user):
     return "\n".join(lines)
 
 
-def azure_json_call(system_msg, user_msg, max_completion_tokens=2000):
+async def azure_json_call_async(system_msg, user_msg, max_completion_tokens=2000, call_site="azure_json_call"):
     print("\n[AZURE] --- JSON Call ---")
     print(f"[AZURE] User message preview: {user_msg[:200]}...")
     try:
-        response = client.chat.completions.create(
-            model=deployment,
-            response_format={"type": "json_object"},
-            messages=[
+        response = await chat_completion(
+            call_site,
+            [
                 {"role": "system", "content": system_msg},
                 {"role": "user", "content": user_msg},
             ],
+            response_format={"type": "json_object"},
             max_completion_tokens=max_completion_tokens,
         )
         content = response.choices[0].message.content
@@ -174,18 +187,46 @@ def azure_json_call(system_msg, user_msg, max_completion_tokens=2000):
         print(f"[AZURE] JSON decode error: {str(e)}")
         print(f"[AZURE] Content that failed to parse: {content!r}")
         return {}
+    except (DeadlineExceeded, asyncio.CancelledError):
+        raise
     except Exception as e:
         print(f"[AZURE] ERROR during API call: {type(e).__name__}: {str(e)}")
         print(f"[AZURE] Full traceback:\n{traceback.format_exc()}")
         return {}
 
 
-def classify_and_extract(query):
+def azure_json_call(system_msg, user_msg, max_completion_tokens=2000, call_site="azure_json_call"):
+    return run_sync(azure_json_call_async(system_msg, user_msg, max_completion_tokens, call_site))
+
+
+INTENTS = ("COURSE_ONLY", "KB_ONLY", "HYBRID")
+
+
+def parsed_from_params(params):
+    """
+    The coordinator's routing parameters in classify_and_extract's format,
+    or None when they are missing or malformed.
+    """
+    if not isinstance(params, dict) or params.get("intent") not in INTENTS:
+        return None
+    levels = params.get("levels")
+    if levels is not None:
+        if not isinstance(levels, list):
+            return None
+        levels = [str(level) for level in levels] or None
+    topic = params.get("topic")
+    if topic is not None and not isinstance(topic, str):
+        return None
+    return {"intent": params["intent"], "levels": levels, "topic": topic or None}
+
+
+async def classify_and_extract_async(query):
     print(f"\n[ROUTER] Classifying query: {query!r}")
-    parsed = azure_json_call(
+    parsed = await azure_json_call_async(
         "You are a structured data extractor for academic advising. Return only valid JSON with no markdown.",
         ROUTER_AND_FILTER_PROMPT.format(query=query),
-        max_completion_tokens=500
+        max_completion_tokens=500,
+        call_site="classify_and_extract"
     )
 
     if not parsed:
@@ -193,7 +234,7 @@ def classify_and_extract(query):
         return {"intent": "KB_ONLY", "levels": None, "topic": None}
 
     intent = parsed.get("intent", "KB_ONLY")
-    if intent not in ["COURSE_ONLY", "KB_ONLY", "HYBRID"]:
+    if intent not in INTENTS:
         print(f"[ROUTER] Invalid intent '{intent}', defaulting to KB_ONLY")
         intent = "KB_ONLY"
 
@@ -204,6 +245,10 @@ def classify_and_extract(query):
     return {"intent": intent, "levels": levels, "topic": topic}
 
 
+def classify_and_extract(query):
+    return run_sync(classify_and_extract_async(query))
+
+
 def extract_course_number(course_num_str):
     match = re.search(r'\d+', str(course_num_str))
     return int(match.group()) if match else None
@@ -240,20 +285,30 @@ def keyword_topic_filter(topic, courses):
     return matched
 
 
-def semantic_topic_filter(topic, courses):
+SEMANTIC_FILTER_COMPLETION_TOKENS = 3000
+KB_ANSWER_COMPLETION_TOKENS = 4000
+
+
+async def semantic_topic_filter_async(topic, courses):
     if not topic or not courses:
         return courses
     print(
         f"[COURSES] Running semantic filter for topic: '{topic}' on {len(courses)} courses")
     slim_courses = [{"courseNum": c["courseNum"],
                      "courseTitle": c["courseTitle"]} for c in courses]
-    parsed = azure_json_call(
+    courses_json = json.dumps(slim_courses)
+    filter_cost = estimate_tokens(courses_json) + SEMANTIC_FILTER_COMPLETION_TOKENS
+    if budget_nearly_spent(filter_cost + SYNTHESIS_RESERVE_TOKENS):
+        print("[BUDGET] Turn token budget nearly spent, skipping semantic filter")
+        return courses
+    parsed = await azure_json_call_async(
         "You are a course relevance classifier. Return only valid JSON with no markdown.",
         LLM_TOPIC_FILTER_PROMPT.format(
             topic=topic,
-            courses_json=json.dumps(slim_courses)
+            courses_json=courses_json
         ),
-        max_completion_tokens=3000
+        max_completion_tokens=SEMANTIC_FILTER_COMPLETION_TOKENS,
+        call_site="semantic_topic_filter"
     )
     relevant_nums = parsed.get("relevant_course_nums")
     if not relevant_nums:
@@ -266,22 +321,35 @@ def semantic_topic_filter(topic, courses):
     return filtered
 
 
-def load_filtered_courses(levels, topic):
+def semantic_topic_filter(topic, courses):
+    return run_sync(semantic_topic_filter_async(topic, courses))
+
+
+async def load_courses_async():
     try:
-        print(
-            f"\n[COURSES] Loading courses — levels: {levels}, topic: {topic}")
-        response = supabase.table("Courses").select(
-            "courseNum, courseTitle, units, prerequisites"
-        ).execute()
-        courses = response.data or []
+        courses = await select_async(
+            "Courses", "courseNum, courseTitle, units, prerequisites"
+        ) or []
         print(f"[COURSES] Loaded {len(courses)} total courses from Supabase")
         if courses:
             print(f"[COURSES] Sample: {courses[:2]}")
+        return courses
+    except (DeadlineExceeded, asyncio.CancelledError):
+        raise
     except Exception as e:
         print(f"[COURSES] ERROR loading courses: {str(e)}")
         return []
 
-    courses = filter_by_levels(courses, levels)
+
+async def load_filtered_courses_async(levels, topic, all_courses=None):
+    print(
+        f"\n[COURSES] Loading courses — levels: {levels}, topic: {topic}")
+    if all_courses is None:
+        all_courses = await load_courses_async()
+    if not all_courses:
+        return []
+
+    courses = filter_by_levels(all_courses, levels)
 
     if not topic:
         return courses
@@ -290,11 +358,16 @@ def load_filtered_courses(levels, topic):
     if keyword_matches:
         return keyword_matches
 
-    return semantic_topic_filter(topic, courses)
+    return await semantic_topic_filter_async(topic, courses)
+
+
+def load_filtered_courses(levels, topic):
+    return run_sync(load_filtered_courses_async(levels, topic))
 
 
-def answer_course_query(levels, topic, user_context=""):
-    courses = load_filtered_courses(levels, topic)
+async def answer_course_query_async(levels, topic, user_context="", courses=None):
+    if courses is None:
+        courses = await load_filtered_courses_async(levels, topic)
     if not courses:
         return "No matching courses found for your query."
     lines = []
@@ -307,25 +380,45 @@ def answer_course_query(levels, topic, user_context=""):
     return f"Here are matching courses ({len(courses)} found):\n\n" + "\n\n".join(lines) + note
 
 
-def answer_kb_query(query, user_context=''):
+def answer_course_query(levels, topic, user_context="", courses=None):
+    return run_sync(answer_course_query_async(levels, topic, user_context, courses))
+
+
+async def answer_kb_query_async(query, user_context=''):
     print(f"\n[KB ANSWER] Answering KB query: {query!r}")
-    if not KB_CACHE:
+    kb_cache = await get_kb_cache_async()
+    if not kb_cache:
         print("[KB ANSWER] KB cache is empty!")
         return "No knowledge base entries found. Please contact bellardo@calpoly.edu for more information."
 
     # Format KB entries using correct schema: title + content
-    kb_entries = []
-    for entry in KB_CACHE[:50]:
+    blocks = []
+    for entry in kb_cache[:50]:
         title = entry.get("title", "Untitled")
         content = entry.get("content", "")
         source = entry.get("sourceURL", "")
         tags = entry.get("tags", [])
-        kb_entries.append(
+        blocks.append(
             f"### {title}\n{content}\nSource: {source}\nTags: {', '.join(tags) if tags else 'N/A'}")
 
+    # The whole KB goes in unless the turn's budget cannot cover it
+    full_tokens = sum(estimate_tokens(block) for block in blocks)
+    context_tokens = context_allowance(
+        full_tokens, KB_ANSWER_COMPLETION_TOKENS + SYNTHESIS_RESERVE_TOKENS)
+    kb_entries = blocks
+    if context_tokens < full_tokens:
+        print(f"[BUDGET] Trimming KB context to ~{context_tokens} tokens")
+        kb_entries = []
+        used_tokens = 0
+        for block in blocks:
+            if kb_entries and used_tokens + estimate_tokens(block) > context_tokens:
+                break
+            kb_entries.append(block)
+            used_tokens += estimate_tokens(block)
+
     kb_context = "\n\n---\n\n".join(kb_entries)
     print(
-        f"[KB ANSWER] Using {len(KB_CACHE[:50])} KB entries, context length: {len(kb_context)} chars")
+        f"[KB ANSWER] Using {len(kb_entries)} KB entries, context length: {len(kb_context)} chars")
 
     system_msg = "You are an academic advisor assistant for Cal Poly's graduate CS program."
     user_msg = KB_ANSWER_PROMPT.format(
@@ -335,44 +428,106 @@ def answer_kb_query(query, user_context=''):
     )
 
     try:
-        response = client.chat.completions.create(
-            model=deployment,
-            messages=[
+        response = await chat_completion(
+            "answer_kb_query",
+            [
                 {"role": "system", "content": system_msg},
                 {"role": "user", "content": user_msg}
             ],
-            max_completion_tokens=4000
+            max_completion_tokens=KB_ANSWER_COMPLETION_TOKENS
         )
         content = response.choices[0].message.content
         print(f"[KB ANSWER] Response received ({len(content)} chars)")
         return content
+    except (DeadlineExceeded, asyncio.CancelledError):
+        raise
     except Exception as e:
         print(f"[KB ANSWER] ERROR: {str(e)}")
         return f"Could not retrieve answer from knowledge base. Error: {str(e)}"
 
 
-def run_degree_planning_agent(query, user_id):
+def answer_kb_query(query, user_context=''):
+    return run_sync(answer_kb_query_async(query, user_context))
+
+
+async def no_user():
+    return None
+
+
+async def classify_async(query, params=None):
+    parsed = parsed_from_params(params)
+    if parsed is not None:
+        print(f"[ROUTER] Using coordinator parameters: {parsed}")
+        return parsed
+    return await classify_and_extract_async(query)
+
+
+async def load_degree_inputs_async(user_id):
+    """
+    The profile, course list and KB the agent may need, whatever the
+    question turns out to be. Used by speculative execution.
+    """
+    user, all_courses, _ = await asyncio.gather(
+        load_user_context_async(user_id) if user_id else no_user(),
+        load_courses_async(),
+        get_kb_cache_async(),
+    )
+    return {"user": user, "all_courses": all_courses}
+
+
+async def prepare_degree_query_async(query, user_id, params=None, loaded=None):
+    """
+    Retrieval half of the agent: classify the question and load the profile,
+    the KB and the matching courses it needs. Returns the inputs for answering.
+    The classification call is skipped when the coordinator's routing call
+    already returned usable params, and loads from load_degree_inputs_async
+    are reused when passed as `loaded`.
+    """
+    if loaded is not None:
+        parsed, user = await classify_async(query, params), loaded["user"]
+    else:
+        parsed, user = await asyncio.gather(
+            classify_async(query, params),
+            load_user_context_async(user_id) if user_id else no_user(),
+        )
+    intent = parsed.get("intent")
+    courses = None
+    if intent in ("COURSE_ONLY", "HYBRID"):
+        courses = await load_filtered_courses_async(
+            parsed.get("levels"), parsed.get("topic"),
+            all_courses=loaded["all_courses"] if loaded is not None else None)
+    if intent in ("KB_ONLY", "HYBRID"):
+        await get_kb_cache_async()
+    return {"parsed": parsed, "user": user, "courses": courses}
+
+
+async def run_degree_planning_agent_async(query, user_id, prefetched=None, params=None):
     print(f"\n{'='*50}")
     print(f"[AGENT] New query: {query!r}")
     print(f"{'='*50}")
 
-    parsed = classify_and_extract(query)
-    intent = parsed["intent"]
-    levels = parsed["levels"]
-    topic = parsed["topic"]
+    # prefetched comes from load_degree_inputs_async run ahead of time by
+    # speculative execution
+    prepared = await prepare_degree_query_async(query, user_id, params, loaded=prefetched)
+    parsed = prepared["parsed"]
+    intent = parsed.get("intent")
+    levels = parsed.get("levels")
+    topic = parsed.get("topic")
+    courses = prepared["courses"]
 
     print(f"[AGENT] Routing to intent: {intent}")
 
-    user = load_user_context(user_id) if user_id else None
-    user_context = format_user_context(user)
+    user_context = format_user_context(prepared["user"])
 
     if intent == "COURSE_ONLY":
-        result = answer_course_query(levels, topic, user_context)
+        result = await answer_course_query_async(levels, topic, user_context, courses)
     elif intent == "KB_ONLY":
-        result = answer_kb_query(query, user_context)
+        result = await answer_kb_query_async(query, user_context)
     elif intent == "HYBRID":
-        kb_answer = answer_kb_query(query, user_context)
-        course_answer = answer_course_query(levels, topic, user_context)
+        kb_answer, course_answer = await asyncio.gather(
+            answer_kb_query_async(query, user_context),
+            answer_course_query_async(levels, topic, user_context, courses),
+        )
         result = f"{kb_answer}\n\n---\n\n{course_answer}"
     else:
         result = "Could not determine intent. Please try rephrasing your question."
@@ -381,28 +536,5 @@ def run_degree_planning_agent(query, user_id):
     return result
 
 
-def chat_with_gpt(message, history):
-    if history is None:
-        history = []
-    history.append(gr.ChatMessage(role="user", content=message))
-    try:
-        response = run_degree_planning_agent(message)
-    except Exception as e:
-        response = f"Error: {str(e)}"
-        print(f"[UI] Top-level error: {str(e)}")
-    history.append(gr.ChatMessage(role="assistant", content=response))
-    return history, ""
-
-
-# with gr.Blocks() as demo:
-#     gr.Markdown("# Welcome to Grad-GPT")
-#     chatbot = gr.Chatbot(height=400)
-#     chat_input = gr.Textbox(
-#         placeholder="Ask about courses, requirements, faculty, and more...")
-#     send_button = gr.Button("Send")
-#     send_button.click(chat_with_gpt, [chat_input, chatbot], [
-#                       chatbot, chat_input])
-#     chat_input.submit(chat_with_gpt, [chat_input, chatbot], [
-#                       chatbot, chat_input])
-
-# demo.launch()
+def run_degree_planning_agent(query, user_id, prefetched=None, params=None):
+    return run_sync(run_degree_planning_agent_async(query, user_id, prefetched, params))
@@ -0,0 +1,475 @@
+import asyncio
+import copy
+import json
+import random
+import re
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tokens import estimate_message_tokens, estimate_tokens
+
+# Offline stand-ins for Azure OpenAI, Supabase and the scholarly search APIs.
+# They let the benchmark (and tests) drive the whole chat pipeline with no
+# network access: the fake LLM answers each prompt with canned JSON or text
+# after a configurable delay, and the in-memory Supabase serves fixture rows
+# through the same query-builder calls the agents make.
+
+
+# Fake LLM --------------------------------------------------------------------
+
+
+def last_user_text(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return str(message.get("content") or "")
+    return ""
+
+
+def route_reply(messages):
+    query = last_user_text(messages).lower()
+    subqueries = []
+    if re.search(r"form|deadline|petition|graduat", query):
+        subqueries.append({"agent": "forms_agent", "query": query,
+                           "params": {"tags": json.loads(tag_reply(messages))["selected_tags"]}})
+    if re.search(r"course|class|elective|unit|prereq", query):
+        subqueries.append({"agent": "degree_planning_agent", "query": query,
+                           "params": classification(query)})
+    if re.search(r"paper|dataset|tool|research|survey|tutorial", query) or not subqueries:
+        subqueries.append({"agent": "resource_agent", "query": query,
+                           "params": json.loads(analysis_reply(messages))})
+    return json.dumps({"delegate": True, "subqueries": subqueries})
+
+
+def classification(query):
+    query = query.lower()
+    intent = "HYBRID" if "course" in query and "require" in query else (
+        "COURSE_ONLY" if "course" in query or "class" in query else "KB_ONLY")
+    topic = "Machine Learning" if "learning" in query else None
+    return {"intent": intent, "levels": ["500"], "topic": topic}
+
+
+def classify_reply(messages):
+    return json.dumps(classification(last_user_text(messages)))
+
+
+def topic_filter_reply(messages):
+    nums = re.findall(r'"courseNum": "([^"]+)"', last_user_text(messages))
+    return json.dumps({"relevant_course_nums": nums[:3]})
+
+
+def tag_reply(messages):
+    return json.dumps({"selected_tags": ["thesis", "deadlines", "graduation"]})
+
+
+def analysis_reply(messages):
+    return json.dumps({
+        "is_resource_request": True,
+        "user_needs": "Find papers and tools for the student's research topic.",
+        "topics": ["machine learning", "thesis"],
+        "keywords": ["machine learning", "dataset", "thesis", "writing"],
+        "resource_types": ["paper", "tool"],
+        "constraints": [],
+        "use_online": True,
+        "max_results": 5,
+        "arxiv_query": "machine learning survey",
+        "semantic_scholar_query": "machine learning survey",
+        "google_scholar_query": "",
+    })
+
+
+def ranking_reply(messages):
+    links = re.findall(r"Link: (\S+)", last_user_text(messages))
+    return json.dumps({"ranked": [
+        {"title": f"Resource {i}", "link": link, "source": "local", "why": "Relevant to the topic."}
+        for i, link in enumerate(links[:5], start=1)
+    ]})
+
+
+def select_and_rank_reply(messages):
+    prompt = last_user_text(messages)
+    query = prompt.split("Student query:")[-1].split("AVAILABLE RESOURCES:")[0]
+    is_request = bool(re.search(r"paper|dataset|tool|research|survey|tutorial|resource", query, re.I))
+    ranked = json.loads(ranking_reply(messages))["ranked"] if is_request else []
+    return json.dumps({"is_resource_request": is_request, "ranked": ranked})
+
+
+def prose_reply(messages):
+    return (
+        "Here is what you need to know. The thesis proposal form is due in week 6 "
+        "of the quarter before you defend, and your committee must sign it. "
+        "Contact bellardo@calpoly.edu with any questions.")
+
+
+# (name, pattern matched against the whole prompt, reply builder). The first
+# match wins, so more specific prompts come first.
+DEFAULT_REPLIES: List[Tuple[str, str, Callable]] = [
+    ("ask_coordinator", r"coordinator agent Grad-GPT", route_reply),
+    ("synthesize_response", r"received responses from specialized agents", prose_reply),
+    ("classify_and_extract", r"Classify the student question", classify_reply),
+    ("semantic_topic_filter", r"course relevance classifier", topic_filter_reply),
+    ("extract_relevant_tags", r"AVAILABLE TAGS", tag_reply),
+    ("analyze_query", r"Analyze the student's query", analysis_reply),
+    ("rank_resources", r"ONLY recommend resources provided below", ranking_reply),
+    ("select_and_rank", r"First decide whether the student is asking for resources", select_and_rank_reply),
+    ("answer", r".", prose_reply),
+]
+
+
+class FakeStream:
+    """Async iterator over chunks with the close() of openai's AsyncStream."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __aiter__(self):
+        return self.chunks
+
+    async def close(self):
+        self.closed = True
+        await self.chunks.aclose()
+
+
+class FakeChatCompletions:
+    def __init__(self, llm: "FakeLLMClient"):
+        self.llm = llm
+
+    async def create(self, messages, stream=False, **kwargs):
+        return await self.llm.create(messages, stream=stream, **kwargs)
+
+
+class FakeLLMClient:
+    """
+    OpenAI-compatible client exposing chat.completions.create(). Each call
+    waits `latency` seconds (plus up to `jitter`) before answering; streams
+    then emit one word every `stream_delay` seconds.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        stream_delay: float = 0.0,
+        replies: Optional[List[Tuple[str, str, Callable]]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.stream_delay = stream_delay
+        self.replies = replies or DEFAULT_REPLIES
+        self.random = random.Random(seed)
+        self.calls: Dict[str, int] = {}
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(self))
+
+    def reply_for(self, messages) -> Tuple[str, str]:
+        prompt = "\n".join(str(m.get("content") or "") for m in messages)
+        for name, pattern, build in self.replies:
+            if re.search(pattern, prompt):
+                return name, build(messages)
+        return "unmatched", ""
+
+    async def create(self, messages, stream=False, **kwargs):
+        name, text = self.reply_for(messages)
+        self.calls[name] = self.calls.get(name, 0) + 1
+        await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+        usage = SimpleNamespace(
+            prompt_tokens=estimate_message_tokens(messages),
+            completion_tokens=estimate_tokens(text),
+        )
+        if stream:
+            return FakeStream(self.stream(text, usage))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=usage,
+        )
+
+    async def stream(self, text, usage):
+        for word in re.findall(r"\S+\s*", text):
+            if self.stream_delay:
+                await asyncio.sleep(self.stream_delay)
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=word))], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+# In-memory Supabase ----------------------------------------------------------
+
+
+# (table, embedded table) -> foreign key column on the table
+FOREIGN_KEYS = {
+    ("Notifications", "NotificationRules"): "ruleId",
+}
+
+
+class FakeQuery:
+    """
+    Supports the query-builder calls the app makes: select (with count),
+    insert/update/delete, eq, contains, gte, order, limit, range and single.
+    """
+
+    def __init__(self, db: "InMemorySupabase", table: str):
+        self.db = db
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+        self.single_row = False
+        self.count = None
+        self.order_by = None
+        self.row_offset = 0
+        self.row_limit = None
+
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.columns = columns
+        self.count = count
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, size):
+        self.row_limit = size
+        return self
+
+    def range(self, start, end):
+        self.row_offset, self.row_limit = start, end - start + 1
+        return self
+
+    def insert(self, payload):
+        self.operation, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.operation, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def contains(self, column, values):
+        self.filters.append(lambda row: all(v in (row.get(column) or []) for v in values))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def project(self, row):
+        columns = [c.strip() for c in re.findall(r"[^,(]+(?:\([^)]*\))?", self.columns)]
+        fields = [c for c in columns if "(" not in c]
+        if "*" in fields:
+            projected = copy.deepcopy(row)
+        else:
+            projected = {f: copy.deepcopy(row.get(f)) for f in fields}
+        # Embedded resources such as "NotificationRules(message, day)" follow
+        # the foreign key to a single related row, as PostgREST does
+        for embed in (c for c in columns if "(" in c):
+            related, inner = embed[:-1].split("(", 1)
+            key = FOREIGN_KEYS[(self.table, related)]
+            target = next((r for r in self.db.tables.get(related, [])
+                           if r.get("id") == row.get(key)), None)
+            projected[related] = None if target is None else FakeQuery(
+                self.db, related).select(inner).project(target)
+        return projected
+
+    def run(self):
+        rows = self.db.tables.setdefault(self.table, [])
+        matched = [r for r in rows if all(f(r) for f in self.filters)]
+
+        if self.operation == "insert":
+            new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+            for row in new_rows:
+                row = dict(row)
+                row.setdefault("id", max((r.get("id") or 0 for r in rows), default=0) + 1)
+                rows.append(row)
+            return SimpleNamespace(data=new_rows)
+        if self.operation == "update":
+            for row in matched:
+                row.update(self.payload)
+            return SimpleNamespace(data=[self.project(r) for r in matched])
+        if self.operation == "delete":
+            self.db.tables[self.table] = [r for r in rows if r not in matched]
+            return SimpleNamespace(data=matched)
+
+        total = len(matched)
+        if self.order_by:
+            column, desc = self.order_by
+            present = sorted((r for r in matched if r.get(column) is not None),
+                             key=lambda r: r[column], reverse=desc)
+            missing = [r for r in matched if r.get(column) is None]
+            matched = present + missing if desc else missing + present
+        matched = matched[self.row_offset:]
+        if self.row_limit is not None:
+            matched = matched[: self.row_limit]
+        data = [self.project(r) for r in matched]
+        if self.count:
+            return SimpleNamespace(data=data, count=total)
+        if self.single_row:
+            if len(data) != 1:
+                raise ValueError(f"single() matched {len(data)} rows in {self.table}")
+            data = data[0]
+        return SimpleNamespace(data=data)
+
+    def execute(self):
+        self.db.queries[self.table] = self.db.queries.get(self.table, 0) + 1
+        if not self.db.is_async:
+            return self.run()
+        return self.execute_async()
+
+    async def execute_async(self):
+        if self.db.latency:
+            await asyncio.sleep(self.db.latency)
+        return self.run()
+
+
+class InMemorySupabase:
+    """A Supabase client stand-in backed by dicts of rows, seeded from FIXTURES."""
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict]]] = None,
+                 latency: float = 0.0, is_async: bool = True):
+        self.tables = copy.deepcopy(tables if tables is not None else FIXTURES)
+        self.latency = latency
+        self.is_async = is_async
+        self.queries: Dict[str, int] = {}
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+
+# Scholarly search APIs -------------------------------------------------------
+
+
+ARXIV_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <id>http://arxiv.org/abs/2101.00001</id>
+    <title>A Survey of Machine Learning for Graduate Research</title>
+    <summary>We survey methods and datasets for applied machine learning.</summary>
+  </entry>
+  <entry>
+    <id>http://arxiv.org/abs/2101.00002</id>
+    <title>Reproducible Experiments in Machine Learning</title>
+    <summary>Practical tools for reproducible machine learning experiments.</summary>
+  </entry>
+</feed>
+"""
+
+SEMANTIC_SCHOLAR_RESULTS = {"data": [
+    {"title": "A Survey of Machine Learning for Graduate Research",
+     "abstract": "Survey of methods and datasets.", "url": "https://www.semanticscholar.org/p/1"},
+    {"title": "Writing a Computer Science Thesis",
+     "abstract": "Advice on structuring a thesis.", "url": "https://www.semanticscholar.org/p/2"},
+]}
+
+GOOGLE_SCHOLAR_RESULTS = {"organic_results": [
+    {"title": "Deep Learning", "snippet": "A textbook on deep learning.",
+     "link": "https://www.deeplearningbook.org/"},
+]}
+
+
+def fake_http_responses() -> Dict[str, bytes]:
+    return {
+        "arxiv": ARXIV_FEED.encode("utf-8"),
+        "semantic_scholar": json.dumps(SEMANTIC_SCHOLAR_RESULTS).encode("utf-8"),
+        "google_scholar": json.dumps(GOOGLE_SCHOLAR_RESULTS).encode("utf-8"),
+    }
+
+
+class FakeScholarlyHTTP:
+    """Replacement for ResourceAgent._download_async returning canned provider payloads."""
+
+    def __init__(self, latency: float = 0.05, responses: Optional[Dict[str, bytes]] = None):
+        self.latency = latency
+        self.responses = responses or fake_http_responses()
+        self.calls: Dict[str, int] = {}
+
+    async def fetch(self, url: str, provider: str = "") -> bytes:
+        self.calls[provider] = self.calls.get(provider, 0) + 1
+        await asyncio.sleep(self.latency)
+        return self.responses.get(provider, b"{}")
+
+
+# Fixtures --------------------------------------------------------------------
+
+
+def kb_entry(entry_id, title, content, tags, agent_id, url=""):
+    return {
+        "id": entry_id,
+        "title": title,
+        "content": content,
+        "sourceURL": url or f"https://csc.calpoly.edu/kb/{entry_id}",
+        "tags": tags,
+        "agentIds": [agent_id],
+    }
+
+
+FIXTURES: Dict[str, List[Dict[str, Any]]] = {
+    "KnowledgeBase": [
+        kb_entry(1, "Thesis Proposal Form", "Submit the thesis proposal form by week 6 "
+                 "of the quarter before your defense.", ["thesis", "forms", "deadlines"], "4"),
+        kb_entry(2, "Graduation Application", "Apply to graduate two quarters before "
+                 "your final quarter through the Portal.", ["graduation", "deadlines"], "4"),
+        kb_entry(3, "Petition for Course Substitution", "Use the substitution petition "
+                 "to replace a required course.", ["petition", "forms"], "4"),
+        kb_entry(4, "Program Requirements", "The MS requires 45 units including a thesis "
+                 "and at least 24 units of 500-level coursework.", ["requirements", "units"], "3"),
+        kb_entry(5, "Advisor Selection", "Choose a thesis advisor by the end of your "
+                 "first year.", ["thesis", "advising"], "3"),
+        kb_entry(6, "Blended BS+MS", "BMS students may double count up to 12 units.",
+                 ["bms", "requirements"], "3"),
+        kb_entry(7, "Zotero", "Free reference manager for collecting and citing papers.",
+                 ["tool", "thesis", "writing"], "2", "https://www.zotero.org/"),
+        kb_entry(8, "Kaggle Datasets", "Large catalog of public machine learning datasets.",
+                 ["dataset", "machine learning"], "2", "https://www.kaggle.com/datasets"),
+        kb_entry(9, "Overleaf", "Collaborative LaTeX editor with a Cal Poly thesis template.",
+                 ["tool", "writing", "latex"], "2", "https://www.overleaf.com/"),
+        kb_entry(10, "HPC Cluster", "Campus GPU cluster available for thesis research.",
+                 ["compute", "machine learning"], "2", "https://hpc.calpoly.edu/"),
+    ],
+    "Courses": [
+        {"courseNum": "CSC 508", "courseTitle": "Software Engineering I", "units": 4, "prerequisites": None},
+        {"courseNum": "CSC 509", "courseTitle": "Software Engineering II", "units": 4, "prerequisites": "CSC 508"},
+        {"courseNum": "CSC 515", "courseTitle": "Computer Architecture", "units": 4, "prerequisites": None},
+        {"courseNum": "CSC 521", "courseTitle": "Computer Security", "units": 4, "prerequisites": None},
+        {"courseNum": "CSC 530", "courseTitle": "Languages and Translators", "units": 4, "prerequisites": None},
+        {"courseNum": "CSC 566", "courseTitle": "Topics in Machine Learning", "units": 4, "prerequisites": None},
+        {"courseNum": "CSC 580", "courseTitle": "Artificial Intelligence", "units": 4, "prerequisites": None},
+        {"courseNum": "CSC 581", "courseTitle": "Knowledge Management", "units": 4, "prerequisites": "CSC 580"},
+        {"courseNum": "CSC 587", "courseTitle": "Advanced Deep Learning", "units": 4, "prerequisites": "CSC 566"},
+        {"courseNum": "CSC 466", "courseTitle": "Knowledge Discovery from Data", "units": 4, "prerequisites": None},
+        {"courseNum": "CSC 480", "courseTitle": "Artificial Intelligence", "units": 4, "prerequisites": None},
+        {"courseNum": "CSC 487", "courseTitle": "Deep Learning", "units": 4, "prerequisites": None},
+    ],
+    "Users": [
+        {"id": 1, "email": "student1@calpoly.edu", "status": "Graduate",
+         "completedCourses": ["CSC 508", "CSC 580"], "currentCourses": ["CSC 566"],
+         "plannedCourses": [], "graduationTarget": "Spring 2027", "startTerm": "Fall 2025",
+         "lastTermChecked": "Fall 2026"},
+        {"id": 2, "email": "student2@calpoly.edu", "status": "Undergraduate",
+         "completedCourses": ["CSC 466"], "currentCourses": [], "plannedCourses": ["CSC 580"],
+         "graduationTarget": "Spring 2028", "startTerm": "Fall 2026",
+         "lastTermChecked": "Fall 2026"},
+    ],
+    "NotificationRules": [
+        {"id": 1, "name": None, "type": "form", "trigger_type": "graduation_based",
+         "term_offset": -2, "message": "Apply to graduate", "required_course": []},
+        {"id": 2, "name": "CSC 580", "type": "course", "trigger_type": "annual_date",
+         "month": 10, "day": 15, "show_days_before": 30, "message": "Register for CSC 580",
+         "required_course": []},
+        {"id": 3, "name": None, "type": "form", "trigger_type": "status_based",
+         "message": "Apply to the blended program", "required_course": []},
+    ],
+    "Notifications": [],
+}
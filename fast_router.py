@@ -0,0 +1,296 @@
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Optional
+
+# Local routing stage that runs before ask_coordinator. Obvious single-intent
+# questions are routed here without an LLM round trip; anything the rules and
+# classifier are not confident about falls back to the LLM router.
+
+FAST_ROUTER_ENABLED = os.environ.get("FAST_ROUTER_ENABLED", "1") != "0"
+FAST_ROUTER_THRESHOLD = float(os.environ.get("FAST_ROUTER_THRESHOLD", "0.85"))
+
+# Fraction of fast-path hits that are also sent to the LLM router in the
+# background, purely to measure agreement on the queries we short-circuit.
+FAST_ROUTER_SHADOW_RATE = float(os.environ.get("FAST_ROUTER_SHADOW_RATE", "0.0"))
+
+AGENTS = ["forms_agent", "degree_planning_agent", "resource_agent"]
+
+# Keyword rules ---------------------------------------------------------------
+
+KEYWORD_RULES = {
+    "forms_agent": [
+        r"\bdeadlines?\b",
+        r"\bdue\b",
+        r"\bforms?\b",
+        r"\bpetitions?\b",
+        r"\bpaperwork\b",
+        r"\bgraduation (application|app|check|evaluation)\b",
+        r"\bapply (to|for) graduat",
+        r"\badvancement to candidacy\b",
+        r"\bformat review\b",
+        r"\bgwr\b",
+        r"\bleave of absence\b",
+        r"\bsubmit\b",
+    ],
+    "degree_planning_agent": [
+        r"\bclass(es)?\b",
+        r"\bcourses?\b",
+        r"\bcsc ?\d{3}\b",
+        r"\belectives?\b",
+        r"\bunits?\b",
+        r"\bprerequisites?\b",
+        r"\bprereqs?\b",
+        r"\bdegree (progress|plan|planning|requirements?)\b",
+        r"\bcourse ?work\b",
+    ],
+    "resource_agent": [
+        r"\bpapers?\b",
+        r"\bdatasets?\b",
+        r"\bliterature\b",
+        r"\barxiv\b",
+        r"\btutorials?\b",
+        r"\bsurveys?\b",
+        r"\bcitations?\b",
+        r"\bzotero\b",
+        r"\bmendeley\b",
+        r"\bgpus?\b",
+        r"\bresearch (resources|tools)\b",
+    ],
+}
+
+COMPILED_RULES = {
+    agent: [re.compile(p, re.IGNORECASE) for p in patterns]
+    for agent, patterns in KEYWORD_RULES.items()
+}
+
+# Classifier training data ----------------------------------------------------
+
+TRAINING_EXAMPLES = [
+    ("When is the graduation application due?", "forms_agent"),
+    ("What forms do I need to fill out before graduation?", "forms_agent"),
+    ("What is the deadline to submit my thesis?", "forms_agent"),
+    ("How do I apply for advancement to candidacy?", "forms_agent"),
+    ("When is the thesis format review deadline?", "forms_agent"),
+    ("Where do I find the petition to add a class late?", "forms_agent"),
+    ("What paperwork is required to file for graduation?", "forms_agent"),
+    ("How do I submit my graduation evaluation?", "forms_agent"),
+    ("Do I need to file a leave of absence form?", "forms_agent"),
+    ("What are the deadlines for blended BMS students this term?", "forms_agent"),
+    ("Which form do I use to change my thesis committee?", "forms_agent"),
+    ("When do I have to turn in the program of study?", "forms_agent"),
+    ("What classes should I take next quarter?", "degree_planning_agent"),
+    ("Which 500 level courses cover machine learning?", "degree_planning_agent"),
+    ("How many units do I still need to graduate?", "degree_planning_agent"),
+    ("What are the prerequisites for CSC 580?", "degree_planning_agent"),
+    ("Can I take 400 level electives for the MS?", "degree_planning_agent"),
+    ("What are the degree requirements for the CS masters?", "degree_planning_agent"),
+    ("Am I on track with my degree progress?", "degree_planning_agent"),
+    ("Which artificial intelligence courses are offered?", "degree_planning_agent"),
+    ("Plan my remaining courses before I graduate", "degree_planning_agent"),
+    ("Is CSC 599 required for the thesis track?", "degree_planning_agent"),
+    ("What security electives can I take?", "degree_planning_agent"),
+    ("How many 500 level units are required?", "degree_planning_agent"),
+    ("Find me papers on transformer architectures", "resource_agent"),
+    ("What tools can I use to search research papers?", "resource_agent"),
+    ("I need datasets for my machine learning thesis", "resource_agent"),
+    ("Recommend a survey on graph neural networks", "resource_agent"),
+    ("Where can I find literature on reinforcement learning?", "resource_agent"),
+    ("Are there tutorials for deep learning I can follow?", "resource_agent"),
+    ("What citation managers do students use?", "resource_agent"),
+    ("Where can I get GPU compute for my research?", "resource_agent"),
+    ("Recent arxiv papers about retrieval augmented generation", "resource_agent"),
+    ("Resources for academic writing and literature review", "resource_agent"),
+    ("Benchmarks and datasets for evaluating LLMs", "resource_agent"),
+    ("Good books to learn natural language processing", "resource_agent"),
+]
+
+# With prior turns, questions like "when is that due?" depend on context the
+# local router cannot see, so they always go to the LLM.
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|that|this|those|these|them|they|same|above|previous|again|else)\b",
+    re.IGNORECASE,
+)
+
+STOP_WORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "you", "your", "is", "are", "am",
+    "do", "does", "can", "could", "should", "would", "to", "for", "of", "on",
+    "in", "at", "and", "or", "what", "which", "when", "where", "how", "that",
+    "this", "it", "be", "there", "any", "some", "with", "about", "need",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return [t for t in tokens if t not in STOP_WORDS]
+
+
+class NaiveBayesRouter:
+    """Multinomial naive Bayes over the three agent labels."""
+
+    def __init__(self, examples):
+        self.class_counts = Counter()
+        self.token_counts = defaultdict(Counter)
+        self.vocab = set()
+        for text, agent in examples:
+            tokens = tokenize(text)
+            self.class_counts[agent] += 1
+            self.token_counts[agent].update(tokens)
+            self.vocab.update(tokens)
+        self.total_tokens = {
+            agent: sum(counts.values()) for agent, counts in self.token_counts.items()
+        }
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        tokens = [t for t in tokenize(text) if t in self.vocab]
+        total_docs = sum(self.class_counts.values())
+        vocab_size = len(self.vocab)
+        log_scores = {}
+        for agent in AGENTS:
+            score = math.log(self.class_counts[agent] / total_docs)
+            denom = self.total_tokens[agent] + vocab_size
+            for t in tokens:
+                score += math.log((self.token_counts[agent][t] + 1) / denom)
+            log_scores[agent] = score
+        top = max(log_scores.values())
+        exp_scores = {a: math.exp(s - top) for a, s in log_scores.items()}
+        norm = sum(exp_scores.values())
+        return {a: s / norm for a, s in exp_scores.items()}
+
+
+classifier = NaiveBayesRouter(TRAINING_EXAMPLES)
+
+
+def is_follow_up(query: str, history: Optional[List[Dict[str, Any]]] = None) -> bool:
+    return bool(history) and bool(FOLLOW_UP_PATTERN.search(query))
+
+
+def match_rules(query: str) -> List[str]:
+    return [
+        agent
+        for agent, patterns in COMPILED_RULES.items()
+        if any(p.search(query) for p in patterns)
+    ]
+
+
+def predict(query: str) -> Dict[str, Any]:
+    """
+    Score a query locally.
+    Returns the predicted agent and a confidence in [0, 1]; confidence is 0
+    when the keyword rules see more than one intent or contradict the classifier.
+    "probability" is the classifier's own score for the agent either way.
+    """
+    rule_agents = match_rules(query)
+    proba = classifier.predict_proba(query)
+    agent = max(proba, key=proba.get)
+    confidence = proba[agent]
+    prediction = {"agent": agent, "probability": proba[agent]}
+
+    if len(rule_agents) > 1:
+        # Multi-intent questions need the LLM to split them into subqueries
+        return dict(prediction, confidence=0.0, reason="multiple intents")
+
+    if rule_agents:
+        if rule_agents[0] != agent:
+            return dict(prediction, confidence=0.0, reason="rules disagree")
+        # Rules and classifier agree: halve the remaining uncertainty
+        confidence = 1.0 - (1.0 - confidence) / 2
+        return dict(prediction, confidence=confidence, reason="rules + classifier")
+
+    return dict(prediction, confidence=confidence, reason="classifier only")
+
+
+# Stats -----------------------------------------------------------------------
+
+
+class RouterStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.total = 0
+        self.hits = 0
+        self.compared = 0
+        self.agreed = 0
+        # confidence bucket (0.0, 0.1, ... 0.9) -> [compared, agreed]
+        self.buckets = defaultdict(lambda: [0, 0])
+
+    def record_decision(self, hit: bool):
+        with self.lock:
+            self.total += 1
+            if hit:
+                self.hits += 1
+
+    def record_comparison(self, confidence: float, agreed: bool):
+        bucket = min(int(confidence * 10), 9) / 10
+        with self.lock:
+            self.compared += 1
+            self.buckets[bucket][0] += 1
+            if agreed:
+                self.agreed += 1
+                self.buckets[bucket][1] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "total": self.total,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.total if self.total else 0.0,
+                "compared": self.compared,
+                "agreement": self.agreed / self.compared if self.compared else 0.0,
+                "agreement_by_confidence": {
+                    bucket: agreed / compared
+                    for bucket, (compared, agreed) in sorted(self.buckets.items())
+                },
+            }
+
+
+stats = RouterStats()
+
+
+def router_stats() -> Dict[str, Any]:
+    return stats.summary()
+
+
+# Routing entry points ----------------------------------------------------------
+
+
+def fast_route(query: str, history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Try to route a query without the LLM.
+    Returns the local prediction plus "parsed", which holds the coordinator's
+    {"delegate": true, "subqueries": [...]} structure on a fast-path hit and
+    None when the query should fall back to the LLM router.
+    """
+    prediction = predict(query)
+    if is_follow_up(query, history):
+        prediction["confidence"] = 0.0
+        prediction["reason"] = "follow-up question"
+    hit = FAST_ROUTER_ENABLED and prediction["confidence"] >= FAST_ROUTER_THRESHOLD
+    stats.record_decision(hit)
+
+    prediction["parsed"] = None
+    if hit:
+        prediction["parsed"] = {
+            "delegate": True,
+            "subqueries": [{"agent": prediction["agent"], "query": query}],
+        }
+
+    print(
+        f"[FAST ROUTER] {'HIT' if hit else 'FALLBACK'} agent={prediction['agent']} "
+        f"confidence={prediction['confidence']:.2f} ({prediction['reason']})")
+    return prediction
+
+
+def record_llm_route(prediction: Dict[str, Any], llm_parsed: Optional[Dict[str, Any]]):
+    """Compare a local prediction against what the LLM router decided."""
+    if not isinstance(llm_parsed, dict) or llm_parsed.get("delegate") is not True:
+        agreed = False
+    else:
+        llm_agents = {sub.get("agent") for sub in llm_parsed.get("subqueries", [])}
+        agreed = llm_agents == {prediction["agent"]}
+    stats.record_comparison(prediction["confidence"], agreed)
+    return agreed
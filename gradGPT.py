@@ -1,13 +1,23 @@
 from urllib import response
 
-import gradio as gr
+from startup import timed, warm_up_in_background, print_startup_report
+
+with timed("import", "gradio"):
+    import gradio as gr
 from dotenv import load_dotenv
-import plotly.express as px
-from supabase import create_client, Client
-from coordinator import process_message
+with timed("import", "plotly"):
+    import plotly.express as px
+with timed("import", "supabase"):
+    from supabase import create_client, Client
+with timed("import", "coordinator"):
+    from coordinator import process_message_stream_async, WARM_UP_LOADERS
+from async_runtime import run_in_runtime, iterate_in_runtime
+from db import get_async_supabase
+from tracing import span, start_request
 import os
 import requests
-import pandas as pd
+with timed("import", "pandas"):
+    import pandas as pd
 
 load_dotenv()
 
@@ -108,6 +118,12 @@ def sync_and_refresh(df, email):
     # Fetch updated notifications
     return fetch_notifications(user_id)
 
+async def find_user_id_async(email):
+    sb = await get_async_supabase()
+    with span("supabase", table="Users", call_site="find_user_id"):
+        response = await sb.table("Users").select("id").eq("email", email).execute()
+    return response.data[0]["id"] if response.data else None
+
 def save_courses(email, completed, current, planned):
     completed = completed or []
     current = current or []
@@ -387,18 +403,28 @@ with gr.Blocks(title="GradGPT Dashboard") as demo:
             )
             send_btn = gr.Button("Send", scale=1)
 
-        # Calls coordinator logic to process message
+        # Calls coordinator logic to process message, streaming the reply
+        # into the chat as tokens arrive
         
-        def chat_handler(message, history, email):
+        async def chat_handler(message, history, email):
             if not message:
-                return history, history, ""
+                yield history, history, ""
+                return
+
+            # One request id covers the user lookup and the whole turn
+            request_id = start_request()
 
             # Get user_id from email
-            response = supabase.table("Users").select("id").eq("email", email).execute()
-            user_id = response.data[0]["id"] if response.data else None
+            user_id = await run_in_runtime(find_user_id_async(email))
 
-            updated_history = process_message(message, history, user_id=user_id)
-            return updated_history, updated_history, ""
+            # The pipeline runs on the shared async runtime, so a waiting chat
+            # does not hold a worker thread
+            async for updated_history in iterate_in_runtime(
+                process_message_stream_async(
+                    message, history, user_id=user_id, request_id=request_id
+                )
+            ):
+                yield updated_history, updated_history, ""
 
         send_btn.click(
             chat_handler,
@@ -453,4 +479,9 @@ with gr.Blocks(title="GradGPT Dashboard") as demo:
 
 
 if __name__ == "__main__":
-    demo.launch()
+    # Serve first, then warm the agent caches in the background
+    with timed("loader", "gradio_launch"):
+        demo.launch(prevent_thread_lock=True)
+    print_startup_report("Dashboard serving")
+    warm_up_in_background(WARM_UP_LOADERS)
+    demo.block_thread()
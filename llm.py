@@ -0,0 +1,230 @@
+import asyncio
+import email.utils
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from openai import AsyncAzureOpenAI
+
+from async_runtime import loop_local
+from llm_usage import charge_turn, record_usage
+from single_flight import llm_flight, stable_key
+from tracing import span
+from turn_deadline import DeadlineExceeded, remaining_time, time_allowance
+
+# Shared Azure OpenAI client for every agent. One pooled client per event
+# loop, a cap on concurrent requests, per-call-site timeouts, and retries
+# with exponential backoff and jitter on throttling and server errors, so
+# one 429 no longer fails a whole turn.
+
+load_dotenv()
+
+endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT", "https://gradgpt-openai.openai.azure.com/")
+deployment = os.environ.get("AZURE_OPENAI_DEPLOYMENT", "gradgpt-chat")
+api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
+subscription_key = os.environ.get("Azure_API_Key")
+
+# Connection pool shared by all calls on a loop
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_KEEPALIVE = int(os.environ.get("LLM_MAX_KEEPALIVE", "16"))
+
+# Requests in flight at once; the rest wait for a slot instead of piling
+# onto an already throttled deployment
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "12"))
+
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "20"))
+
+# Seconds per attempt. Routing is on the critical path of every turn, so it
+# gives up quickly; long answers get more room.
+CALL_SITE_TIMEOUTS = {
+    "ask_coordinator": 30,
+    "classify_and_extract": 20,
+    "extract_relevant_tags": 20,
+    "analyze_query": 20,
+    "semantic_topic_filter": 45,
+    "rank_resources": 45,
+    "answer_student_query": 60,
+    "answer_kb_query": 60,
+    "synthesize_response": 60,
+    "synthesize_response_stream": 60,
+}
+DEFAULT_LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "45"))
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def build_client() -> AsyncAzureOpenAI:
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=60,
+        ),
+        timeout=httpx.Timeout(DEFAULT_LLM_TIMEOUT, connect=10),
+    )
+    return AsyncAzureOpenAI(
+        api_version=api_version,
+        azure_endpoint=endpoint,
+        api_key=subscription_key,
+        http_client=http_client,
+        # Retries are handled here so they share the backoff policy and
+        # show up in the traces
+        max_retries=0,
+    )
+
+
+get_client = loop_local(build_client)
+get_slots = loop_local(lambda: asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+
+
+async def warm_up():
+    """Build this loop's client and connection pool ahead of the first call."""
+    get_client()
+    get_slots()
+
+
+def call_site_timeout(call_site: str) -> float:
+    return CALL_SITE_TIMEOUTS.get(call_site, DEFAULT_LLM_TIMEOUT)
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS or exc.status_code >= 500
+    return False
+
+
+def retry_after(exc: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After(-ms) headers."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_ms = headers.get("retry-after-ms")
+    if retry_ms:
+        try:
+            return float(retry_ms) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def backoff_delay(attempt: int, exc: Exception) -> float:
+    """Server-requested delay if given, otherwise full-jitter exponential backoff."""
+    requested = retry_after(exc)
+    if requested is not None:
+        return min(requested, LLM_BACKOFF_MAX)
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+async def create_with_retries(call_site: str, s, **kwargs):
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        # Each attempt gets the call site's timeout or what is left of the
+        # turn, whichever is shorter
+        timeout = time_allowance(call_site_timeout(call_site), call_site)
+        try:
+            async with get_slots():
+                return await get_client().chat.completions.create(
+                    model=deployment, timeout=timeout, **kwargs)
+        except Exception as exc:
+            if attempt >= LLM_MAX_RETRIES or not is_retryable(exc):
+                raise
+            delay = backoff_delay(attempt, exc)
+            remaining = remaining_time()
+            if remaining is not None and delay >= remaining:
+                # Waiting out the backoff would miss the deadline anyway
+                raise
+            s.set(retries=attempt + 1)
+            print(
+                f"[LLM] {call_site} attempt {attempt + 1} failed "
+                f"({type(exc).__name__}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+def prompt_key(call_site: str, messages: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+    """Identical prompts, ignoring differences in whitespace, share a key."""
+    normalized = [
+        {"role": m.get("role"), "content": " ".join(str(m.get("content") or "").split())}
+        for m in messages
+    ]
+    return stable_key(call_site, deployment, normalized, kwargs)
+
+
+async def chat_completion(call_site: str, messages: List[Dict[str, Any]], **kwargs):
+    """
+    Create a chat completion on the shared client. Returns the full response.
+    Concurrent calls with the same prompt share one request.
+    """
+    async def call():
+        # Shared by every turn asking this prompt, so it runs under none of
+        # their deadlines or budgets: it gets the call site's timeout and goes
+        # into the ledger once, and each caller charges its own turn below
+        with span("llm", call_site=call_site) as s:
+            response = await create_with_retries(call_site, s, messages=messages, **kwargs)
+            record_usage(s, response)
+            return response
+
+    response = await llm_flight.do(prompt_key(call_site, messages, kwargs), call)
+    charge_turn(response)
+    return response
+
+
+async def stream_chat_completion(
+    call_site: str, messages: List[Dict[str, Any]], **kwargs
+) -> AsyncIterator[str]:
+    """
+    Stream a chat completion, yielding text deltas. Only opening the stream
+    is retried; once text has been yielded a failure is raised to the caller.
+    Raises DeadlineExceeded if the turn's deadline passes mid-stream.
+    """
+    with span("llm", call_site=call_site) as s:
+        stream = await create_with_retries(
+            call_site, s, messages=messages, stream=True,
+            stream_options={"include_usage": True}, **kwargs)
+
+        chunks = stream.__aiter__()
+        try:
+            while True:
+                # Opening the stream was bounded by the turn deadline; each
+                # read is too, so a stalled stream cannot outlive the turn
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining_time())
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(f"{call_site} stream ran past the turn deadline") from None
+                # Azure sends an initial chunk with prompt filter results and no
+                # choices; the final chunk carries usage and no choices either
+                if chunk.usage is not None:
+                    record_usage(s, chunk)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if "first_token_ms" not in s.attrs:
+                        s.set(first_token_ms=round((time.perf_counter() - s.started) * 1000, 3))
+                    yield delta
+        finally:
+            # A consumer that stops early (client disconnect, deadline) must
+            # not leave the HTTP response open
+            await stream.close()
@@ -0,0 +1,171 @@
+import contextvars
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import tracing
+
+# Token and cost accounting for every LLM call. Each call site passes its
+# response through record_usage(); the ledger aggregates prompt and
+# completion tokens per call site, per agent and per user, and the current
+# turn's budget is charged so later calls in the same turn can cut back.
+
+TURN_TOKEN_BUDGET = int(os.environ.get("TURN_TOKEN_BUDGET", "60000"))
+
+# USD per 1K tokens, used for the cost column of the report
+PROMPT_COST_PER_1K = float(os.environ.get("LLM_PROMPT_COST_PER_1K", "0.0025"))
+COMPLETION_COST_PER_1K = float(os.environ.get("LLM_COMPLETION_COST_PER_1K", "0.01"))
+
+# Trimmed contexts never shrink below this, so a late call can still answer
+MIN_CONTEXT_TOKENS = 500
+
+# Kept back for the coordinator's synthesis call at the end of the turn
+SYNTHESIS_RESERVE_TOKENS = int(os.environ.get("SYNTHESIS_RESERVE_TOKENS", "4000"))
+
+current_user_id = contextvars.ContextVar("current_user_id", default=None)
+current_agent = contextvars.ContextVar("current_agent", default=None)
+current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+class TurnBudget:
+    """Tokens spent so far in one chat turn, shared by every agent it fans out to."""
+
+    def __init__(self, limit: int = TURN_TOKEN_BUDGET):
+        self.limit = limit
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def spend(self, tokens: int):
+        with self.lock:
+            self.used += tokens
+
+    def remaining(self) -> int:
+        return max(self.limit - self.used, 0)
+
+
+def start_turn(user_id=None, limit: int = TURN_TOKEN_BUDGET) -> TurnBudget:
+    budget = TurnBudget(limit)
+    current_turn.set(budget)
+    current_user_id.set(user_id)
+    current_agent.set(None)
+    return budget
+
+
+def set_agent(agent: Optional[str]):
+    current_agent.set(agent)
+
+
+def remaining_turn_tokens() -> Optional[int]:
+    """Tokens left in the current turn, or None outside a turn."""
+    budget = current_turn.get()
+    return budget.remaining() if budget is not None else None
+
+
+def budget_nearly_spent(reserve: int) -> bool:
+    """True when fewer than `reserve` tokens are left in the current turn."""
+    remaining = remaining_turn_tokens()
+    return remaining is not None and remaining < reserve
+
+
+def context_allowance(default_tokens: int, reserve: int) -> int:
+    """
+    How many tokens of context a call may send: the default, cut down so
+    `reserve` tokens remain for the rest of the turn.
+    """
+    remaining = remaining_turn_tokens()
+    if remaining is None:
+        return default_tokens
+    return max(min(default_tokens, remaining - reserve), MIN_CONTEXT_TOKENS)
+
+
+def call_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    return (prompt_tokens * PROMPT_COST_PER_1K
+            + completion_tokens * COMPLETION_COST_PER_1K) / 1000
+
+
+class UsageLedger:
+    """Running token totals, grouped by call site, agent and user."""
+
+    GROUPS = ("call_site", "agent", "user")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.totals = {
+                group: defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+                for group in self.GROUPS
+            }
+
+    def record(self, call_site: str, agent, user, prompt_tokens: int, completion_tokens: int):
+        keys = {"call_site": call_site, "agent": agent or "coordinator", "user": user}
+        with self.lock:
+            for group, key in keys.items():
+                row = self.totals[group][str(key)]
+                row["calls"] += 1
+                row["prompt_tokens"] += prompt_tokens
+                row["completion_tokens"] += completion_tokens
+
+    def report(self, by: str = "call_site") -> List[Dict[str, Any]]:
+        """Rows for one grouping, most expensive first."""
+        if by not in self.GROUPS:
+            raise ValueError(f"by must be one of {self.GROUPS}, got {by!r}")
+        with self.lock:
+            rows = [
+                dict(row, **{by: key,
+                             "total_tokens": row["prompt_tokens"] + row["completion_tokens"],
+                             "cost": round(call_cost(row["prompt_tokens"], row["completion_tokens"]), 6)})
+                for key, row in self.totals[by].items()
+            ]
+        return sorted(rows, key=lambda row: -row["total_tokens"])
+
+
+ledger = UsageLedger()
+
+
+def record_usage(s: tracing.Span, response) -> tracing.Span:
+    """
+    Record token usage from an OpenAI response (or final stream chunk) on the
+    span, in the ledger, and against the current turn's budget.
+    """
+    tracing.record_usage(s, response)
+    prompt_tokens = s.attrs.get("prompt_tokens")
+    completion_tokens = s.attrs.get("completion_tokens")
+    if prompt_tokens is None and completion_tokens is None:
+        return s
+    prompt_tokens = prompt_tokens or 0
+    completion_tokens = completion_tokens or 0
+
+    ledger.record(
+        s.attrs.get("call_site", s.name), current_agent.get(), current_user_id.get(),
+        prompt_tokens, completion_tokens)
+
+    budget = current_turn.get()
+    if budget is not None:
+        budget.spend(prompt_tokens + completion_tokens)
+    return s
+
+
+def charge_turn(response):
+    """Charge a response's tokens to the current turn's budget, if any."""
+    budget = current_turn.get()
+    usage = getattr(response, "usage", None)
+    if budget is None or usage is None:
+        return
+    budget.spend((getattr(usage, "prompt_tokens", None) or 0)
+                 + (getattr(usage, "completion_tokens", None) or 0))
+
+
+def usage_report(by: str = "call_site") -> List[Dict[str, Any]]:
+    return ledger.report(by)
+
+
+def print_usage_report(by: str = "call_site"):
+    print(f"{by:<30} {'calls':>7} {'prompt':>10} {'completion':>11} {'cost $':>10}")
+    for row in usage_report(by):
+        print(
+            f"{row[by]:<30} {row['calls']:>7} {row['prompt_tokens']:>10} "
+            f"{row['completion_tokens']:>11} {row['cost']:>10.4f}")
@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from services.notif import (
-    generate_notifications,
-    mark_as_read
+    generate_notifications_async,
+    mark_as_read_async
 )
 from services.user import *
 from pydantic import BaseModel
@@ -10,12 +10,12 @@ from typing import List
 app = FastAPI()
 
 @app.get("/notifications/{user_id}")
-def get_notifications(user_id: str):
-    return generate_notifications(user_id)
+async def get_notifications(user_id: str):
+    return await generate_notifications_async(user_id)
 
 @app.post("/notifications/read/{notification_id}")
-def read_notification(notification_id: str):
-    mark_as_read(notification_id)
+async def read_notification(notification_id: str):
+    await mark_as_read_async(notification_id)
     return {"message": "Notification marked as read"}
 
 class CourseUpdate(BaseModel):
@@ -24,8 +24,8 @@ class CourseUpdate(BaseModel):
     planned: List[str] = []
 
 @app.post("/users/{user_id}/courses")
-def update_user_courses(user_id: int, payload: CourseUpdate):
+async def update_user_courses(user_id: int, payload: CourseUpdate):
 
-    handle_term_transition(user_id)
+    await handle_term_transition_async(user_id)
 
-    return update_courses_in_db(user_id, payload)
\ No newline at end of file
+    return await update_courses_in_db_async(user_id, payload)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+from search_index import tokenize
+from tokens import estimate_tokens, truncate_to_tokens
+
+# Candidate context for ResourceAgent.rank_resources, built to a hard token
+# budget. Candidates are pre-scored against the query locally, each one
+# gets an equal share of what is left after the fixed title/link lines,
+# descriptions are cut down to their most query-relevant sentences, and
+# candidates that no longer fit are dropped from the tail.
+
+RANKING_CONTEXT_TOKENS = int(os.environ.get("RANKING_CONTEXT_TOKENS", "2500"))
+
+# A candidate is dropped rather than shown with less description than this
+MIN_DESCRIPTION_TOKENS = 25
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def candidate_header(index: int, r: Dict[str, Any]) -> str:
+    return (
+        f"[{index}]\nTitle: {r.get('title', '')}\nLink: {r.get('link', '')}\n"
+        f"Source: {r.get('source', '')}\nTags: {', '.join(r.get('tags', []))}"
+    )
+
+
+def format_candidate(index: int, r: Dict[str, Any], description: str) -> str:
+    return candidate_header(index, r) + f"\nDescription: {description}"
+
+
+def prescore(r: Dict[str, Any], query_terms: set) -> float:
+    """Query-term overlap of a candidate, plus its local search score."""
+    title_terms = set(tokenize(r.get("title", "") or ""))
+    text_terms = set(tokenize(r.get("description", "") or "")) | {t.lower() for t in r.get("tags", [])}
+    return 2 * len(query_terms & title_terms) + len(query_terms & text_terms) + (r.get("score") or 0.0)
+
+
+def compress_description(description: str, query_terms: set, max_tokens: int) -> str:
+    """The description's most query-relevant sentences, in order, within max_tokens."""
+    description = " ".join((description or "").split())
+    if estimate_tokens(description) <= max_tokens:
+        return description
+    sentences = [s for s in SENTENCE_RE.split(description) if s]
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-len(query_terms & set(tokenize(sentences[i]))), i))
+    kept, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost > max_tokens:
+            continue
+        kept.append(i)
+        used += cost
+    if not kept:
+        return truncate_to_tokens(sentences[ranked[0]], max_tokens)
+    return " ".join(sentences[i] for i in sorted(kept))
+
+
+def build_ranking_context(
+    query: str, candidates: List[Dict[str, Any]], budget: int = RANKING_CONTEXT_TOKENS
+) -> Tuple[str, List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Returns (context, candidates in the order shown, stats). Stats compare
+    the context against the one listing every candidate in full.
+    """
+    query_terms = set(tokenize(query))
+    ordered = sorted(candidates, key=lambda r: -prescore(r, query_terms))
+    full_tokens = estimate_tokens("\n\n".join(
+        format_candidate(i, r, r.get("description", "")) for i, r in enumerate(candidates, start=1)))
+
+    # Keep the best candidates whose headers and minimum descriptions fit
+    shown, fixed = [], 0
+    for r in ordered:
+        cost = estimate_tokens(candidate_header(len(shown) + 1, r)) + MIN_DESCRIPTION_TOKENS + 2
+        if fixed + cost > budget and shown:
+            break
+        shown.append(r)
+        fixed += cost
+
+    share = MIN_DESCRIPTION_TOKENS + (max(budget - fixed, 0) // len(shown) if shown else 0)
+    blocks = [
+        format_candidate(i, r, compress_description(r.get("description", ""), query_terms, share))
+        for i, r in enumerate(shown, start=1)
+    ]
+    if fixed > budget:
+        # The best candidate alone is over budget: cut it to fit, leaving
+        # a token for the ellipsis, rather than overrun or show nothing
+        blocks = [truncate_to_tokens(blocks[0], budget - 1)]
+    context = "\n\n".join(blocks)
+    tokens = estimate_tokens(context)
+    stats = {
+        "candidates": len(candidates),
+        "shown": len(shown),
+        "dropped": len(candidates) - len(shown),
+        "tokens": tokens,
+        "full_tokens": full_tokens,
+        "saved_tokens": max(full_tokens - tokens, 0),
+    }
+    return context, shown, stats
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from turn_deadline import DeadlineExceeded, remaining_time
+
+# Per-provider token buckets for the scholarly search APIs. One bucket per
+# provider is shared by every request in the process, whatever loop or
+# thread it runs on, so politeness holds under heavy traffic without the
+# fixed sleeps between providers. Each request takes a token; when the
+# bucket is empty the caller waits until its reserved token is due.
+
+
+def env_rate(name: str, default: str) -> float:
+    return float(os.environ.get(name, default))
+
+
+# provider -> (requests per second, burst)
+RATE_LIMITS = {
+    "arxiv": (env_rate("ARXIV_RATE_PER_S", "1"), env_rate("ARXIV_BURST", "3")),
+    "semantic_scholar": (env_rate("SEMANTIC_SCHOLAR_RATE_PER_S", "1"),
+                         env_rate("SEMANTIC_SCHOLAR_BURST", "3")),
+    "google_scholar": (env_rate("SERPAPI_RATE_PER_S", "2"), env_rate("SERPAPI_BURST", "5")),
+}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.acquired = 0
+        self.waited_s = 0.0
+
+    def reserve(self) -> float:
+        """Take a token, returning how many seconds to wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens may go negative: later callers queue behind earlier ones
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.acquired += 1
+            self.waited_s += wait
+            return wait
+
+    def give_back(self):
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    async def acquire(self, name: str = "request") -> float:
+        """
+        Wait for a token. Raises DeadlineExceeded without waiting when the
+        token would only be due after the turn's deadline.
+        """
+        wait = self.reserve()
+        remaining = remaining_time()
+        if remaining is not None and wait >= remaining:
+            self.give_back()
+            raise DeadlineExceeded(f"{name} rate limit wait of {wait:.2f}s is past the deadline")
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            return {
+                "rate_per_s": self.rate,
+                "burst": self.burst,
+                "acquired": self.acquired,
+                "waited_s": round(self.waited_s, 3),
+            }
+
+
+limiters: Dict[str, TokenBucket] = {}
+limiters_lock = threading.Lock()
+
+
+def limiter_for(provider: str) -> Optional[TokenBucket]:
+    """The shared bucket for a provider, or None if it is not rate limited."""
+    with limiters_lock:
+        bucket = limiters.get(provider)
+        if bucket is None and provider in RATE_LIMITS:
+            bucket = limiters[provider] = TokenBucket(*RATE_LIMITS[provider])
+        return bucket
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, float]]:
+    with limiters_lock:
+        return {provider: bucket.stats() for provider, bucket in limiters.items()}
@@ -1,15 +1,31 @@
+import asyncio
 import json
 import os
 import re
+import threading
 import time
 import urllib.parse
-import urllib.request
+import weakref
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Any
+from collections import defaultdict
+from typing import List, Dict, Any, NamedTuple, Optional
 from dotenv import load_dotenv
 
-from openai import AzureOpenAI
-from supabase import create_client, Client
+import httpx
+
+import analysis_cache
+from async_runtime import in_runtime_thread, loop_local, run_sync
+from llm import chat_completion
+from candidate_merge import merge_candidates
+from db import select_async
+from llm_usage import context_allowance, SYNTHESIS_RESERVE_TOKENS
+from rate_limit import limiter_for
+from ranking_context import RANKING_CONTEXT_TOKENS, build_ranking_context
+import scholarly_cache
+from search_index import ResourceIndex, extract_query_terms
+from single_flight import http_flight
+from tracing import span
+from turn_deadline import time_allowance
 
 load_dotenv()
 
@@ -18,21 +34,75 @@ DEBUG = False
 MODEL_ID = "gradgpt-chat"
 SUPABASE_RESOURCES_TABLE = "resources"
 
-endpoint = "https://gradgpt-openai.openai.azure.com/"
-deployment = "gradgpt-chat"
-api_version = "2024-12-01-preview"
-subscription_key = os.environ.get("Azure_API_Key")
-
 
 SUPABASE_KNOWLEDGE_TABLE = "KnowledgeBase"
 RESOURCE_AGENT_ID = "2"
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+
+# Seconds between background pulls of changed KnowledgeBase rows (0 turns
+# the refresher off). Rows are pulled from the sync column's watermark on.
+# Unless RESOURCE_SYNC_COLUMN names one, the column is "updated_at" when the
+# table has it, which picks up new and edited rows. Otherwise it is "id",
+# which only sees new rows: edits then wait for the next restart.
+RESOURCE_REFRESH_INTERVAL = float(os.environ.get("RESOURCE_REFRESH_INTERVAL", "300"))
+RESOURCE_SYNC_COLUMN = os.environ.get("RESOURCE_SYNC_COLUMN", "")
+UPDATED_AT_COLUMN = "updated_at"
+
+# Every this many refreshes, only the ids are read to drop deleted rows
+RESOURCE_RECONCILE_EVERY = int(os.environ.get("RESOURCE_RECONCILE_EVERY", "12"))
 
 
 SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
 
+# "two_call" analyzes the query with the LLM before retrieval and ranks
+# after it. "single_call" extracts keywords locally and makes one LLM call
+# that both judges the request and ranks the candidates.
+RESOURCE_PIPELINES = ("two_call", "single_call")
+RESOURCE_PIPELINE = os.environ.get("RESOURCE_PIPELINE", "two_call")
+
+# Topic terms joined into the provider search string in single_call mode
+MAX_PROVIDER_QUERY_TERMS = 6
+
+# Seconds to wait for a response (read) and to open a connection
+HTTP_TIMEOUT = 15
+HTTP_CONNECT_TIMEOUT = 5
+
+# Keep-alive pool shared by every scholarly request on a loop, so repeated
+# calls to the same provider skip DNS, TCP and TLS setup
+SCHOLARLY_MAX_CONNECTIONS = int(os.environ.get("SCHOLARLY_MAX_CONNECTIONS", "20"))
+SCHOLARLY_MAX_KEEPALIVE = int(os.environ.get("SCHOLARLY_MAX_KEEPALIVE", "10"))
+SCHOLARLY_MAX_PER_HOST = int(os.environ.get("SCHOLARLY_MAX_PER_HOST", "4"))
+
+HTTP_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "User-Agent": "GradGPT/1.0 (Cal Poly CS graduate advising assistant)",
+}
+
+
+def build_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=transport,
+        limits=httpx.Limits(
+            max_connections=SCHOLARLY_MAX_CONNECTIONS,
+            max_keepalive_connections=SCHOLARLY_MAX_KEEPALIVE,
+            keepalive_expiry=60,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        headers=HTTP_HEADERS,
+        follow_redirects=True,
+    )
+
+
+get_http_client = loop_local(build_http_client)
+
+# httpx bounds the pool as a whole; this bounds the connections to any one host
+get_host_slots = loop_local(lambda: defaultdict(lambda: asyncio.Semaphore(SCHOLARLY_MAX_PER_HOST)))
+
+
+async def warm_up_http():
+    """Build this loop's scholarly HTTP client ahead of the first search."""
+    get_http_client()
+
+
 # Prompts -----------------------------------------------------------------
 
 
@@ -101,64 +171,239 @@ AVAILABLE RESOURCES:
 """
 
 
+RESOURCE_SELECT_AND_RANK_PROMPT = """
+You are a research support assistant for Computer Science Master's students.
+
+First decide whether the student is asking for resources (papers, books,
+tutorials, courses, datasets, tools, surveys). If not, return
+{{"is_resource_request": false, "ranked": []}}.
+
+Otherwise recommend ONLY resources listed below.
+You must NEVER invent links or tools.
+
+Your task:
+- Select the most relevant resources
+- Rank them by relevance to student's query
+- Return at most 5
+- Briefly explain why each is useful
+- Always include the link EXACTLY as provided
+- Return valid JSON only with this schema:
+{{
+  "is_resource_request": true/false,
+  "ranked": [
+    {{
+      "title": "string",
+      "link": "string",
+      "source": "local|arxiv|semantic_scholar|google_scholar",
+      "why": "short sentence"
+    }}
+  ]
+}}
+
+Student query:
+{query}
+
+AVAILABLE RESOURCES:
+{resource_context}
+"""
+
+
 # Resource Agent Class --------------------------------------------------------
 
 
+class ResourceSnapshot(NamedTuple):
+    """Everything derived from one version of the resources, swapped as a unit."""
+    resources: List[Dict[str, Any]]
+    available_tags: set
+    index: ResourceIndex
+    watermark: Any
+
+
 class ResourceAgent:
-    def __init__(self):
-        self.client = AzureOpenAI(
-            api_version=api_version,
-            azure_endpoint=endpoint,
-            api_key=subscription_key,
+    def __init__(self, pipeline: str = None):
+        self.pipeline = pipeline or RESOURCE_PIPELINE
+        if self.pipeline not in RESOURCE_PIPELINES:
+            raise ValueError(f"Unknown resource pipeline: {self.pipeline}")
+        # Resources are loaded on first use so constructing the agent is free
+        self._snapshot: Optional[ResourceSnapshot] = None
+        self._load_lock = None
+        self._swap_lock = threading.Lock()
+        self._refresher = None
+        self._refreshes = 0
+        self._sync_column = RESOURCE_SYNC_COLUMN or "id"
+
+    @property
+    def resources_list(self) -> List[Dict[str, Any]]:
+        # Async callers await ensure_loaded_async() first; this covers sync use
+        if self._snapshot is None and not in_runtime_thread():
+            self.ensure_loaded()
+        return self._snapshot.resources if self._snapshot else []
+
+    @resources_list.setter
+    def resources_list(self, resources: List[Dict[str, Any]]):
+        # Readers hold on to one snapshot, so they never see the new
+        # resources with the old index or tags
+        self._snapshot = self._build_snapshot(resources)
+
+    @property
+    def available_tags(self) -> set:
+        return self._snapshot.available_tags if self._snapshot else set()
+
+    def _build_snapshot(self, resources: List[Dict[str, Any]]) -> ResourceSnapshot:
+        column = self._sync_column
+        values = [r.get(column) for r in resources if r.get(column) is not None]
+        return ResourceSnapshot(
+            resources=resources,
+            available_tags=self._load_available_tags(resources),
+            index=ResourceIndex(resources),
+            watermark=max(values) if values else None,
         )
-        self.resources_list = self._load_resources_from_supabase()
-        self.available_tags = self._load_available_tags(self.resources_list)
+
+    async def ensure_loaded_async(self) -> List[Dict[str, Any]]:
+        if self._snapshot is not None:
+            return self._snapshot.resources
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self._snapshot is None:
+                resources = await self._load_resources_from_supabase_async()
+                # An empty result is not kept, so a failed load is retried.
+                # Indexing a large KB would stall every turn on the loop.
+                if resources:
+                    self._snapshot = await asyncio.to_thread(self._build_snapshot, resources)
+                    self.ensure_refresher()
+        return self.resources_list if self._snapshot else []
+
+    def ensure_loaded(self) -> List[Dict[str, Any]]:
+        return run_sync(self.ensure_loaded_async())
 
     def _load_resources_from_supabase(self) -> List[Dict[str, Any]]:
+        return run_sync(self._load_resources_from_supabase_async())
+
+    async def _load_resources_from_supabase_async(self) -> List[Dict[str, Any]]:
         try:
-            sb = supabase
-            response = (
-                sb.table("KnowledgeBase")
-                .select("*")
-                .contains("agentIds", ["2"])
-                .execute()
-            )
-            rows = response.data or []
-            resources = []
-            for r in rows:
-                tags = r.get("tags", [])
-                if isinstance(tags, str):
-                    tags = json.loads(tags) if tags else []
-                resources.append(
-                    {
-                        "id": r.get("id"),
-                        "title": r.get("title", ""),
-                        "description": r.get("content", ""),
-                        "url": r.get("sourceURL", ""),
-                        "tags": tags,
-                    }
-                )
-            return resources
+            rows = await select_async(
+                SUPABASE_KNOWLEDGE_TABLE, contains={"agentIds": [RESOURCE_AGENT_ID]}) or []
+            if rows and not RESOURCE_SYNC_COLUMN:
+                self._sync_column = UPDATED_AT_COLUMN if UPDATED_AT_COLUMN in rows[0] else "id"
+            return [self._resource_from_row(r) for r in rows]
         except Exception as e:
             if DEBUG:
                 print(f"Supabase load error: {e}")
             return []
 
+    def _resource_from_row(self, r: Dict[str, Any]) -> Dict[str, Any]:
+        tags = r.get("tags", [])
+        if isinstance(tags, str):
+            tags = json.loads(tags) if tags else []
+        resource = {
+            "id": r.get("id"),
+            "title": r.get("title", ""),
+            "description": r.get("content", ""),
+            "url": r.get("sourceURL", ""),
+            "tags": tags,
+        }
+        if self._sync_column != "id":
+            resource[self._sync_column] = r.get(self._sync_column)
+        return resource
+
     def _load_available_tags(self, resources: List[Dict]) -> set:
         return {tag.lower() for r in resources for tag in r.get("tags", [])}
 
+    # Incremental refresh -----------------------------------------------------
+
+    async def refresh_async(self) -> Dict[str, int]:
+        """
+        Pull the knowledge rows at or past the sync watermark and apply
+        them, and every RESOURCE_RECONCILE_EVERY refreshes drop resources
+        whose rows are gone. Returns counts of added, updated and removed.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            await self.ensure_loaded_async()
+            return {"added": 0, "updated": 0, "removed": 0}
+        contains = {"agentIds": [RESOURCE_AGENT_ID]}
+        self._refreshes += 1
+        # Rows at the watermark are pulled again (and skipped if unchanged)
+        # so rows committed with the same value are never missed
+        since = {self._sync_column: snapshot.watermark} if snapshot.watermark is not None else None
+        rows = await select_async(
+            SUPABASE_KNOWLEDGE_TABLE, contains=contains, gte=since,
+            call_site="resource_refresh") or []
+        live_ids = None
+        if self._refreshes % RESOURCE_RECONCILE_EVERY == 0:
+            id_rows = await select_async(
+                SUPABASE_KNOWLEDGE_TABLE, columns="id", contains=contains,
+                call_site="resource_reconcile") or []
+            live_ids = {r.get("id") for r in id_rows}
+        # The new snapshot's index is built off the event loop
+        return await asyncio.to_thread(
+            self._apply_changes, [self._resource_from_row(r) for r in rows], live_ids)
+
+    def refresh(self) -> Dict[str, int]:
+        return run_sync(self.refresh_async())
+
+    def _apply_changes(self, changed: List[Dict[str, Any]], live_ids: Optional[set] = None) -> Dict[str, int]:
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        with self._swap_lock:
+            snapshot = self._snapshot
+            by_id = {r.get("id"): r for r in snapshot.resources}
+            for resource in changed:
+                current = by_id.get(resource["id"])
+                if current is None:
+                    counts["added"] += 1
+                elif current != resource:
+                    counts["updated"] += 1
+                else:
+                    continue
+                by_id[resource["id"]] = resource
+            if live_ids is not None:
+                for resource_id in [i for i in by_id if i not in live_ids]:
+                    del by_id[resource_id]
+                    counts["removed"] += 1
+            if any(counts.values()):
+                self.resources_list = list(by_id.values())
+        if any(counts.values()):
+            print(
+                f"[RESOURCES] Refreshed: {counts['added']} added, {counts['updated']} updated, "
+                f"{counts['removed']} removed, {len(self._snapshot.resources)} total")
+        return counts
+
+    def ensure_refresher(self):
+        if RESOURCE_REFRESH_INTERVAL <= 0 or self._refresher is not None:
+            return
+        # The thread only holds a weak reference, so a discarded agent stops it
+        agent_ref = weakref.ref(self)
+
+        def refresh_periodically():
+            while True:
+                time.sleep(RESOURCE_REFRESH_INTERVAL)
+                agent = agent_ref()
+                if agent is None:
+                    return
+                try:
+                    agent.refresh()
+                except Exception as e:
+                    print(f"[RESOURCES] Refresh failed: {type(e).__name__}: {e}")
+                del agent
+
+        self._refresher = threading.Thread(
+            target=refresh_periodically, name="resource-refresher", daemon=True)
+        self._refresher.start()
+
     # LLM Call ----------------------------------------------------------------
 
-    def _generate(self, prompt: str) -> str:
-        response = self.client.chat.completions.create(
-            model=deployment,
-            messages=[{"role": "user", "content": prompt}],
-        )
+    async def _generate_async(self, prompt: str, call_site: str = "resource_generate") -> str:
+        response = await chat_completion(
+            call_site, [{"role": "user", "content": prompt}])
         text = response.choices[0].message.content or ""
         if DEBUG:
             print(text)
         return text
 
+    def _generate(self, prompt: str, call_site: str = "resource_generate") -> str:
+        return run_sync(self._generate_async(prompt, call_site))
+
     def _safe_json_loads(self, text: str) -> Dict[str, Any]:
         try:
             return json.loads(text)
@@ -171,39 +416,70 @@ class ResourceAgent:
                     return {}
             return {}
 
-    def _normalize(self, text: str) -> str:
-        return re.sub(r"\s+", " ", text.lower()).strip()
-
     # Core Functions ----------------------------------------------------------
 
-    def analyze_query(self, query: str) -> Dict[str, Any]:
+    async def analyze_query_async(self, query: str) -> Dict[str, Any]:
+        cached = analysis_cache.cache.lookup(query)
+        if cached is not None:
+            print(f"[ANALYSIS CACHE] HIT {analysis_cache.analysis_key(query)!r}")
+            return cached
         prompt = RESOURCE_ANALYSIS_PROMPT.format(query=query)
-        response = self._generate(prompt)
+        response = await self._generate_async(prompt, call_site="analyze_query")
         analysis = self._safe_json_loads(response)
-        return analysis if isinstance(analysis, dict) else {}
+        analysis = analysis if isinstance(analysis, dict) else {}
+        # A failed or unparsable analysis is not kept, so the next ask retries
+        analysis_cache.cache.store(query, analysis)
+        return analysis
 
-    def _score_resource(self, r: Dict[str, Any], keywords: List[str]) -> float:
-        if not keywords:
-            return 0.0
-        text = self._normalize(
-            f"{r.get('title', '')} {r.get('description', '')} {' '.join(r.get('tags', []))}"
-        )
-        score = 0.0
-        for kw in keywords:
-            if self._normalize(kw) in text:
-                score += 1.0
-        return score
+    def analyze_query(self, query: str) -> Dict[str, Any]:
+        return run_sync(self.analyze_query_async(query))
+
+    def _analysis_from_params(self, params: Any) -> Optional[Dict[str, Any]]:
+        """
+        The coordinator's routing parameters as an analysis, or None when
+        they are missing or too thin to search with.
+        """
+        if not isinstance(params, dict) or not isinstance(params.get("is_resource_request"), bool):
+            return None
+        if params["is_resource_request"] and not isinstance(params.get("keywords"), list):
+            return None
+        return {"use_online": True, "max_results": 8, **params}
+
+    def local_analysis(self, query: str) -> Dict[str, Any]:
+        """
+        An analysis built from the query's own words, for the single_call
+        pipeline. Whether it is a resource request is left to the ranking call.
+        """
+        keywords, resource_types = extract_query_terms(query)
+        search = " ".join(k for k in keywords if " " not in k)
+        search = " ".join(search.split()[:MAX_PROVIDER_QUERY_TERMS])
+        return {
+            "is_resource_request": True,
+            "user_needs": query,
+            "topics": [],
+            "keywords": keywords,
+            "resource_types": sorted(resource_types),
+            "constraints": [],
+            "use_online": bool(search),
+            "max_results": 8,
+            "arxiv_query": search,
+            "semantic_scholar_query": search,
+            "google_scholar_query": search,
+        }
+
+    async def _analysis_for_async(self, query: str, params: Any = None) -> Dict[str, Any]:
+        analysis = self._analysis_from_params(params)
+        if analysis is not None:
+            return analysis
+        return await self.analyze_query_async(query)
 
     def search_local_resources(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
-        keywords = analysis.get("keywords", []) + analysis.get("topics", [])
-        ranked = []
-        for r in self.resources_list:
-            score = self._score_resource(r, keywords)
-            if score > 0:
-                ranked.append((score, r))
-        ranked.sort(key=lambda x: x[0], reverse=True)
+        keywords = (analysis.get("keywords") or []) + (analysis.get("topics") or [])
+        # Reading resources_list loads them (and builds the index) on first sync use
+        if not self.resources_list:
+            return []
         results = []
-        for score, r in ranked[:15]:
+        for score, r in self._snapshot.index.search(keywords, k=15):
             results.append(
                 {
                     "title": r.get("title", ""),
@@ -216,23 +492,73 @@ class ResourceAgent:
             )
         return results
 
-    def search_arxiv(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+    async def _fetch_async(self, url: str, provider: str = "") -> bytes:
+        async def rate_limited_download():
+            limiter = limiter_for(provider)
+            if limiter is not None:
+                with span("rate_limit", provider=provider) as s:
+                    s.set(wait_ms=round(await limiter.acquire(provider) * 1000, 1))
+            return await self._download_async(url, provider)
+
+        # Concurrent requests for the same URL share one download, and one
+        # rate limit token
+        return await http_flight.do(url, rate_limited_download)
+
+    async def _download_async(self, url: str, provider: str = "") -> bytes:
+        async with get_host_slots()[urllib.parse.urlsplit(url).hostname]:
+            read_timeout = time_allowance(HTTP_TIMEOUT, f"{provider or 'http'} fetch")
+            timeout = httpx.Timeout(read_timeout, connect=min(HTTP_CONNECT_TIMEOUT, read_timeout))
+            with span("http", provider=provider) as s:
+                response = await get_http_client().get(url, timeout=timeout)
+                s.set(status=response.status_code, bytes=len(response.content))
+                response.raise_for_status()
+                return response.content
+
+    async def _cached_search_async(
+        self, provider: str, query: str, max_results: int, search
+    ) -> List[Dict[str, Any]]:
+        """
+        Results from the persistent scholarly cache while fresh, otherwise
+        from search(query, max_results). If the provider fails, an expired
+        cached result is served rather than nothing.
+        """
         if not query:
             return []
+        cache = scholarly_cache.cache
+        cached = None
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, provider, query, max_results)
+            if cached is not None and cached[1]:
+                cache.record("hit")
+                return cached[0]
+            cache.record("miss")
+        try:
+            results = await search(query, max_results)
+        except Exception as e:
+            if cached is None:
+                return []
+            cache.record("stale")
+            print(f"[SCHOLARLY] {provider} failed ({type(e).__name__}), serving cached results")
+            return cached[0]
+        if cache is not None:
+            # Empty results are not kept, e.g. SerpAPI before a key is configured
+            if results:
+                await asyncio.to_thread(cache.put, provider, query, max_results, results)
+        return results
+
+    async def search_arxiv_async(
+        self, query: str, max_results: int = 5
+    ) -> List[Dict[str, Any]]:
+        return await self._cached_search_async("arxiv", query, max_results, self._query_arxiv_async)
+
+    async def _query_arxiv_async(self, query: str, max_results: int) -> List[Dict[str, Any]]:
         encoded = urllib.parse.quote(query)
         url = (
             "http://export.arxiv.org/api/query?"
             f"search_query={encoded}&start=0&max_results={max_results}"
         )
-        try:
-            with urllib.request.urlopen(url, timeout=15) as response:
-                xml_data = response.read()
-        except Exception:
-            return []
-        try:
-            root = ET.fromstring(xml_data)
-        except ET.ParseError:
-            return []
+        xml_data = await self._fetch_async(url, provider="arxiv")
+        root = ET.fromstring(xml_data)
         ns = {"atom": "http://www.w3.org/2005/Atom"}
         results = []
         for entry in root.findall("atom:entry", ns):
@@ -251,24 +577,27 @@ class ResourceAgent:
             )
         return results
 
-    def search_semantic_scholar(
+    def search_arxiv(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+        return run_sync(self.search_arxiv_async(query, max_results))
+
+    async def search_semantic_scholar_async(
         self, query: str, max_results: int = 5
     ) -> List[Dict[str, Any]]:
-        if not query:
-            return []
+        return await self._cached_search_async(
+            "semantic_scholar", query, max_results, self._query_semantic_scholar_async)
+
+    async def _query_semantic_scholar_async(self, query: str, max_results: int) -> List[Dict[str, Any]]:
         params = urllib.parse.urlencode(
             {
                 "query": query,
                 "limit": max_results,
-                "fields": "title,abstract,url,authors,year,venue",
+                "fields": "title,abstract,url,authors,year,venue,externalIds",
             }
         )
         url = f"https://api.semanticscholar.org/graph/v1/paper/search?{params}"
-        try:
-            with urllib.request.urlopen(url, timeout=15) as response:
-                data = json.loads(response.read().decode("utf-8"))
-        except Exception:
-            return []
+        data = json.loads(
+            (await self._fetch_async(url, provider="semantic_scholar")).decode("utf-8")
+        )
         results = []
         for item in data.get("data", []):
             results.append(
@@ -276,6 +605,7 @@ class ResourceAgent:
                     "title": item.get("title", ""),
                     "description": item.get("abstract", "") or "",
                     "link": item.get("url", ""),
+                    "doi": (item.get("externalIds") or {}).get("DOI", ""),
                     "tags": ["semantic_scholar"],
                     "source": "semantic_scholar",
                     "score": 0.0,
@@ -283,11 +613,18 @@ class ResourceAgent:
             )
         return results
 
-    def search_google_scholar(
+    def search_semantic_scholar(
         self, query: str, max_results: int = 5
     ) -> List[Dict[str, Any]]:
-        if not query:
-            return []
+        return run_sync(self.search_semantic_scholar_async(query, max_results))
+
+    async def search_google_scholar_async(
+        self, query: str, max_results: int = 5
+    ) -> List[Dict[str, Any]]:
+        return await self._cached_search_async(
+            "google_scholar", query, max_results, self._query_google_scholar_async)
+
+    async def _query_google_scholar_async(self, query: str, max_results: int) -> List[Dict[str, Any]]:
         api_key = os.environ.get("SERPAPI_API_KEY") or os.environ.get(
             "GOOGLE_SCHOLAR_API_KEY"
         )
@@ -302,11 +639,9 @@ class ResourceAgent:
             }
         )
         url = f"{SERPAPI_ENDPOINT}?{params}"
-        try:
-            with urllib.request.urlopen(url, timeout=15) as response:
-                data = json.loads(response.read().decode("utf-8"))
-        except Exception:
-            return []
+        data = json.loads(
+            (await self._fetch_async(url, provider="google_scholar")).decode("utf-8")
+        )
         results = []
         for item in data.get("organic_results", []):
             results.append(
@@ -321,26 +656,37 @@ class ResourceAgent:
             )
         return results
 
-    def rank_resources(
+    def search_google_scholar(
+        self, query: str, max_results: int = 5
+    ) -> List[Dict[str, Any]]:
+        return run_sync(self.search_google_scholar_async(query, max_results))
+
+    async def rank_resources_async(
         self, query: str, user_needs: str, candidates: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         if not candidates:
             return []
-        resource_context = []
-        for i, r in enumerate(candidates):
-            resource_context.append(
-                f"[{i+1}]\nTitle: {r['title']}\nDescription: {r['description']}\nLink: {r['link']}\nSource: {r['source']}\nTags: {', '.join(r.get('tags', []))}"
-            )
-        context = "\n\n".join(resource_context)
+        context, candidates = self._ranking_context(f"{query} {user_needs}", candidates)
         prompt = RESOURCE_RANKING_PROMPT.format(
             query=query, user_needs=user_needs, resource_context=context
         )
-        response = self._generate(prompt)
+        response = await self._generate_async(prompt, call_site="rank_resources")
         parsed = self._safe_json_loads(response)
         ranked = parsed.get("ranked", []) if isinstance(parsed, dict) else []
-        if ranked:
-            return ranked
-        # Fallback: return top candidates by heuristic score
+        return ranked or self._fallback_ranking(candidates)
+
+    def _ranking_context(self, query: str, candidates: List[Dict[str, Any]]):
+        budget = context_allowance(RANKING_CONTEXT_TOKENS, SYNTHESIS_RESERVE_TOKENS)
+        with span("rank_context", budget=budget) as s:
+            context, candidates, stats = build_ranking_context(query, candidates, budget)
+            s.set(**stats)
+        print(
+            f"[BUDGET] rank_resources context {stats['tokens']} tokens for "
+            f"{stats['shown']}/{stats['candidates']} candidates, saved {stats['saved_tokens']}")
+        return context, candidates
+
+    def _fallback_ranking(self, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Top candidates by heuristic score
         return [
             {
                 "title": r.get("title", ""),
@@ -351,6 +697,29 @@ class ResourceAgent:
             for r in candidates[:5]
         ]
 
+    async def select_and_rank_async(self, query: str, candidates: List[Dict[str, Any]] = None):
+        """
+        The single_call pipeline: retrieve with locally extracted keywords,
+        then judge the request and rank the candidates in one LLM call.
+        Returns (is_resource_request, ranked).
+        """
+        if candidates is None:
+            candidates = await self._collect_candidates_async(self.local_analysis(query))
+        context, candidates = self._ranking_context(query, candidates)
+        prompt = RESOURCE_SELECT_AND_RANK_PROMPT.format(
+            query=query, resource_context=context or "(none found)"
+        )
+        response = await self._generate_async(prompt, call_site="select_and_rank")
+        parsed = self._safe_json_loads(response)
+        if not isinstance(parsed, dict) or not parsed.get("is_resource_request", False):
+            return False, []
+        return True, parsed.get("ranked") or self._fallback_ranking(candidates)
+
+    def rank_resources(
+        self, query: str, user_needs: str, candidates: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return run_sync(self.rank_resources_async(query, user_needs, candidates))
+
     def _format_response_for_chat(self, ranked: List[Dict[str, Any]]) -> str:
         lines = ["## Recommended resources\n"]
         for i, r in enumerate(ranked, start=1):
@@ -365,75 +734,108 @@ class ResourceAgent:
             lines.append("")
         return "\n".join(lines).strip()
 
-    def run(self, query: str) -> str:
-        analysis = self.analyze_query(query)
-        if not analysis or not analysis.get("is_resource_request", False):
-            return "I can help find resources. Ask for papers, tutorials, datasets, or tools and include your topic."
+    async def _search_online_async(
+        self, analysis: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        # The providers are queried concurrently; politeness is handled by the
+        # per-provider rate limiters in _download_async
+        per_provider = await asyncio.gather(
+            self.search_arxiv_async(analysis.get("arxiv_query", ""), max_results=5),
+            self.search_semantic_scholar_async(
+                analysis.get("semantic_scholar_query", ""), max_results=5
+            ),
+            self.search_google_scholar_async(
+                analysis.get("google_scholar_query", ""), max_results=5
+            ),
+        )
+        return [result for results in per_provider for result in results]
 
+    async def _collect_candidates_async(
+        self, analysis: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
         max_results = int(analysis.get("max_results", 8))
-        user_needs = analysis.get("user_needs", "Find relevant resources.")
 
+        await self.ensure_loaded_async()
         local_results = self.search_local_resources(analysis)
         online_results = []
 
         if analysis.get("use_online", True):
-            online_results.extend(
-                self.search_arxiv(analysis.get("arxiv_query", ""), max_results=5)
-            )
-            time.sleep(0.5)
-            online_results.extend(
-                self.search_semantic_scholar(
-                    analysis.get("semantic_scholar_query", ""), max_results=5
-                )
-            )
-            time.sleep(0.5)
-            online_results.extend(
-                self.search_google_scholar(
-                    analysis.get("google_scholar_query", ""), max_results=5
-                )
-            )
-
-        candidates = (local_results + online_results)[: max_results * 2]
-        ranked = self.rank_resources(query, user_needs, candidates)
+            online_results = await self._search_online_async(analysis)
+
+        # Merge duplicates first so the cut keeps distinct resources
+        found = local_results + online_results
+        candidates = merge_candidates(found)
+        if len(candidates) < len(found):
+            print(f"[RESOURCES] Merged {len(found)} candidates into {len(candidates)} distinct resources")
+        return candidates[: max_results * 2]
+
+    async def prepare_async(self, query: str, params: Any = None) -> Dict[str, Any]:
+        """
+        Retrieval half of the agent: analyze the query and collect local and
+        online candidates. Returns the inputs for ranking. The analysis call
+        is skipped when the coordinator's routing call returned usable params,
+        and in the single_call pipeline, where keywords are extracted locally.
+        """
+        if self._uses_single_call(params):
+            # The request is judged later, by the ranking call
+            analysis = self.local_analysis(query)
+            candidates = await self._collect_candidates_async(analysis)
+            return {"analysis": analysis, "candidates": candidates, "pipeline": "single_call"}
+        analysis = await self._analysis_for_async(query, params)
+        candidates = []
+        if analysis and analysis.get("is_resource_request", False):
+            candidates = await self._collect_candidates_async(analysis)
+        return {"analysis": analysis, "candidates": candidates}
+
+    def _uses_single_call(self, params: Any = None) -> bool:
+        # Usable routing params already answer what the analysis call would
+        return self.pipeline == "single_call" and self._analysis_from_params(params) is None
+
+    async def _rank_for_analysis_async(
+        self, query: str, analysis: Dict[str, Any], candidates: List[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        user_needs = analysis.get("user_needs", "Find relevant resources.")
+        if candidates is None:
+            candidates = await self._collect_candidates_async(analysis)
+        return await self.rank_resources_async(query, user_needs, candidates)
+
+    async def run_async(self, query: str) -> str:
+        redirect = "I can help find resources. Ask for papers, tutorials, datasets, or tools and include your topic."
+        if self._uses_single_call():
+            is_request, ranked = await self.select_and_rank_async(query)
+            if not is_request:
+                return redirect
+        else:
+            analysis = await self.analyze_query_async(query)
+            if not analysis or not analysis.get("is_resource_request", False):
+                return redirect
+            ranked = await self._rank_for_analysis_async(query, analysis)
 
         if not ranked:
             return "No relevant resources found."
 
         return self._format_response_for_chat(ranked)
 
-    def run_structured(self, query: str) -> Dict[str, Any]:
-        analysis = self.analyze_query(query)
-        if not analysis or not analysis.get("is_resource_request", False):
-            return {
-                "message": "Ask for resources (papers, tutorials, datasets, tools) and include your topic.",
-                "ranked": [],
-            }
-
-        max_results = int(analysis.get("max_results", 8))
-        user_needs = analysis.get("user_needs", "Find relevant resources.")
-
-        local_results = self.search_local_resources(analysis)
-        online_results = []
-
-        if analysis.get("use_online", True):
-            online_results.extend(
-                self.search_arxiv(analysis.get("arxiv_query", ""), max_results=5)
-            )
-            time.sleep(0.5)
-            online_results.extend(
-                self.search_semantic_scholar(
-                    analysis.get("semantic_scholar_query", ""), max_results=5
-                )
-            )
-            time.sleep(0.5)
-            online_results.extend(
-                self.search_google_scholar(
-                    analysis.get("google_scholar_query", ""), max_results=5
-                )
-            )
-
-        candidates = (local_results + online_results)[: max_results * 2]
-        ranked = self.rank_resources(query, user_needs, candidates)
+    def run(self, query: str) -> str:
+        return run_sync(self.run_async(query))
+
+    async def run_structured_async(self, query: str, params: Any = None) -> Dict[str, Any]:
+        # params are the coordinator's routing parameters. Speculative
+        # execution only loads the resource list, which the agent keeps.
+        redirect = {
+            "message": "Ask for resources (papers, tutorials, datasets, tools) and include your topic.",
+            "ranked": [],
+        }
+        if self._uses_single_call(params):
+            prepared = await self.prepare_async(query)
+            is_request, ranked = await self.select_and_rank_async(query, prepared["candidates"])
+            if not is_request:
+                return redirect
+        else:
+            analysis = await self._analysis_for_async(query, params)
+            if not analysis or not analysis.get("is_resource_request", False):
+                return redirect
+            ranked = await self._rank_for_analysis_async(query, analysis)
         message = (
             self._format_response_for_chat(ranked)
             if ranked
@@ -441,6 +843,9 @@ class ResourceAgent:
         )
         return {"message": message, "ranked": ranked}
 
+    def run_structured(self, query: str, params: Any = None) -> Dict[str, Any]:
+        return run_sync(self.run_structured_async(query, params))
+
 
 # Main ------------------------------------------------------------------------
 
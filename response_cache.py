@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+from ttl_cache import TTLCache
+
+# Answer cache for process_message. Students ask the same forms and deadlines
+# questions every quarter, so a hit skips routing, retrieval and synthesis.
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", str(6 * 3600)))
+
+# How often (seconds) the source tables are fingerprinted to detect edits
+KB_CHECK_INTERVAL = float(os.environ.get("KB_CHECK_INTERVAL", "60"))
+
+# Tables whose rows feed agent answers, with their key column; any change
+# to them drops every entry. A table with a VERSION_COLUMN (an updated-at
+# timestamp) is fingerprinted by its row count and newest version, read as
+# a single row. A table without one is fingerprinted by hashing every row,
+# read in key order SOURCE_PAGE_SIZE rows at a time, so edits are caught
+# either way.
+WATCHED_TABLES = {
+    "KnowledgeBase": "id",
+    "Courses": "courseNum",
+}
+VERSION_COLUMN = os.environ.get("SOURCE_VERSION_COLUMN", "updated_at")
+SOURCE_PAGE_SIZE = int(os.environ.get("SOURCE_PAGE_SIZE", "1000"))
+
+# User fields that change a degree planning answer
+PROFILE_FIELDS = [
+    "graduationTarget",
+    "startTerm",
+    "completedCourses",
+    "currentCourses",
+    "plannedCourses",
+]
+
+# Agents whose answers depend on the student's profile
+PROFILE_AGENTS = {"degree_planning_agent"}
+
+answer_cache = TTLCache(max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+
+
+def normalize_query(query: str) -> str:
+    text = re.sub(r"[^a-z0-9\s]", " ", (query or "").lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def profile_fingerprint(user: Optional[Dict[str, Any]]) -> str:
+    if not user:
+        return ""
+    fields = {}
+    for field in PROFILE_FIELDS:
+        value = user.get(field)
+        fields[field] = sorted(value) if isinstance(value, list) else value
+    payload = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def delegated_agents(parsed: Dict[str, Any]) -> List[str]:
+    return sorted({sub["agent"] for sub in parsed.get("subqueries", [])})
+
+
+def needs_profile(parsed: Dict[str, Any]) -> bool:
+    return any(agent in PROFILE_AGENTS for agent in delegated_agents(parsed))
+
+
+def answer_key(query: str, parsed: Dict[str, Any], user: Optional[Dict[str, Any]] = None):
+    agents = delegated_agents(parsed)
+    profile = profile_fingerprint(user) if needs_profile(parsed) else ""
+    return (normalize_query(query), tuple(agents), profile)
+
+
+def get_answer(key) -> Optional[str]:
+    ensure_watcher()
+    answer = answer_cache.get(key)
+    print(f"[CACHE] {'HIT' if answer is not None else 'MISS'} {key[0]!r} agents={list(key[1])}")
+    return answer
+
+
+def store_answer(key, answer: str):
+    if answer:
+        answer_cache.set(key, answer)
+
+
+def invalidate():
+    answer_cache.clear()
+    print("[CACHE] Source tables changed, cleared cached answers")
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {"answers": answer_cache.stats()}
+
+
+# KnowledgeBase change detection ----------------------------------------------
+
+
+def has_version_column(client, table: str) -> bool:
+    rows = client.table(table).select("*").limit(1).execute().data or []
+    return bool(rows) and VERSION_COLUMN in rows[0]
+
+
+def table_version(client, table: str, key: str) -> List[Any]:
+    if has_version_column(client, table):
+        response = (
+            client.table(table).select(VERSION_COLUMN, count="exact")
+            .order(VERSION_COLUMN, desc=True).limit(1).execute()
+        )
+        rows = response.data or []
+        return [response.count, rows[0].get(VERSION_COLUMN) if rows else None]
+    return [content_hash(client, table, key)]
+
+
+def content_hash(client, table: str, key: str) -> str:
+    digest = hashlib.sha256()
+    start = 0
+    while True:
+        rows = (
+            client.table(table).select("*").order(key)
+            .range(start, start + SOURCE_PAGE_SIZE - 1).execute().data or []
+        )
+        for row in rows:
+            digest.update(json.dumps(row, sort_keys=True, default=str).encode("utf-8"))
+        if len(rows) < SOURCE_PAGE_SIZE:
+            return digest.hexdigest()
+        start += SOURCE_PAGE_SIZE
+
+
+def source_fingerprint() -> Optional[str]:
+    from db import supabase
+
+    try:
+        versions = {table: table_version(supabase, table, key)
+                    for table, key in WATCHED_TABLES.items()}
+    except Exception as e:
+        print(f"[CACHE] Could not fingerprint source tables: {e}")
+        return None
+    payload = json.dumps(versions, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def check_sources(last: Optional[str]) -> Optional[str]:
+    """Drop every entry if the sources changed since `last`. Returns the new fingerprint."""
+    current = source_fingerprint()
+    if current is None:
+        return last
+    if last is not None and current != last:
+        invalidate()
+    return current
+
+
+def watch_sources():
+    last = source_fingerprint()
+    while True:
+        time.sleep(KB_CHECK_INTERVAL)
+        last = check_sources(last)
+
+
+watcher_lock = threading.Lock()
+watcher_thread = None
+
+
+def ensure_watcher():
+    global watcher_thread
+    if watcher_thread is not None:
+        return
+    with watcher_lock:
+        if watcher_thread is None:
+            watcher_thread = threading.Thread(
+                target=watch_sources, name="response-cache-watcher", daemon=True
+            )
+            watcher_thread.start()
@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Persistent cache for scholarly search results (arXiv, Semantic Scholar,
+# Google Scholar through SerpAPI), shared across restarts. Entries are keyed
+# by provider, normalized query and max_results and expire per provider.
+# Expired entries stay on disk until evicted, so a result can still be
+# served stale when the provider errors or times out. The database is kept
+# to SCHOLARLY_CACHE_MAX_ENTRIES by dropping the least recently used rows.
+
+SCHOLARLY_CACHE_ENABLED = os.environ.get("SCHOLARLY_CACHE_ENABLED", "1") == "1"
+SCHOLARLY_CACHE_PATH = os.environ.get("SCHOLARLY_CACHE_PATH", ".cache/scholarly.sqlite3")
+SCHOLARLY_CACHE_MAX_ENTRIES = int(os.environ.get("SCHOLARLY_CACHE_MAX_ENTRIES", "5000"))
+
+# Seconds before a provider's results are refetched. SerpAPI calls cost
+# quota, so Google Scholar results are kept longest.
+PROVIDER_TTLS = {
+    "arxiv": 24 * 3600,
+    "semantic_scholar": 24 * 3600,
+    "google_scholar": 3 * 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class ScholarlyCache:
+    def __init__(self, path: str = SCHOLARLY_CACHE_PATH,
+                 max_entries: int = SCHOLARLY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = None
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.evictions = 0
+
+    def connect(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the agent never touches the disk
+        if self.conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and self.path != ":memory:":
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " provider TEXT, query TEXT, max_results INTEGER, results TEXT,"
+                " fetched_at REAL, used_at REAL,"
+                " PRIMARY KEY (provider, query, max_results))")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+        return self.conn
+
+    def get(self, provider: str, query: str, max_results: int) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """(results, fresh) for a cached query, or None."""
+        key = (provider, normalize_query(query), max_results)
+        now = time.time()
+        with self.lock:
+            conn = self.connect()
+            row = conn.execute(
+                "SELECT results, fetched_at FROM responses"
+                " WHERE provider = ? AND query = ? AND max_results = ?", key).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE responses SET used_at = ?"
+                " WHERE provider = ? AND query = ? AND max_results = ?", (now, *key))
+            conn.commit()
+        fresh = now - row[1] < PROVIDER_TTLS.get(provider, DEFAULT_TTL)
+        return json.loads(row[0]), fresh
+
+    def put(self, provider: str, query: str, max_results: int, results: List[Dict[str, Any]]):
+        now = time.time()
+        with self.lock:
+            conn = self.connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (provider, normalize_query(query), max_results, json.dumps(results), now, now))
+            evicted = conn.execute(
+                "DELETE FROM responses WHERE rowid IN ("
+                " SELECT rowid FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)).rowcount
+            conn.commit()
+            self.evictions += max(evicted, 0)
+
+    def record(self, outcome: str):
+        with self.lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "stale":
+                self.stale_served += 1
+            else:
+                self.misses += 1
+
+    def __len__(self):
+        with self.lock:
+            return self.connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            # Stale results are served on misses whose fetch then failed
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_served": self.stale_served,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+cache = ScholarlyCache() if SCHOLARLY_CACHE_ENABLED else None
@@ -0,0 +1,119 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+# In-memory inverted index over the resource agent's KnowledgeBase entries.
+# Text is tokenized once when the resources are loaded; a query only walks
+# the postings of its own terms and scores them with BM25, plus a boost for
+# keywords that name one of an entry's tags.
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Added once per query keyword that equals one of the entry's tags
+TAG_BOOST = 1.5
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from how i in is it of on or the to what with".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words in a request that say what kind of help is wanted rather than what
+# it is about
+REQUEST_WORDS = frozenset(
+    "about any best can could do find get give good help im list looking me my need "
+    "please recommend recommendations resources show some specifically suggest "
+    "suggestions there want where which you".split())
+
+RESOURCE_TYPE_WORDS = {
+    "paper": "paper", "papers": "paper", "article": "paper", "articles": "paper",
+    "literature": "paper", "book": "book", "books": "book", "textbook": "book",
+    "tutorial": "tutorial", "tutorials": "tutorial", "guide": "tutorial", "guides": "tutorial",
+    "course": "course", "courses": "course", "dataset": "dataset", "datasets": "dataset",
+    "tool": "tool", "tools": "tool", "software": "tool", "sites": "tool", "websites": "tool",
+    "survey": "survey", "surveys": "survey",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def normalize_phrase(text: str) -> str:
+    return " ".join(TOKEN_RE.findall(text.lower()))
+
+
+def extract_query_terms(query: str) -> Tuple[List[str], Set[str]]:
+    """
+    (topic terms, resource types) of a request, with no LLM call. Topic
+    terms keep query order, followed by the pairs that were adjacent in the
+    query so multi-word tags such as "machine learning" still match.
+    """
+    terms, pairs, types = [], [], set()
+    previous = None
+    for token in TOKEN_RE.findall(query.lower().replace("'", "")):
+        if token in RESOURCE_TYPE_WORDS:
+            types.add(RESOURCE_TYPE_WORDS[token])
+        if token in STOP_WORDS or token in REQUEST_WORDS or token in RESOURCE_TYPE_WORDS:
+            previous = None
+            continue
+        if token not in terms:
+            terms.append(token)
+        if previous and f"{previous} {token}" not in pairs:
+            pairs.append(f"{previous} {token}")
+        previous = token
+    return terms + pairs, types
+
+
+class ResourceIndex:
+    def __init__(self, resources: Iterable[Dict[str, Any]] = ()):
+        self.resources: List[Dict[str, Any]] = list(resources)
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.tag_postings: Dict[str, List[int]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+
+        for doc_id, r in enumerate(self.resources):
+            tags = r.get("tags", [])
+            terms = tokenize(
+                f"{r.get('title', '')} {r.get('description', '')} {' '.join(tags)}")
+            self.doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings[term].append((doc_id, tf))
+            for tag in {normalize_phrase(t) for t in tags}:
+                self.tag_postings[tag].append(doc_id)
+
+        # Each posting carries its term's full BM25 contribution, so a query
+        # only adds up precomputed weights
+        count = len(self.resources)
+        avg_length = sum(self.doc_lengths) / count if count else 0.0
+        self.impacts: Dict[str, List[Tuple[int, float]]] = {}
+        for term, docs in postings.items():
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            self.impacts[term] = [
+                (doc_id, idf * tf * (BM25_K1 + 1) / (
+                    tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_length)))
+                for doc_id, tf in docs
+            ]
+        self.tag_postings = dict(self.tag_postings)
+
+    def __len__(self) -> int:
+        return len(self.resources)
+
+    def scores(self, keywords: Iterable[str]) -> Dict[int, float]:
+        """BM25 score per matching document id."""
+        keywords = [k for k in keywords if isinstance(k, str)]
+        scores: Dict[int, float] = defaultdict(float)
+        for term, query_tf in Counter(t for k in keywords for t in tokenize(k)).items():
+            for doc_id, weight in self.impacts.get(term, ()):
+                scores[doc_id] += query_tf * weight
+        for phrase in {normalize_phrase(k) for k in keywords}:
+            for doc_id in self.tag_postings.get(phrase, ()):
+                scores[doc_id] += TAG_BOOST
+        return scores
+
+    def search(self, keywords: Iterable[str], k: int = 15) -> List[Tuple[float, Dict[str, Any]]]:
+        """The k best (score, resource) pairs, best first."""
+        top = heapq.nlargest(k, self.scores(keywords).items(), key=lambda item: (item[1], -item[0]))
+        return [(round(score, 4), self.resources[doc_id]) for doc_id, score in top]
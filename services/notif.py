@@ -1,28 +1,41 @@
 from datetime import datetime, timedelta, date
-from db import supabase
+from async_runtime import run_sync
+from db import get_async_supabase
+
+# Each service function is async; the plain-named versions are thin sync
+# wrappers that run on the shared event loop.
 
 # Fetch user profile
-def get_user_profile(user_id):
-    response = supabase.table("Users") \
+async def get_user_profile_async(user_id):
+    supabase = await get_async_supabase()
+    response = await supabase.table("Users") \
         .select("*") \
         .eq("id", user_id) \
         .single() \
         .execute()
     return response.data
 
+def get_user_profile(user_id):
+    return run_sync(get_user_profile_async(user_id))
+
 # Fetch all notification rules
-def get_notification_rules():
-    response = supabase.table("NotificationRules").select("*").execute()
+async def get_notification_rules_async():
+    supabase = await get_async_supabase()
+    response = await supabase.table("NotificationRules").select("*").execute()
     return response.data
 
+def get_notification_rules():
+    return run_sync(get_notification_rules_async())
+
 # Delete or mark as read notifications that no longer should be triggered
-def remove_stale_notifications(user):
+async def remove_stale_notifications_async(user):
     user_id = user["id"]
-    active_notifications = supabase.table("Notifications") \
+    supabase = await get_async_supabase()
+    active_notifications = (await supabase.table("Notifications") \
         .select("*, NotificationRules(*)") \
         .eq("userId", user_id) \
         .eq("read", False) \
-        .execute().data
+        .execute()).data
 
     completed = user.get("completedCourses") or []
 
@@ -101,27 +114,38 @@ def remove_stale_notifications(user):
 
         # Delete if stale
         if stale:
-            supabase.table("Notifications").delete().eq("id", notif["id"]).execute()
+            await supabase.table("Notifications").delete().eq("id", notif["id"]).execute()
+
+def remove_stale_notifications(user):
+    return run_sync(remove_stale_notifications_async(user))
 
 
 # Check if notification already exists
-def notification_exists(user_id, rule_id):
-    response = supabase.table("Notifications") \
+async def notification_exists_async(user_id, rule_id):
+    supabase = await get_async_supabase()
+    response = await supabase.table("Notifications") \
         .select("id") \
         .eq("userId", user_id) \
         .eq("ruleId", rule_id) \
         .execute()
     return len(response.data) > 0
 
+def notification_exists(user_id, rule_id):
+    return run_sync(notification_exists_async(user_id, rule_id))
+
 # Create notification
-def create_notification(user_id, rule):
-    supabase.table("Notifications").insert({
+async def create_notification_async(user_id, rule):
+    supabase = await get_async_supabase()
+    await supabase.table("Notifications").insert({
         "userId": user_id,
         "ruleId": rule["id"],
         "read": False,
         "created_at": datetime.now().isoformat()
     }).execute()
 
+def create_notification(user_id, rule):
+    return run_sync(create_notification_async(user_id, rule))
+
 # helper to compare if current term is after term offset for notif
 def term_to_number(term_string):
     term, year = term_string.split()
@@ -172,8 +196,8 @@ def apply_term_offset(term_string, offset):
     return f"{terms[new_index]} {year}"
 
 # Evaluate all rules for user
-def evaluate_rules(user):
-    rules = get_notification_rules()
+async def evaluate_rules_async(user):
+    rules = await get_notification_rules_async()
     today = date.today()
 
     completed = user.get("completedCourses") or []
@@ -261,12 +285,16 @@ def evaluate_rules(user):
                 should_trigger = True
 
         # Create notification
-        if should_trigger and not notification_exists(user["id"], rule["id"]):
-            create_notification(user["id"], rule)
+        if should_trigger and not await notification_exists_async(user["id"], rule["id"]):
+            await create_notification_async(user["id"], rule)
+
+def evaluate_rules(user):
+    return run_sync(evaluate_rules_async(user))
 
 # Get active notifications (Unread)
-def get_active_notifications(user_id):
-    response = (
+async def get_active_notifications_async(user_id):
+    supabase = await get_async_supabase()
+    response = await (
         supabase
         .table("Notifications")
         .select("*, NotificationRules(message, month, day, due_date)")
@@ -277,21 +305,31 @@ def get_active_notifications(user_id):
 
     return response.data
 
+def get_active_notifications(user_id):
+    return run_sync(get_active_notifications_async(user_id))
+
 # Mark notification as read
-def mark_as_read(notification_id):
-    supabase.table("Notifications") \
+async def mark_as_read_async(notification_id):
+    supabase = await get_async_supabase()
+    await supabase.table("Notifications") \
         .update({
             "read": True,
             "read_at": datetime.now().isoformat()
         }).eq("id", notification_id).execute()
 
+def mark_as_read(notification_id):
+    return run_sync(mark_as_read_async(notification_id))
+
 # Main entry point
-def generate_notifications(user_id):
-    user = get_user_profile(user_id)
+async def generate_notifications_async(user_id):
+    user = await get_user_profile_async(user_id)
 
     # Remove notifications that are no longer valid
-    remove_stale_notifications(user)
+    await remove_stale_notifications_async(user)
 
     # Then create new ones as usual
-    evaluate_rules(user)
-    return get_active_notifications(user_id)
\ No newline at end of file
+    await evaluate_rules_async(user)
+    return await get_active_notifications_async(user_id)
+
+def generate_notifications(user_id):
+    return run_sync(generate_notifications_async(user_id))
\ No newline at end of file
@@ -1,11 +1,13 @@
-from db import supabase
+from async_runtime import run_sync
+from db import get_async_supabase
 from services.notif import get_current_term
 
-def handle_term_transition(user_id):
+async def handle_term_transition_async(user_id):
 
     current_term = get_current_term()
 
-    user = (
+    supabase = await get_async_supabase()
+    user = (await
         supabase
         .table("Users")
         .select("completedCourses, currentCourses, lastTermChecked")
@@ -18,7 +20,7 @@ def handle_term_transition(user_id):
 
     # If first time, just set term
     if not last_term:
-        supabase.table("Users").update({
+        await supabase.table("Users").update({
             "lastTermChecked": current_term
         }).eq("id", user_id).execute()
         return
@@ -35,15 +37,19 @@ def handle_term_transition(user_id):
         # Clear current
         updated_current = []
 
-        supabase.table("Users").update({
+        await supabase.table("Users").update({
             "completedCourses": list(updated_completed),
             "currentCourses": updated_current,
             "lastTermChecked": current_term
         }).eq("id", user_id).execute()
 
-def update_courses_in_db(user_id, payload):
+def handle_term_transition(user_id):
+    return run_sync(handle_term_transition_async(user_id))
 
-    user = (
+async def update_courses_in_db_async(user_id, payload):
+
+    supabase = await get_async_supabase()
+    user = (await
         supabase
         .table("Users")
         .select("completedCourses, currentCourses, plannedCourses")
@@ -71,10 +77,13 @@ def update_courses_in_db(user_id, payload):
     updated_planned -= updated_completed
     updated_planned -= updated_current
 
-    supabase.table("Users").update({
+    await supabase.table("Users").update({
         "completedCourses": list(updated_completed),
         "currentCourses": list(updated_current),
         "plannedCourses": list(updated_planned)
     }).eq("id", user_id).execute()
 
-    return {"status": "success"}
\ No newline at end of file
+    return {"status": "success"}
+
+def update_courses_in_db(user_id, payload):
+    return run_sync(update_courses_in_db_async(user_id, payload))
\ No newline at end of file
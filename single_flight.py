@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from async_runtime import loop_local
+from llm_usage import current_turn
+from turn_deadline import DeadlineExceeded, current_deadline, time_allowance
+
+# Single-flight deduplication. When identical operations are in flight at
+# the same time (many students asking the same thing at the start of a
+# quarter), the first caller does the work and everyone else awaits its
+# result. Nothing is cached: once the operation finishes the next caller
+# starts a fresh one.
+#
+# Callers share the result object, so they must treat it as read-only.
+#
+# The shared operation belongs to no single turn: it runs without a turn
+# deadline or token budget, so it falls back to its own default timeout,
+# and each caller waits only as long as its own turn allows.
+
+
+async def detached(fn: Callable[[], Awaitable[Any]]) -> Any:
+    # Runs in the task's own copy of the context, so this leaks to no caller
+    current_deadline.set(None)
+    current_turn.set(None)
+    return await fn()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self.inflight = loop_local(dict)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() unless an identical call is in flight, then share its result."""
+        inflight = self.inflight()
+        task = inflight.get(key)
+        with self.lock:
+            self.calls += 1
+            if task is not None:
+                self.collapsed += 1
+        if task is None:
+            # A task of its own, so one caller timing out or being cancelled
+            # does not cancel the work the others are waiting on
+            task = asyncio.ensure_future(detached(fn))
+            inflight[key] = task
+
+            def forget(done, key=key):
+                if inflight.get(key) is done:
+                    del inflight[key]
+
+            task.add_done_callback(forget)
+        timeout = time_allowance(None, f"{self.name} call")
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            if task.done():
+                # The shared operation's own timeout, not this caller's deadline
+                raise
+            raise DeadlineExceeded(f"no time left in this turn for a {self.name} call") from None
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.collapsed = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "collapsed": self.collapsed,
+                "collapse_rate": self.collapsed / self.calls if self.calls else 0.0,
+            }
+
+
+llm_flight = SingleFlight("llm")
+http_flight = SingleFlight("http")
+supabase_flight = SingleFlight("supabase")
+
+
+def stable_key(*parts) -> str:
+    """Hash of JSON-serializable parts, usable as a single-flight key."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+FLIGHT_GROUPS = (llm_flight, http_flight, supabase_flight)
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    return {group.name: group.stats() for group in FLIGHT_GROUPS}
+
+
+def reset_single_flight_stats():
+    for group in FLIGHT_GROUPS:
+        group.reset()
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from llm_usage import set_agent
+from tracing import span
+
+# Speculative agent execution. When a turn has to wait for the LLM router,
+# the agent the fast router's scorer ranks highest starts loading what it
+# needs whatever the router decides (knowledge base rows, courses, the
+# student's profile) in parallel. Nothing a prefetcher does depends on the
+# subquery wording or the routing params, so the loads are reused whenever
+# the router picks that agent; if it picks others they are cancelled.
+# Prefetchers make no LLM calls, so a miss only costs a few reads.
+
+SPECULATIVE_AGENTS = os.environ.get("SPECULATIVE_AGENTS", "0") == "1"
+
+# Scorer confidence needed before speculating on an agent
+SPECULATION_MIN_CONFIDENCE = float(os.environ.get("SPECULATION_MIN_CONFIDENCE", "0.4"))
+
+Prefetcher = Callable[[Any], Awaitable[Any]]
+
+
+class SpeculationStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    def record_start(self):
+        with self.lock:
+            self.started += 1
+
+    def record_hit(self, saved_ms: float):
+        with self.lock:
+            self.hits += 1
+            self.saved_ms += saved_ms
+
+    def record_miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "started": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / self.started if self.started else 0.0,
+                "saved_ms_total": round(self.saved_ms, 1),
+                "saved_ms_avg": round(self.saved_ms / self.hits, 1) if self.hits else 0.0,
+            }
+
+
+stats = SpeculationStats()
+
+
+def speculation_stats() -> Dict[str, Any]:
+    return stats.snapshot()
+
+
+class Speculation:
+    """
+    One turn's speculative prefetch. Use as a context manager so an unused
+    prefetch is always cancelled when the turn ends.
+    """
+
+    def __init__(self, prefetchers: Dict[str, Prefetcher], user_id=None,
+                 enabled: Optional[bool] = None):
+        self.prefetchers = prefetchers
+        self.user_id = user_id
+        self.enabled = SPECULATIVE_AGENTS if enabled is None else enabled
+        self.agent = None
+        self.task = None
+        self.started = None
+        self.finished = None
+
+    def start(self, prediction: Dict[str, Any]):
+        """Start prefetching for the predicted agent, if it is likely enough."""
+        if not self.enabled or self.task is not None:
+            return
+        agent = prediction.get("agent")
+        # The fast router zeroes its confidence for multi-intent questions,
+        # but the top-scoring agent is still usually among those delegated to
+        confidence = max(prediction.get("confidence", 0.0), prediction.get("probability", 0.0))
+        if prediction.get("reason") == "follow-up question":
+            # The message alone does not say what a follow-up is about
+            return
+        if agent not in self.prefetchers or confidence < SPECULATION_MIN_CONFIDENCE:
+            return
+
+        self.agent = agent
+        self.started = time.perf_counter()
+        self.task = asyncio.create_task(self.run(self.prefetchers[agent]))
+        stats.record_start()
+        print(f"[SPECULATE] Prefetching for {agent} (confidence {confidence:.2f}) while the router decides")
+
+    async def run(self, prefetcher: Prefetcher):
+        set_agent(self.agent)
+        try:
+            with span("speculate", agent=self.agent):
+                return await prefetcher(self.user_id)
+        finally:
+            self.finished = time.perf_counter()
+
+    async def take(self, agent: str):
+        """
+        The prefetched loads if the router picked the speculated agent,
+        otherwise None. Each prefetch is handed out at most once.
+        """
+        if self.task is None or agent != self.agent:
+            return None
+        task, self.task = self.task, None
+        taken_at = time.perf_counter()
+        try:
+            result = await task
+        except Exception as e:
+            print(f"[SPECULATE] Prefetch for {agent} failed: {type(e).__name__}: {e}")
+            stats.record_miss()
+            return None
+
+        saved_ms = (min(taken_at, self.finished) - self.started) * 1000
+        stats.record_hit(saved_ms)
+        print(f"[SPECULATE] Router agreed on {agent}, saved ~{saved_ms:.0f} ms")
+        return result
+
+    def discard(self, reason: str = "did not pick"):
+        if self.task is None:
+            return
+        self.task.cancel()
+        self.task = None
+        stats.record_miss()
+        print(f"[SPECULATE] Router {reason} {self.agent}, discarded prefetch")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.discard()
+        return False
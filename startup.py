@@ -0,0 +1,62 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from async_runtime import run_sync
+
+# Startup timing. Heavy imports and cache loaders are wrapped in timed() so
+# the dashboard can report where its startup time goes. Loaders that hit the
+# network run on a background thread once the UI is already serving.
+
+process_started = time.perf_counter()
+
+timings: List[Tuple[str, str, float]] = []
+timings_lock = threading.Lock()
+
+
+@contextmanager
+def timed(kind: str, name: str):
+    """Record how long a block takes, e.g. timed("import", "coordinator")."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        with timings_lock:
+            timings.append((kind, name, time.perf_counter() - started))
+
+
+def startup_report() -> Dict[str, Dict[str, float]]:
+    """Seconds spent per import and per loader, grouped by kind."""
+    report = {}
+    with timings_lock:
+        for kind, name, seconds in timings:
+            report.setdefault(kind, {})[name] = round(seconds, 3)
+    return report
+
+
+def print_startup_report(title: str = "Startup"):
+    elapsed = time.perf_counter() - process_started
+    print(f"[STARTUP] {title}: {elapsed:.2f}s since process start")
+    for kind, entries in startup_report().items():
+        for name, seconds in sorted(entries.items(), key=lambda item: -item[1]):
+            print(f"[STARTUP]   {kind:<8} {name:<30} {seconds:>7.3f}s")
+
+
+def warm_up_in_background(loaders: Dict[str, Callable[[], Awaitable]]) -> threading.Thread:
+    """
+    Run async cache loaders one after another on a daemon thread, timing
+    each. Failures are logged and skipped; the agents load lazily anyway.
+    """
+    def run():
+        for name, loader in loaders.items():
+            try:
+                with timed("loader", name):
+                    run_sync(loader())
+            except Exception as e:
+                print(f"[STARTUP] Warm-up of {name} failed: {type(e).__name__}: {e}")
+        print_startup_report("Warm-up finished")
+
+    thread = threading.Thread(target=run, name="gradgpt-warm-up", daemon=True)
+    thread.start()
+    return thread
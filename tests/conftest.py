@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+# db.py creates its Supabase client at import time. The offline suite never
+# reaches it, so placeholder credentials are enough to import the app.
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_KEY", "offline-tests")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def trace_file(tmp_path, monkeypatch):
+    """Spans from every test go to its own tmp_path, never the working directory."""
+    import tracing
+
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(path))
+    yield path
+    tracing.flush()
+
+
+@pytest.fixture
+def offline(trace_file):
+    """
+    benchmark.offline_environment with no simulated latency, tracing into
+    the test's trace_file. Keyword arguments override the defaults.
+    """
+    import benchmark
+
+    def environment(**overrides):
+        settings = {
+            "llm_latency": 0,
+            "db_latency": 0,
+            "http_latency": 0,
+            "trace_file": str(trace_file),
+            **overrides,
+        }
+        return benchmark.offline_environment(**settings)
+
+    return environment
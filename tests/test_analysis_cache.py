@@ -0,0 +1,58 @@
+import os
+
+import analysis_cache
+import coordinator
+from analysis_cache import AnalysisCache, analysis_key
+
+
+def test_key_ignores_case_stop_words_and_word_order():
+    assert analysis_key("Papers on Graph Neural Networks?") == analysis_key(
+        "graph neural networks papers")
+    assert analysis_key("papers on graph neural networks") != analysis_key("papers on graph databases")
+    assert analysis_key("How is it?") == ""
+
+
+def test_entries_are_copied_and_persist_across_restarts(tmp_path):
+    path = str(tmp_path / "analyses.json")
+    cache = AnalysisCache(path=path)
+    cache.store("Datasets for speech recognition", {"keywords": ["speech"]})
+
+    cache.lookup("speech recognition datasets")["keywords"].append("mutated")
+    assert cache.lookup("speech recognition datasets") == {"keywords": ["speech"]}
+    assert cache.stats()["hits"] == 2
+
+    # The store is written later, off the caller's thread
+    assert not os.path.exists(path)
+    cache.flush()
+
+    restarted = AnalysisCache(path=path)
+    assert restarted.lookup("datasets for speech recognition") == {"keywords": ["speech"]}
+    assert restarted.lookup("something else entirely") is None
+    assert restarted.stats()["hit_rate"] == 0.5
+
+    assert AnalysisCache(path=path, ttl=0).lookup("speech recognition datasets") is None
+
+
+def test_reworded_query_skips_the_analysis_call(offline):
+    with offline(use_cache=True) as fakes:
+        agent = coordinator.res_agent
+        first = agent.analyze_query("Can you recommend papers on reinforcement learning?")
+        second = agent.analyze_query("reinforcement learning papers, can you recommend")
+
+    assert fakes.llm.calls["analyze_query"] == 1
+    assert first == second and first["is_resource_request"] is True
+
+
+def test_stores_are_batched_into_one_timed_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_cache, "ANALYSIS_CACHE_SAVE_DELAY", 0.05)
+    path = str(tmp_path / "analyses.json")
+    cache = AnalysisCache(path=path)
+    saves = []
+    monkeypatch.setattr(cache, "save", lambda: saves.append(len(cache)))
+
+    cache.store("speech recognition datasets", {"keywords": ["speech"]})
+    cache.store("graph neural network papers", {"keywords": ["graph"]})
+    timer = cache.save_timer
+    timer.join(1)
+
+    assert saves == [2] and cache.save_timer is None
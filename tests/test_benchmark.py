@@ -0,0 +1,36 @@
+import benchmark
+import db
+import llm
+
+
+def test_offline_benchmark_runs_every_agent_without_network(tmp_path):
+    get_client = llm.get_client
+    report = benchmark.run_benchmark(
+        num_queries=len(benchmark.QUERY_CORPUS),
+        concurrency=4,
+        llm_latency=0.001,
+        db_latency=0,
+        http_latency=0.001,
+        trace_file=str(tmp_path / "traces.jsonl"),
+    )
+
+    assert report["errors"] == []
+    assert report["agent_errors"] == 0
+    assert report["throughput_qps"] > 0
+    for stage in ("turn", "agent:forms_agent", "agent:degree_planning_agent",
+                  "agent:resource_agent", "llm:synthesize_response_stream"):
+        assert report["stages"][stage]["count"] > 0
+    assert report["supabase_queries"]["KnowledgeBase"] > 0
+    assert report["http_calls"]["arxiv"] > 0
+
+    # The real dependencies are restored afterwards
+    assert llm.get_client is get_client
+    assert not isinstance(db.supabase, benchmark.InMemorySupabase)
+
+
+def test_fail_above_p95_gate(tmp_path):
+    args = ["--queries", "2", "--concurrency", "2", "--llm-latency", "0.001",
+            "--db-latency", "0", "--http-latency", "0.001",
+            "--trace-file", str(tmp_path / "traces.jsonl")]
+    assert benchmark.main(args) == 0
+    assert benchmark.main(args + ["--fail-above-p95-ms", "0"]) == 1
@@ -0,0 +1,44 @@
+from candidate_merge import merge_candidates, normalize_url
+
+LOCAL = {"title": "Attention Is All You Need", "description": "Curated.",
+         "link": "https://arxiv.org/abs/1706.03762", "tags": ["transformers"], "source": "local", "score": 2.0}
+ARXIV = {"title": "Attention is all you need", "description": "The dominant sequence transduction models...",
+         "link": "http://arxiv.org/abs/1706.03762v5", "tags": ["arxiv"], "source": "arxiv", "score": 0.0}
+SCHOLAR = {"title": "Attention Is All You Need.", "description": "",
+           "link": "https://www.semanticscholar.org/paper/204e3073", "tags": ["semantic_scholar"],
+           "source": "semantic_scholar", "score": 0.0}
+DOI_A = {"title": "BERT", "description": "", "doi": "10.18653/v1/N19-1423", "link": "", "tags": [], "source": "google_scholar"}
+DOI_B = {"title": "BERT: Pre-training of Deep Bidirectional Transformers", "description": "We introduce a new language representation model called BERT.",
+         "link": "https://doi.org/10.18653/v1/N19-1423", "tags": [], "source": "semantic_scholar"}
+OTHER = {"title": "Overleaf", "description": "LaTeX editor.", "link": "https://www.overleaf.com/",
+         "tags": ["writing"], "source": "local"}
+
+
+def test_duplicates_merge_into_the_richest_record():
+    merged = merge_candidates([LOCAL, OTHER, ARXIV, SCHOLAR, DOI_A, DOI_B])
+
+    assert [m["title"] for m in merged] == [
+        "Attention is all you need", "Overleaf", "BERT: Pre-training of Deep Bidirectional Transformers"]
+    paper = merged[0]
+    assert paper["description"].startswith("The dominant")
+    assert paper["sources"] == ["local", "arxiv", "semantic_scholar"]
+    assert paper["tags"] == ["transformers", "arxiv", "semantic_scholar"]
+    assert paper["score"] == 2.0
+    assert "sources" not in merged[1]
+
+
+def test_short_titles_and_distinct_urls_stay_separate():
+    a = dict(OTHER, link="https://www.overleaf.com/")
+    b = dict(OTHER, link="http://overleaf.com")
+    c = dict(OTHER, link="https://example.org/overleaf-mirror")
+
+    assert len(merge_candidates([a, b, c])) == 2
+    assert normalize_url("HTTPS://www.Overleaf.com/") == "overleaf.com"
+
+
+def test_dois_cited_in_descriptions_do_not_merge_papers():
+    citing = {"title": "A follow-up on BERT fine-tuning", "link": "https://example.org/followup",
+              "description": "Builds on Devlin et al. (doi: 10.18653/v1/N19-1423).",
+              "tags": [], "source": "google_scholar"}
+
+    assert len(merge_candidates([DOI_B, citing])) == 2
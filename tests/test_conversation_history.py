@@ -0,0 +1,65 @@
+from conversation_history import build_routing_history, compact_message, summarize_messages
+from tokens import estimate_message_tokens, estimate_tokens
+
+
+def turns(count, answer="Week 6 of the quarter."):
+    history = []
+    for i in range(count):
+        history.append({"role": "user", "content": f"Question {i} about the thesis form?"})
+        history.append({"role": "assistant", "content": answer})
+    return history
+
+
+def test_short_history_is_sent_verbatim():
+    history = turns(2)
+
+    messages, report = build_routing_history(history, budget=1500)
+
+    assert messages == history
+    assert report["summarized_messages"] == 0 and report["saved_tokens"] == 0
+
+
+def test_older_turns_become_a_summary_of_questions():
+    history = turns(5)
+
+    messages, report = build_routing_history(history, budget=1500)
+
+    summary, recent = messages[0], messages[1:]
+    assert summary["role"] == "system"
+    assert summary["content"].splitlines()[1:] == [
+        "- Question 0 about the thesis form?", "- Question 1 about the thesis form?"]
+    assert recent == history[-6:]
+    assert report["summarized_messages"] == 4
+
+
+def test_budget_moves_verbatim_turns_into_the_summary():
+    history = turns(3, answer="A moderately long answer about deadlines. " * 3)
+
+    messages, report = build_routing_history(history, budget=120)
+
+    assert estimate_message_tokens(messages) <= 120
+    # The verbatim window starts at a question; no room was left for a summary
+    assert messages == history[2:]
+    assert report["summarized_messages"] == 2 and report["saved_tokens"] > 0
+
+
+def test_summary_keeps_the_newest_questions_within_its_budget():
+    history = turns(10)
+
+    summary = summarize_messages(history, budget=40)
+
+    assert estimate_tokens(summary) <= 40
+    assert summary.endswith("- Question 9 about the thesis form?")
+    assert "Question 0" not in summary
+    assert summarize_messages(history, budget=5) == ""
+
+
+def test_long_assistant_answers_are_cut_to_an_excerpt():
+    answer = "Submit the proposal form by week 6.\n" + "More detail about the process. " * 40
+
+    compacted = compact_message({"role": "assistant", "content": answer})
+
+    assert compacted["content"] == (
+        "[Earlier answer omitted for brevity. It began: Submit the proposal form by week 6.]")
+    question = {"role": "user", "content": answer}
+    assert compact_message(question) == question
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+import pytest
+
+import coordinator
+
+
+def test_single_agent_turns_skip_synthesis(monkeypatch, offline):
+    with offline() as fakes:
+        question = "Can you recommend papers and datasets for my machine learning thesis?"
+        parsed = {"delegate": True, "subqueries": [{"agent": "resource_agent", "query": question}]}
+        monkeypatch.setattr(coordinator, "fast_route", lambda *args: {"parsed": parsed})
+
+        history = coordinator.process_message(question, [], user_id=1)
+
+        assert "synthesize_response" not in fakes.llm.calls
+        assert history[-1]["content"].startswith("## Recommended resources")
+
+        parsed["subqueries"].append({"agent": "forms_agent", "query": "When is the thesis form due?"})
+        coordinator.process_message(question, [], user_id=1)
+
+        assert fakes.llm.calls["synthesize_response"] == 1
+
+
+def test_streamed_turns_grow_the_reply_as_tokens_arrive(offline):
+    with offline() as fakes:
+        question = ("Which machine learning courses can I take, and when is the "
+                    "thesis proposal form due?")
+        replies = [history[-1]["content"]
+                   for history in coordinator.process_message_stream(question, [], user_id=1)]
+
+    assert fakes.llm.calls["synthesize_response"] == 1
+    assert len(replies) > 2 and replies[-1]
+    assert all(later.startswith(earlier) for earlier, later in zip(replies, replies[1:]))
+
+
+def test_passthrough_can_be_turned_off(monkeypatch):
+    responses = [("resource_agent", {"message": "## Recommended resources", "ranked": []})]
+    assert coordinator.passthrough_response(responses) == "## Recommended resources"
+
+    monkeypatch.setattr(coordinator, "SYNTHESIS_PASSTHROUGH", False)
+    assert coordinator.passthrough_response(responses) is None
+    assert coordinator.combine_responses(responses) == "## Recommended resources"
+
+
+def test_degree_answers_always_go_through_synthesis():
+    # They carry the raw profile block, which synthesis turns into prose
+    degree = [("degree_planning_agent", "Here are matching courses\n\n_STUDENT PROFILE:\n- Start Term: Fall_")]
+    assert coordinator.passthrough_response(degree) is None
+
+
+def test_routing_params_replace_agent_classifiers(monkeypatch, offline):
+    with offline(fast_routing=False) as fakes:
+        coordinator.process_message(
+            "Which machine learning courses can I take, when is the thesis form due, "
+            "and what papers should I read?", [], user_id=1)
+
+    assert fakes.llm.calls["ask_coordinator"] == 1
+    for classifier in ("classify_and_extract", "extract_relevant_tags", "analyze_query"):
+        assert classifier not in fakes.llm.calls
+
+
+def test_malformed_routing_params_fall_back_to_classifiers():
+    from deadlines_agent import match_known_tags
+    from degree_agent import parsed_from_params
+
+    assert parsed_from_params({"intent": "COURSE_ONLY", "levels": [500], "topic": "AI"}) == {
+        "intent": "COURSE_ONLY", "levels": ["500"], "topic": "AI"}
+    assert parsed_from_params({"intent": "COURSES"}) is None
+    assert parsed_from_params({"intent": "HYBRID", "levels": "500"}) is None
+    assert parsed_from_params(None) is None
+
+    assert match_known_tags(["Thesis", "parking"], ["deadlines", "thesis"]) == ["thesis"]
+    assert match_known_tags(None, ["thesis"]) == []
+
+    agent = coordinator.res_agent
+    assert agent._analysis_from_params({"is_resource_request": True}) is None
+    analysis = agent._analysis_from_params({"is_resource_request": True, "keywords": ["nlp"]})
+    assert analysis["use_online"] is True and analysis["keywords"] == ["nlp"]
+
+
+THREE_AGENTS = {"subqueries": [
+    {"agent": "forms_agent", "query": "When is the thesis form due?"},
+    {"agent": "degree_planning_agent", "query": "Which AI courses can I take?"},
+    {"agent": "resource_agent", "query": "Papers on reinforcement learning?"},
+]}
+
+
+@pytest.fixture
+def scripted_agents(monkeypatch):
+    """Replaces the agents with ones that sleep for `delays[agent]` seconds, then answer or raise."""
+    spans = {}
+
+    def install(delays, errors=()):
+        async def run_subquery(agent, query, **kwargs):
+            started = time.monotonic()
+            await asyncio.sleep(delays[agent])
+            spans[agent] = (started, time.monotonic())
+            if agent in errors:
+                raise RuntimeError(f"{agent} crashed")
+            return f"answer from {agent}"
+
+        monkeypatch.setattr(coordinator, "run_subquery_async", run_subquery)
+        return spans
+
+    return install
+
+
+def test_agents_run_concurrently(scripted_agents):
+    spans = scripted_agents({"forms_agent": 0.1, "degree_planning_agent": 0.1, "resource_agent": 0.1})
+
+    started = time.monotonic()
+    _, failed = coordinator.gather_agent_responses(THREE_AGENTS, "q")
+
+    assert failed == [] and time.monotonic() - started < 0.25
+    assert max(start for start, _ in spans.values()) < min(end for _, end in spans.values())
+
+
+def test_results_keep_subquery_order(scripted_agents):
+    scripted_agents({"forms_agent": 0.06, "degree_planning_agent": 0.03, "resource_agent": 0.0})
+
+    responses, _ = coordinator.gather_agent_responses(THREE_AGENTS, "q")
+
+    assert responses == [(sub["agent"], f"answer from {sub['agent']}") for sub in THREE_AGENTS["subqueries"]]
+
+
+def test_a_crashing_agent_does_not_sink_the_others(scripted_agents):
+    scripted_agents({"forms_agent": 0.0, "degree_planning_agent": 0.0, "resource_agent": 0.0},
+                    errors={"degree_planning_agent"})
+
+    responses, failed = coordinator.gather_agent_responses(THREE_AGENTS, "q")
+
+    assert failed == ["degree_planning_agent"]
+    assert responses[0] == ("forms_agent", "answer from forms_agent")
+    assert "an internal error occurred" in responses[1][1]
+    assert responses[2] == ("resource_agent", "answer from resource_agent")
+
+
+def test_each_agent_has_its_own_time_limit(scripted_agents, monkeypatch):
+    monkeypatch.setitem(coordinator.AGENT_TIMEOUTS, "forms_agent", 0.05)
+    scripted_agents({"forms_agent": 0.2, "degree_planning_agent": 0.1, "resource_agent": 0.1})
+
+    responses, failed = coordinator.gather_agent_responses(THREE_AGENTS, "q")
+
+    assert failed == ["forms_agent"]
+    assert "did not finish in time" in responses[0][1]
+    assert responses[1][1] == "answer from degree_planning_agent"
@@ -0,0 +1,51 @@
+import fast_router
+from fast_router import fast_route, predict, record_llm_route, RouterStats
+
+
+def test_obvious_forms_question_takes_fast_path():
+    result = fast_route("When is the graduation application due?")
+    assert result["parsed"] == {
+        "delegate": True,
+        "subqueries": [
+            {"agent": "forms_agent", "query": "When is the graduation application due?"}
+        ],
+    }
+
+
+def test_course_and_resource_questions_route_to_their_agents():
+    assert predict("What classes should I take next quarter?")["agent"] == "degree_planning_agent"
+    assert predict("Find me papers on diffusion models")["agent"] == "resource_agent"
+
+
+def test_multi_intent_question_falls_back_to_llm():
+    result = fast_route(
+        "What classes should I take and when is the graduation application due?"
+    )
+    assert result["parsed"] is None
+    assert result["confidence"] == 0.0
+
+
+def test_unroutable_question_falls_back_to_llm():
+    assert fast_route("Who should I talk to?")["parsed"] is None
+
+
+def test_follow_up_with_history_falls_back_to_llm():
+    history = [{"role": "user", "content": "What forms do I need?"}]
+    assert fast_route("When is that form due?", history)["parsed"] is None
+    assert fast_route("When is that form due?")["parsed"] is not None
+
+
+def test_agreement_is_tracked_against_llm_router(monkeypatch):
+    monkeypatch.setattr(fast_router, "stats", RouterStats())
+    prediction = {"agent": "forms_agent", "confidence": 0.95}
+
+    assert record_llm_route(
+        prediction,
+        {"delegate": True, "subqueries": [{"agent": "forms_agent", "query": "q"}]},
+    )
+    assert not record_llm_route(prediction, None)
+
+    summary = fast_router.router_stats()
+    assert summary["compared"] == 2
+    assert summary["agreement"] == 0.5
+    assert summary["agreement_by_confidence"] == {0.9: 0.5}
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import llm
+import turn_deadline
+from async_runtime import run_sync
+from fakes import FakeStream
+from turn_deadline import DeadlineExceeded, start_deadline
+
+
+def status_error(cls, status, headers=None):
+    response = httpx.Response(
+        status, headers=headers or {}, request=httpx.Request("POST", "https://example.test"))
+    return cls("error", response=response, body=None)
+
+
+def ok_response(text="ok"):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=3, completion_tokens=1))
+
+
+def chunk(text=None, usage=None):
+    choices = [] if text is None else [SimpleNamespace(delta=SimpleNamespace(content=text))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+async def chunks(*items):
+    for item in items:
+        yield item
+
+
+class FakeCompletions:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(llm.asyncio, "sleep", fake_sleep)
+
+    def install(*outcomes):
+        completions = FakeCompletions(outcomes)
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        monkeypatch.setattr(llm, "get_client", lambda: client)
+        return completions, sleeps
+
+    return install
+
+
+def test_retries_throttled_calls_honouring_retry_after(fake_client):
+    completions, sleeps = fake_client(
+        status_error(openai.RateLimitError, 429, {"retry-after": "2"}),
+        status_error(openai.InternalServerError, 503),
+        ok_response("done"),
+    )
+
+    response = run_sync(llm.chat_completion("ask_coordinator", [{"role": "user", "content": "hi"}]))
+
+    assert response.choices[0].message.content == "done"
+    assert len(completions.calls) == 3
+    assert sleeps[0] == 2
+    assert 0 <= sleeps[1] <= llm.LLM_BACKOFF_BASE * 2
+    assert completions.calls[0]["timeout"] == llm.CALL_SITE_TIMEOUTS["ask_coordinator"]
+    assert completions.calls[0]["model"] == llm.deployment
+
+
+def test_client_errors_are_not_retried(fake_client):
+    completions, sleeps = fake_client(status_error(openai.BadRequestError, 400))
+
+    with pytest.raises(openai.BadRequestError):
+        run_sync(llm.chat_completion("answer_kb_query", [{"role": "user", "content": "hi"}]))
+
+    assert len(completions.calls) == 1
+    assert sleeps == []
+
+
+def test_gives_up_after_max_retries(fake_client, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 2)
+    completions, sleeps = fake_client(
+        *[status_error(openai.RateLimitError, 429) for _ in range(3)])
+
+    with pytest.raises(openai.RateLimitError):
+        run_sync(llm.chat_completion("rank_resources", [{"role": "user", "content": "hi"}]))
+
+    assert len(completions.calls) == 3
+    assert len(sleeps) == 2
+
+
+def test_retry_after_header_formats():
+    assert llm.retry_after(status_error(openai.RateLimitError, 429, {"retry-after-ms": "250"})) == 0.25
+    assert llm.retry_after(status_error(openai.RateLimitError, 429, {"retry-after": "7"})) == 7
+    assert llm.retry_after(status_error(openai.RateLimitError, 429)) is None
+    http_date = llm.retry_after(status_error(
+        openai.RateLimitError, 429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}))
+    assert http_date == 0.0
+
+
+def test_stream_yields_text_deltas_and_closes_the_stream(fake_client):
+    usage = SimpleNamespace(prompt_tokens=3, completion_tokens=2)
+    stream = FakeStream(chunks(chunk(), chunk("Week "), chunk(""), chunk("6."), chunk(usage=usage)))
+    completions, _ = fake_client(stream)
+
+    async def collect():
+        return [d async for d in llm.stream_chat_completion("synthesize_response_stream", [])]
+
+    assert run_sync(collect()) == ["Week ", "6."]
+    assert completions.calls[0]["stream"] is True
+    assert completions.calls[0]["stream_options"] == {"include_usage": True}
+    assert stream.closed
+
+
+def test_stream_is_closed_when_the_consumer_stops_early(fake_client):
+    stream = FakeStream(chunks(*[chunk(f"word{i} ") for i in range(10)]))
+    fake_client(stream)
+
+    async def first_delta():
+        deltas = llm.stream_chat_completion("synthesize_response_stream", [])
+        first = await deltas.__anext__()
+        await deltas.aclose()
+        return first
+
+    assert run_sync(first_delta()) == "word0 "
+    assert stream.closed
+
+
+def test_stalled_stream_is_cut_off_at_the_turn_deadline(fake_client, monkeypatch):
+    monkeypatch.setattr(turn_deadline, "MIN_CALL_TIMEOUT", 0.01)
+
+    async def stalls_after_first_chunk():
+        yield chunk("Week ")
+        await asyncio.Event().wait()
+
+    stream = FakeStream(stalls_after_first_chunk())
+    fake_client(stream)
+    deltas = []
+
+    async def collect():
+        start_deadline(0.2)
+        async for delta in llm.stream_chat_completion("synthesize_response_stream", []):
+            deltas.append(delta)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        run_sync(collect())
+    assert time.monotonic() - started < 2
+    assert deltas == ["Week "]
+    assert stream.closed
@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+
+import pytest
+
+import llm_usage
+import tracing
+
+
+def response(prompt_tokens, completion_tokens):
+    return SimpleNamespace(usage=SimpleNamespace(
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+
+
+@pytest.fixture(autouse=True)
+def fresh_ledger(monkeypatch):
+    monkeypatch.setattr(llm_usage, "ledger", llm_usage.UsageLedger())
+
+
+@pytest.fixture(autouse=True)
+def no_turn():
+    # start_turn/set_agent run in the test thread's context; reset them so
+    # later tests do not inherit this test's budget, user or agent
+    tokens = [(var, var.set(None)) for var in
+              (llm_usage.current_turn, llm_usage.current_user_id, llm_usage.current_agent)]
+    yield
+    for var, token in reversed(tokens):
+        var.reset(token)
+
+
+def test_usage_is_grouped_by_call_site_agent_and_user():
+    llm_usage.start_turn(user_id=7)
+    with tracing.span("llm", call_site="ask_coordinator") as s:
+        llm_usage.record_usage(s, response(100, 20))
+    llm_usage.set_agent("degree_planning_agent")
+    for _ in range(2):
+        with tracing.span("llm", call_site="azure_json_call") as s:
+            llm_usage.record_usage(s, response(1000, 50))
+
+    by_site = {row["call_site"]: row for row in llm_usage.usage_report("call_site")}
+    assert by_site["azure_json_call"]["calls"] == 2
+    assert by_site["azure_json_call"]["prompt_tokens"] == 2000
+    assert llm_usage.usage_report("call_site")[0]["call_site"] == "azure_json_call"
+
+    by_agent = {row["agent"]: row for row in llm_usage.usage_report("agent")}
+    assert by_agent["coordinator"]["total_tokens"] == 120
+    assert by_agent["degree_planning_agent"]["total_tokens"] == 2100
+
+    [user_row] = llm_usage.usage_report("user")
+    assert user_row["user"] == "7"
+    assert user_row["cost"] > 0
+
+    with pytest.raises(ValueError):
+        llm_usage.usage_report("model")
+
+
+def test_turn_budget_trims_context_and_flags_spent_turns():
+    budget = llm_usage.start_turn(limit=10000)
+    assert llm_usage.context_allowance(3000, reserve=4000) == 3000
+    assert not llm_usage.budget_nearly_spent(4000)
+
+    with tracing.span("llm", call_site="answer_kb_query") as s:
+        llm_usage.record_usage(s, response(4500, 500))
+
+    assert budget.used == 5000
+    assert llm_usage.context_allowance(3000, reserve=4000) == 1000
+    assert llm_usage.budget_nearly_spent(6000)
+
+    with tracing.span("llm", call_site="answer_kb_query") as s:
+        llm_usage.record_usage(s, response(5000, 0))
+    assert llm_usage.context_allowance(3000, reserve=4000) == llm_usage.MIN_CONTEXT_TOKENS
+
+
+def test_no_turn_means_no_trimming():
+    assert llm_usage.remaining_turn_tokens() is None
+    assert llm_usage.context_allowance(3000, reserve=4000) == 3000
+    assert not llm_usage.budget_nearly_spent(10 ** 9)
+
+
+def test_kb_context_is_only_trimmed_under_budget_pressure(monkeypatch):
+    import degree_agent
+    from async_runtime import run_sync
+
+    entries = [{"title": f"Policy {i}", "content": "Graduate policy detail. " * 100, "tags": []}
+               for i in range(30)]
+    monkeypatch.setattr(degree_agent, "KB_CACHE", entries)
+    prompts = []
+
+    async def fake_completion(call_site, messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+    monkeypatch.setattr(degree_agent, "chat_completion", fake_completion)
+
+    async def answer(limit):
+        llm_usage.start_turn(limit=limit)
+        await degree_agent.answer_kb_query_async("What are the policies?")
+        return prompts[-1].count("### Policy")
+
+    assert run_sync(answer(llm_usage.TURN_TOKEN_BUDGET)) == 30
+    assert run_sync(answer(15000)) < 30
@@ -0,0 +1,49 @@
+from ranking_context import build_ranking_context, compress_description
+from tokens import estimate_tokens
+
+FILLER = "This sentence is about something unrelated to the question at hand. " * 12
+
+
+def candidate(i, description, title="Untitled", score=0.0):
+    return {"title": title, "description": description, "link": f"https://example.org/{i}",
+            "source": "arxiv", "tags": ["arxiv"], "score": score}
+
+
+def test_context_stays_within_budget_and_reports_savings():
+    candidates = [candidate(i, FILLER + "Graph neural networks for molecules. " + FILLER) for i in range(20)]
+
+    context, shown, stats = build_ranking_context("graph neural networks", candidates, budget=800)
+
+    assert estimate_tokens(context) <= 800
+    assert stats["tokens"] == estimate_tokens(context)
+    assert 0 < stats["shown"] < 20 and stats["dropped"] == 20 - stats["shown"]
+    assert stats["saved_tokens"] > 0
+    assert "Graph neural networks for molecules." in context
+
+
+def test_a_single_oversized_candidate_is_cut_to_the_budget():
+    candidates = [candidate(0, "Graph neural networks. " + FILLER, title="Graph neural networks " * 40)]
+
+    context, shown, stats = build_ranking_context("graph neural networks", candidates, budget=60)
+
+    assert len(shown) == 1
+    assert estimate_tokens(context) <= 60
+    assert context.startswith("[1]\nTitle: Graph neural networks")
+
+
+def test_relevant_candidates_are_kept_and_listed_first():
+    candidates = [candidate(0, "Cooking recipes.", "Pasta"),
+                  candidate(1, "A survey of reinforcement learning.", "Reinforcement Learning Survey")]
+
+    context, shown, _ = build_ranking_context("reinforcement learning survey", candidates, budget=2000)
+
+    assert shown[0]["title"] == "Reinforcement Learning Survey"
+    assert context.startswith("[1]\nTitle: Reinforcement Learning Survey")
+
+
+def test_compression_keeps_query_sentences_in_order():
+    text = "Intro words here. Transformers use attention. Unrelated closing remark. Attention scales."
+
+    compressed = compress_description(text, {"attention"}, max_tokens=14)
+
+    assert compressed == "Transformers use attention. Attention scales."
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+import rate_limit
+import scholarly_cache
+from async_runtime import run_sync
+from rate_limit import TokenBucket
+from resource_agent import ResourceAgent
+from turn_deadline import DeadlineExceeded, start_deadline
+
+
+def test_bucket_allows_burst_then_spaces_requests():
+    bucket = TokenBucket(rate=20, burst=2)
+
+    async def burst():
+        started = time.monotonic()
+        waits = [await bucket.acquire() for _ in range(4)]
+        return waits, time.monotonic() - started
+
+    waits, elapsed = run_sync(burst())
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] > 0 and waits[3] > 0
+    assert elapsed >= 0.09
+    assert bucket.stats()["acquired"] == 4
+
+
+def test_bucket_refuses_waits_past_the_deadline():
+    bucket = TokenBucket(rate=0.1, burst=1)
+
+    async def turn():
+        start_deadline(1)
+        await bucket.acquire("arxiv")
+        await bucket.acquire("arxiv")
+
+    with pytest.raises(DeadlineExceeded, match="arxiv"):
+        run_sync(turn())
+    # The refused token is returned rather than left queued
+    assert bucket.tokens > -1
+
+
+def test_providers_are_searched_concurrently(monkeypatch):
+    monkeypatch.setattr(rate_limit, "limiters", {})
+    monkeypatch.setattr(scholarly_cache, "cache", None)
+    delays = {"arxiv": 0.1, "semantic_scholar": 0.1, "google_scholar": 0.1}
+    monkeypatch.setenv("SERPAPI_API_KEY", "test")
+
+    async def download(self, url, provider=""):
+        await asyncio.sleep(delays[provider])
+        return b"<feed xmlns='http://www.w3.org/2005/Atom'/>" if provider == "arxiv" else b"{}"
+
+    monkeypatch.setattr(ResourceAgent, "_download_async", download)
+    analysis = {"arxiv_query": "rl", "semantic_scholar_query": "rl", "google_scholar_query": "rl"}
+
+    started = time.monotonic()
+    run_sync(ResourceAgent()._search_online_async(analysis))
+
+    assert time.monotonic() - started < 0.25
+    assert set(rate_limit.rate_limit_stats()) == set(delays)
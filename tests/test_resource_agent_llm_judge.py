@@ -6,7 +6,8 @@ from typing import Dict, Any
 import pytest
 from openai import AzureOpenAI
 
-from resource_agent import ResourceAgent
+import resource_agent
+from resource_agent import RESOURCE_PIPELINES, ResourceAgent
 
 pytestmark = pytest.mark.skipif(
     not os.environ.get("Azure_API_Key"),
@@ -140,6 +141,13 @@ def llm_judge(query: str, response: str, judge_prompt: str) -> Dict[str, Any]:
 # Unit tests (no judge) -------------------------------------------------------
 
 
+@pytest.fixture(params=RESOURCE_PIPELINES)
+def pipeline(request, monkeypatch):
+    # Tests of run/run_structured cover both pipelines
+    monkeypatch.setattr(resource_agent, "RESOURCE_PIPELINE", request.param)
+    return request.param
+
+
 def test_analysis_is_resource_request():
     agent = ResourceAgent()
     analysis = agent.analyze_query(
@@ -213,6 +221,7 @@ def test_ranking_does_not_hallucinate_links():
         ), f"Hallucinated link detected: {r.get('link')}"
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_run_non_resource_returns_redirect():
     agent = ResourceAgent()
     response = agent.run("What is the deadline for thesis submission?")
@@ -220,6 +229,7 @@ def test_run_non_resource_returns_redirect():
     assert "http" not in response
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_run_structured_returns_expected_shape():
     agent = ResourceAgent()
     result = agent.run_structured("Find me papers on transformer architectures.")
@@ -231,6 +241,7 @@ def test_run_structured_returns_expected_shape():
 # LLM-as-judge tests ----------------------------------------------------------
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_judge_resource_request_relevance():
     """Resource query should get relevant, well-formatted recommendations."""
     agent = ResourceAgent()
@@ -243,6 +254,7 @@ def test_judge_resource_request_relevance():
     assert verdict.get("score", 0) >= 3, f"Score too low: {verdict}"
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_judge_academic_writing_resources():
     """Query about academic writing should return relevant resources."""
     agent = ResourceAgent()
@@ -252,6 +264,7 @@ def test_judge_academic_writing_resources():
     assert verdict.get("pass") is True, verdict.get("reason", "No reason")
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_judge_non_resource_query_redirected():
     """Non-resource query should get a redirect, not fake recommendations."""
     agent = ResourceAgent()
@@ -261,6 +274,7 @@ def test_judge_non_resource_query_redirected():
     assert verdict.get("pass") is True, verdict.get("reason", "No reason")
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_judge_why_explanations_present_and_useful():
     """Each ranked resource should have a meaningful 'why' explanation."""
     agent = ResourceAgent()
@@ -277,6 +291,7 @@ def test_judge_why_explanations_present_and_useful():
         assert r.get("why"), f"Resource '{r.get('title')}' missing 'why' explanation"
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_judge_deep_learning_resources_relevant():
     """Query with specific ML topic should get topic-relevant resources."""
     agent = ResourceAgent()
@@ -286,6 +301,7 @@ def test_judge_deep_learning_resources_relevant():
     assert verdict.get("pass") is True, verdict.get("reason", "No reason")
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_judge_response_format_quality():
     """Response should be clearly formatted with markdown for chat display."""
     agent = ResourceAgent()
@@ -299,6 +315,7 @@ def test_judge_response_format_quality():
         ), "Response with resources should contain links or markdown formatting"
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_judge_accuracy_no_hallucinated_resources():
     """Resources returned should be accurate and not hallucinated."""
     agent = ResourceAgent()
@@ -309,6 +326,7 @@ def test_judge_accuracy_no_hallucinated_resources():
     assert verdict.get("score", 0) >= 3, f"Accuracy score too low: {verdict}"
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_judge_completeness_enough_resources():
     """Response to a broad resource query should cover enough ground."""
     agent = ResourceAgent()
@@ -319,6 +337,7 @@ def test_judge_completeness_enough_resources():
     assert verdict.get("score", 0) >= 3, f"Completeness score too low: {verdict}"
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_judge_specificity_targeted_query():
     """A specific query should return specific, not generic, resources."""
     agent = ResourceAgent()
@@ -330,6 +349,7 @@ def test_judge_specificity_targeted_query():
     assert verdict.get("pass") is True, verdict.get("reason", "No reason")
 
 
+@pytest.mark.usefixtures("pipeline")
 def test_judge_vague_resource_query_still_helpful():
     """Even a vague resource query should produce a helpful response."""
     agent = ResourceAgent()
@@ -0,0 +1,41 @@
+import pytest
+
+import coordinator
+from resource_agent import ResourceAgent
+from search_index import extract_query_terms
+
+
+def test_query_terms_drop_request_words_and_keep_adjacent_pairs():
+    terms, types = extract_query_terms("Recommend papers and tools for deep learning and neural networks.")
+
+    assert terms == ["deep", "learning", "neural", "networks", "deep learning", "neural networks"]
+    assert types == {"paper", "tool"}
+    assert extract_query_terms("Can you find me some papers?") == ([], {"paper"})
+
+
+@pytest.mark.parametrize("pipeline, calls", [
+    ("two_call", {"analyze_query": 1, "rank_resources": 1}),
+    ("single_call", {"select_and_rank": 1}),
+])
+def test_single_call_pipeline_saves_a_round_trip(offline, pipeline, calls):
+    with offline(resource_pipeline=pipeline) as fakes:
+        result = coordinator.res_agent.run_structured("Find me survey papers on machine learning.")
+
+    assert fakes.llm.calls == calls
+    assert result["ranked"] and all(r["link"].startswith("http") for r in result["ranked"])
+
+
+def test_single_call_pipeline_redirects_non_resource_queries(offline):
+    with offline(resource_pipeline="single_call") as fakes:
+        agent = coordinator.res_agent
+        structured = agent.run_structured("When is the thesis proposal form due?")
+        text = agent.run("When is the thesis proposal form due?")
+
+    assert fakes.llm.calls == {"select_and_rank": 2}
+    assert structured["ranked"] == [] and "Ask for resources" in structured["message"]
+    assert "http" not in text
+
+
+def test_unknown_pipeline_is_rejected():
+    with pytest.raises(ValueError):
+        ResourceAgent(pipeline="three_call")
@@ -0,0 +1,91 @@
+import coordinator
+import resource_agent
+from fakes import kb_entry
+
+
+def test_refresh_pulls_new_rows_past_the_id_cursor(offline):
+    with offline() as fakes:
+        agent = coordinator.res_agent
+        agent.ensure_loaded()
+        before = agent._snapshot
+        rows = fakes.supabase.tables["KnowledgeBase"]
+        rows.append(kb_entry(11, "Papers With Code", "Machine learning papers with code.",
+                             ["papers", "reproducibility"], "2"))
+        rows.append(kb_entry(12, "Parking Permits", "Not a research resource.", ["parking"], "4"))
+
+        assert agent.refresh() == {"added": 1, "updated": 0, "removed": 0}
+        assert agent.refresh() == {"added": 0, "updated": 0, "removed": 0}
+        found = agent.search_local_resources({"keywords": ["reproducibility"]})
+
+    # Readers holding the old snapshot keep a consistent view of it
+    assert len(before.resources) == 4 and "reproducibility" not in before.available_tags
+    assert [r["id"] for r in agent.resources_list] == [7, 8, 9, 10, 11]
+    assert "reproducibility" in agent.available_tags
+    assert [r["title"] for r in found] == ["Papers With Code"]
+    assert agent._snapshot.watermark == 11
+
+
+def test_updated_at_watermark_picks_up_edits_and_reconcile_drops_deletes(offline, monkeypatch):
+    monkeypatch.setattr(resource_agent, "RESOURCE_RECONCILE_EVERY", 2)
+    with offline() as fakes:
+        rows = fakes.supabase.tables["KnowledgeBase"]
+        for row in rows:
+            row["updated_at"] = "2026-01-01T00:00:00"
+        agent = coordinator.res_agent
+        agent.ensure_loaded()
+
+        zotero = next(r for r in rows if r["id"] == 7)
+        zotero.update(content="Reference manager with a browser connector.",
+                      updated_at="2026-02-01T00:00:00")
+        first = agent.refresh()
+        rows.remove(next(r for r in rows if r["id"] == 9))
+        second = agent.refresh()
+
+    assert first == {"added": 0, "updated": 1, "removed": 0}
+    assert second == {"added": 0, "updated": 0, "removed": 1}
+    assert agent.resources_list[0]["description"] == "Reference manager with a browser connector."
+    assert 9 not in [r["id"] for r in agent.resources_list]
+    assert agent._snapshot.watermark == "2026-02-01T00:00:00"
+
+
+def test_reconcile_reads_only_ids_from_the_configured_table(offline, monkeypatch):
+    monkeypatch.setattr(resource_agent, "RESOURCE_RECONCILE_EVERY", 2)
+    monkeypatch.setattr(resource_agent, "SUPABASE_KNOWLEDGE_TABLE", "Resources")
+    with offline() as fakes:
+        tables = fakes.supabase.tables
+        rows = tables["Resources"] = tables.pop("KnowledgeBase")
+        agent = coordinator.res_agent
+        agent.ensure_loaded()
+
+        # Without an updated_at column an edit is not visible to the id watermark
+        next(r for r in rows if r["id"] == 7)["content"] = "Reference manager with a browser connector."
+        rows.remove(next(r for r in rows if r["id"] == 9))
+        first = agent.refresh()
+        second = agent.refresh()
+
+    assert agent._sync_column == "id"
+    assert first == {"added": 0, "updated": 0, "removed": 0}
+    assert second == {"added": 0, "updated": 0, "removed": 1}
+    assert [r["id"] for r in agent.resources_list] == [7, 8, 10]
+    assert agent.resources_list[0]["description"] != "Reference manager with a browser connector."
+
+
+def test_snapshots_are_indexed_off_the_event_loop(offline, monkeypatch):
+    from async_runtime import in_runtime_thread
+
+    on_loop = []
+    index = resource_agent.ResourceIndex
+
+    def recording_index(resources):
+        on_loop.append(in_runtime_thread())
+        return index(resources)
+
+    monkeypatch.setattr(resource_agent, "ResourceIndex", recording_index)
+    with offline() as fakes:
+        agent = coordinator.res_agent
+        agent.ensure_loaded()
+        fakes.supabase.tables["KnowledgeBase"].append(
+            kb_entry(11, "Papers With Code", "Papers with code.", ["papers"], "2"))
+        agent.refresh()
+
+    assert on_loop == [False, False]
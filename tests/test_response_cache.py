@@ -0,0 +1,131 @@
+import time
+
+import coordinator
+import db
+import response_cache
+from async_runtime import run_sync
+from fakes import InMemorySupabase, kb_entry
+from ttl_cache import TTLCache
+
+
+FORMS_ROUTE = {"delegate": True, "subqueries": [{"agent": "forms_agent", "query": "q"}]}
+DEGREE_ROUTE = {
+    "delegate": True,
+    "subqueries": [{"agent": "degree_planning_agent", "query": "q"}],
+}
+PROFILE = {
+    "graduationTarget": "Spring 2026",
+    "startTerm": "Fall 2024",
+    "completedCourses": ["CSC 580", "CSC 508"],
+    "currentCourses": [],
+    "plannedCourses": None,
+}
+
+
+# TTLCache --------------------------------------------------------------------
+
+
+def test_lru_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(max_entries=4, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+# Answer keys -----------------------------------------------------------------
+
+
+def test_key_ignores_case_and_punctuation():
+    assert response_cache.answer_key(
+        "When is the graduation application due?", FORMS_ROUTE
+    ) == response_cache.answer_key("when is the  graduation application due", FORMS_ROUTE)
+
+
+def test_profile_only_affects_profile_dependent_agents():
+    assert response_cache.answer_key("q", FORMS_ROUTE, PROFILE) == response_cache.answer_key(
+        "q", FORMS_ROUTE, None
+    )
+    assert response_cache.answer_key("q", DEGREE_ROUTE, PROFILE) != response_cache.answer_key(
+        "q", DEGREE_ROUTE, None
+    )
+
+
+def test_profile_fingerprint_ignores_course_order():
+    reordered = dict(PROFILE, completedCourses=["CSC 508", "CSC 580"])
+    assert response_cache.profile_fingerprint(PROFILE) == response_cache.profile_fingerprint(
+        reordered
+    )
+    changed = dict(PROFILE, graduationTarget="Fall 2026")
+    assert response_cache.profile_fingerprint(PROFILE) != response_cache.profile_fingerprint(
+        changed
+    )
+
+
+def test_turns_with_history_are_not_cached():
+    history = [{"role": "user", "content": "When is the thesis form due?"},
+               {"role": "assistant", "content": "Week 6."}]
+
+    key = run_sync(coordinator.cache_key_for_async("what about for BMS students?", history, FORMS_ROUTE))
+
+    assert key is None
+    assert run_sync(coordinator.cache_key_for_async("what about for BMS students?", [], FORMS_ROUTE))
+
+
+# KnowledgeBase change detection ----------------------------------------------
+
+
+def test_fingerprint_hashes_rows_of_tables_without_a_version_column(monkeypatch):
+    client = InMemorySupabase(is_async=False)
+    monkeypatch.setattr(db, "supabase", client)
+    monkeypatch.setattr(response_cache, "SOURCE_PAGE_SIZE", 3)
+
+    before = response_cache.source_fingerprint()
+    assert response_cache.source_fingerprint() == before
+
+    # The last page of rows is read too
+    client.tables["KnowledgeBase"][-1]["content"] = "Edited content."
+    assert response_cache.source_fingerprint() != before
+
+
+def test_fingerprint_reads_one_row_when_tables_have_updated_at(monkeypatch):
+    client = InMemorySupabase(is_async=False)
+    monkeypatch.setattr(db, "supabase", client)
+    rows = client.tables["KnowledgeBase"]
+    for row in rows:
+        row["updated_at"] = "2026-01-01T00:00:00"
+
+    assert response_cache.table_version(client, "KnowledgeBase", "id") == [10, "2026-01-01T00:00:00"]
+    before = response_cache.source_fingerprint()
+    rows[0].update(content="Edited content.", updated_at="2026-02-01T00:00:00")
+
+    assert response_cache.source_fingerprint() != before
+    assert response_cache.table_version(client, "KnowledgeBase", "id") == [10, "2026-02-01T00:00:00"]
+
+
+def test_editing_a_source_row_drops_cached_answers(monkeypatch):
+    client = InMemorySupabase(is_async=False)
+    monkeypatch.setattr(db, "supabase", client)
+    monkeypatch.setattr(response_cache, "answer_cache", TTLCache())
+    key = response_cache.answer_key("When is the thesis form due?", FORMS_ROUTE)
+    response_cache.store_answer(key, "Week 6.")
+
+    last = response_cache.check_sources(None)
+    assert response_cache.check_sources(last) == last
+    assert response_cache.answer_cache.get(key) == "Week 6."
+
+    client.tables["KnowledgeBase"][0]["content"] = "Submit the thesis form by week 4."
+    response_cache.check_sources(last)
+
+    assert response_cache.answer_cache.get(key) is None
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+import scholarly_cache
+from async_runtime import run_sync
+from resource_agent import ResourceAgent
+from scholarly_cache import ScholarlyCache
+
+PAPER = {"title": "Attention Is All You Need", "description": "", "link": "http://arxiv.org/abs/1706.03762",
+         "tags": ["arxiv"], "source": "arxiv", "score": 0.0}
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = ScholarlyCache(str(tmp_path / "scholarly.sqlite3"))
+    monkeypatch.setattr(scholarly_cache, "cache", cache)
+    return cache
+
+
+def test_repeated_queries_are_served_from_disk(cache, monkeypatch):
+    calls = []
+
+    async def query(self, query, max_results):
+        calls.append(query)
+        return [PAPER]
+
+    monkeypatch.setattr(ResourceAgent, "_query_arxiv_async", query)
+    agent = ResourceAgent()
+
+    assert run_sync(agent.search_arxiv_async("Transformers  survey", 5)) == [PAPER]
+    assert run_sync(agent.search_arxiv_async("transformers survey", 5)) == [PAPER]
+    assert calls == ["Transformers  survey"]
+
+    # A different max_results is a different request
+    run_sync(agent.search_arxiv_async("transformers survey", 10))
+    assert len(calls) == 2
+
+    # Entries survive a restart
+    reopened = ScholarlyCache(cache.path)
+    assert reopened.get("arxiv", "TRANSFORMERS survey", 5) == ([PAPER], True)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_stale_entries_are_served_when_the_provider_fails(cache, monkeypatch):
+    cache.put("arxiv", "transformers", 5, [PAPER])
+    monkeypatch.setitem(scholarly_cache.PROVIDER_TTLS, "arxiv", 0)
+
+    async def failing(self, query, max_results):
+        raise TimeoutError("arxiv timed out")
+
+    monkeypatch.setattr(ResourceAgent, "_query_arxiv_async", failing)
+    agent = ResourceAgent()
+
+    assert run_sync(agent.search_arxiv_async("transformers", 5)) == [PAPER]
+    assert run_sync(agent.search_arxiv_async("diffusion", 5)) == []
+    assert cache.stats()["stale_served"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ScholarlyCache(str(tmp_path / "scholarly.sqlite3"), max_entries=2)
+    cache.put("arxiv", "a", 5, [PAPER])
+    time.sleep(0.01)
+    cache.put("arxiv", "b", 5, [PAPER])
+    time.sleep(0.01)
+    cache.get("arxiv", "a", 5)
+    time.sleep(0.01)
+    cache.put("arxiv", "c", 5, [PAPER])
+
+    assert len(cache) == 2
+    assert cache.get("arxiv", "b", 5) is None
+    assert cache.get("arxiv", "a", 5) is not None
+    assert cache.stats()["evictions"] == 1
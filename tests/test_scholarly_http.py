@@ -0,0 +1,45 @@
+import asyncio
+from collections import defaultdict
+
+import httpx
+
+import resource_agent
+from async_runtime import run_sync
+from resource_agent import ResourceAgent
+
+
+def test_downloads_share_one_pooled_client_with_per_host_limit(monkeypatch):
+    requests = []
+    in_flight = {"now": 0, "max": 0}
+
+    async def handler(request):
+        requests.append(request)
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        return httpx.Response(200, content=b"{}")
+
+    clients = []
+
+    def build():
+        client = resource_agent.build_http_client(transport=httpx.MockTransport(handler))
+        clients.append(client)
+        return client
+
+    monkeypatch.setattr(resource_agent, "get_http_client", resource_agent.loop_local(build))
+    monkeypatch.setattr(resource_agent, "get_host_slots", resource_agent.loop_local(
+        lambda: defaultdict(lambda: asyncio.Semaphore(2))))
+    agent = ResourceAgent()
+
+    async def burst():
+        urls = [f"https://api.semanticscholar.org/paper/{i}" for i in range(6)]
+        return await asyncio.gather(*[agent._download_async(url, "semantic_scholar") for url in urls])
+
+    assert run_sync(burst()) == [b"{}"] * 6
+    assert len(clients) == 1
+    assert in_flight["max"] == 2
+    request = requests[0]
+    assert "gzip" in request.headers["accept-encoding"]
+    assert request.extensions["timeout"]["connect"] == resource_agent.HTTP_CONNECT_TIMEOUT
+    assert request.extensions["timeout"]["read"] == resource_agent.HTTP_TIMEOUT
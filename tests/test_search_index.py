@@ -0,0 +1,40 @@
+from resource_agent import ResourceAgent
+from search_index import ResourceIndex, tokenize
+
+RESOURCES = [
+    {"title": "Zotero", "description": "Reference manager for citations.", "tags": ["writing", "citations"]},
+    {"title": "Kaggle Datasets", "description": "Public datasets for machine learning projects.",
+     "tags": ["datasets"]},
+    {"title": "Deep Learning Book", "description": "Textbook covering deep learning and machine "
+     "learning theory.", "tags": ["machine learning", "books"]},
+    {"title": "Campus HPC", "description": "GPU cluster for training models.", "tags": ["compute"]},
+]
+
+
+def test_bm25_ranks_rarer_and_tagged_matches_first():
+    index = ResourceIndex(RESOURCES)
+
+    results = index.search(["machine learning", "textbook"])
+
+    assert [r["title"] for _, r in results] == ["Deep Learning Book", "Kaggle Datasets"]
+    assert results[0][0] > results[1][0]
+
+
+def test_only_matching_entries_are_returned_up_to_k():
+    index = ResourceIndex(RESOURCES)
+
+    assert index.search(["the", "for"]) == []
+    assert index.search([]) == []
+    assert len(index.search(["datasets", "citations", "gpu"], k=2)) == 2
+    assert ResourceIndex().search(["anything"]) == []
+    assert tokenize("How to manage the Citations?") == ["manage", "citations"]
+
+
+def test_search_local_resources_uses_the_index_built_on_load():
+    agent = ResourceAgent()
+    agent.resources_list = [dict(r, url=f"https://example.org/{i}") for i, r in enumerate(RESOURCES)]
+
+    results = agent.search_local_resources({"keywords": ["gpu"], "topics": ["compute"]})
+
+    assert [r["title"] for r in results] == ["Campus HPC"]
+    assert results[0]["link"] == "https://example.org/3" and results[0]["source"] == "local"
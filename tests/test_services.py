@@ -0,0 +1,76 @@
+from datetime import date
+from types import SimpleNamespace
+
+from async_runtime import run_sync
+from services import notif, user
+from services.notif import apply_term_offset, get_current_term
+
+
+def student(**fields):
+    return {"id": 1, "status": "Graduate", "completedCourses": ["CSC 508"],
+            "currentCourses": ["CSC 566"], "plannedCourses": [],
+            "graduationTarget": None, "startTerm": None, "lastTermChecked": None, **fields}
+
+
+def test_notifications_are_created_once_and_cleared_when_stale(offline):
+    today, term = date.today(), get_current_term()
+    with offline() as fakes:
+        tables = fakes.supabase.tables
+        tables["Users"] = [student(graduationTarget=term, startTerm=term)]
+        tables["NotificationRules"] = [
+            {"id": 1, "trigger_type": "graduation_based", "term_offset": 0,
+             "message": "Apply to graduate"},
+            {"id": 2, "trigger_type": "program_start_based", "term_offset": 1,
+             "message": "Not due until next term"},
+            {"id": 3, "type": "course", "name": "CSC 580", "trigger_type": "annual_date",
+             "month": today.month, "day": today.day, "message": "Register for CSC 580"},
+            {"id": 4, "trigger_type": "status_based", "message": "Apply to the blended program"},
+        ]
+        tables["Notifications"] = [{"id": 1, "userId": 1, "ruleId": 4, "read": False}]
+
+        active = notif.generate_notifications(1)
+        assert notif.generate_notifications(1) == active
+        assert sorted(n["ruleId"] for n in active) == [1, 3]
+        assert {n["NotificationRules"]["message"] for n in active} == {
+            "Apply to graduate", "Register for CSC 580"}
+
+        # Completing the course makes its reminder stale
+        user.update_courses_in_db(1, SimpleNamespace(completed=["CSC 580"], current=[], planned=[]))
+        [remaining] = notif.generate_notifications(1)
+        notif.mark_as_read(remaining["id"])
+
+        assert remaining["ruleId"] == 1
+        assert notif.get_active_notifications(1) == []
+        assert len(tables["Notifications"]) == 1 and tables["Notifications"][0]["read_at"]
+
+
+def test_term_transition_moves_current_courses_to_completed(offline):
+    term = get_current_term()
+    with offline() as fakes:
+        users = fakes.supabase.tables["Users"] = [
+            student(), student(id=2, lastTermChecked=apply_term_offset(term, -1))]
+
+        run_sync(user.handle_term_transition_async(1))
+        run_sync(user.handle_term_transition_async(2))
+
+    assert users[0]["lastTermChecked"] == term and users[0]["currentCourses"] == ["CSC 566"]
+    assert users[1]["lastTermChecked"] == term and users[1]["currentCourses"] == []
+    assert sorted(users[1]["completedCourses"]) == ["CSC 508", "CSC 566"]
+
+
+def test_course_update_keeps_completed_and_prunes_planned(offline):
+    with offline() as fakes:
+        users = fakes.supabase.tables["Users"] = [student(plannedCourses=["CSC 580", "CSC 581"])]
+        payload = SimpleNamespace(completed=["CSC 580"], current=["CSC 587"], planned=["CSC 566"])
+
+        assert run_sync(user.update_courses_in_db_async(1, payload)) == {"status": "success"}
+
+    assert sorted(users[0]["completedCourses"]) == ["CSC 508", "CSC 580"]
+    assert users[0]["currentCourses"] == ["CSC 587"]
+    assert sorted(users[0]["plannedCourses"]) == ["CSC 566", "CSC 581"]
+
+
+def test_term_offsets_cross_year_boundaries():
+    assert apply_term_offset("Fall 2026", 2) == "Spring 2027"
+    assert apply_term_offset("Winter 2027", -1) == "Fall 2026"
+    assert notif.term_to_number("Fall 2026") < notif.term_to_number("Winter 2027")
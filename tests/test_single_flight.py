@@ -0,0 +1,139 @@
+import asyncio
+
+import llm
+import turn_deadline
+from async_runtime import run_sync
+from fakes import FakeLLMClient
+from llm_usage import ledger, start_turn
+from single_flight import SingleFlight, llm_flight
+from turn_deadline import DeadlineExceeded, start_deadline
+
+
+def test_concurrent_identical_calls_share_one_run():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return {"rows": 3}
+
+    async def burst():
+        return await asyncio.gather(*[flight.do("KnowledgeBase:4", work) for _ in range(5)])
+
+    results = run_sync(burst())
+
+    assert len(runs) == 1
+    assert all(r is results[0] for r in results)
+    assert flight.stats() == {"calls": 5, "collapsed": 4, "collapse_rate": 0.8}
+
+    # Nothing is kept once the call finishes
+    run_sync(flight.do("KnowledgeBase:4", work))
+    assert len(runs) == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert run_sync(scenario()) == ("done", True)
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("supabase down")
+
+    async def burst():
+        return await asyncio.gather(*[flight.do("k", work) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in run_sync(burst()))
+
+
+def test_identical_prompts_share_one_llm_request(monkeypatch):
+    client = FakeLLMClient(latency=0.01)
+    monkeypatch.setattr(llm, "get_client", lambda: client)
+    llm_flight.reset()
+
+    async def burst():
+        return await asyncio.gather(
+            llm.chat_completion("route", [{"role": "user", "content": "when is the form due?"}]),
+            llm.chat_completion("route", [{"role": "user", "content": "when is  the form\ndue?"}]),
+            llm.chat_completion("route", [{"role": "user", "content": "how do I graduate?"}]),
+        )
+
+    first, second, third = run_sync(burst())
+
+    assert first is second and third is not first
+    assert sum(client.calls.values()) == 2
+    assert llm_flight.stats()["collapsed"] == 1
+
+
+def test_shared_llm_request_is_bounded_and_charged_per_turn(monkeypatch):
+    client = FakeLLMClient(latency=0.2)
+    create = client.chat.completions.create
+    timeouts = []
+
+    async def recording_create(messages, **kwargs):
+        timeouts.append(kwargs["timeout"])
+        return await create(messages, **kwargs)
+
+    monkeypatch.setattr(client.chat.completions, "create", recording_create)
+    monkeypatch.setattr(llm, "get_client", lambda: client)
+    monkeypatch.setattr(turn_deadline, "MIN_CALL_TIMEOUT", 0.01)
+    ledger.clear()
+
+    async def turn(seconds):
+        budget = start_turn()
+        start_deadline(seconds)
+        try:
+            await llm.chat_completion("answer_kb_query", [{"role": "user", "content": "units?"}])
+        except DeadlineExceeded:
+            return None
+        return budget.used
+
+    async def burst():
+        # The first turn starts the request but gives up long before it ends
+        return await asyncio.gather(turn(0.05), turn(5), turn(5))
+
+    impatient, first, second = run_sync(burst())
+
+    assert impatient is None
+    assert first == second > 0
+    assert timeouts == [llm.call_site_timeout("answer_kb_query")]
+    assert ledger.report()[0]["calls"] == 1
+
+
+def test_shared_read_outlives_the_deadline_of_the_caller_that_started_it(offline, monkeypatch):
+    import db
+
+    monkeypatch.setattr(turn_deadline, "MIN_CALL_TIMEOUT", 0.01)
+
+    async def turn(seconds):
+        start_deadline(seconds)
+        try:
+            return await db.select_async("Courses", "courseNum")
+        except DeadlineExceeded:
+            return None
+
+    async def burst():
+        return await asyncio.gather(turn(0.05), turn(5))
+
+    with offline(db_latency=0.2) as fakes:
+        impatient, patient = run_sync(burst())
+
+    assert impatient is None
+    assert len(patient) == len(fakes.supabase.tables["Courses"])
+    assert fakes.supabase.queries["Courses"] == 1
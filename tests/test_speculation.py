@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+
+import coordinator
+import speculation
+from async_runtime import run_sync
+from speculation import Speculation
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(speculation, "stats", speculation.SpeculationStats())
+
+
+def prefetchers(calls, delay=0.01):
+    async def forms(user_id):
+        calls.append(("forms_agent", user_id))
+        await asyncio.sleep(delay)
+        return ["knowledge base rows"]
+
+    return {"forms_agent": forms}
+
+
+PREDICTION = {"agent": "forms_agent", "confidence": 0.0, "probability": 0.8, "reason": "multiple intents"}
+
+
+def test_prefetch_is_used_when_router_agrees():
+    calls = []
+
+    async def turn():
+        with Speculation(prefetchers(calls), user_id=3, enabled=True) as spec:
+            spec.start(PREDICTION)
+            await asyncio.sleep(0.02)  # the LLM router
+            return await spec.take("forms_agent"), await spec.take("forms_agent")
+
+    first, second = run_sync(turn())
+
+    assert first == ["knowledge base rows"]
+    assert second is None
+    assert calls == [("forms_agent", 3)]
+    stats = speculation.speculation_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 0
+    assert stats["saved_ms_total"] > 0
+
+
+def test_prefetch_is_cancelled_when_router_disagrees():
+    calls = []
+
+    async def turn():
+        with Speculation(prefetchers(calls, delay=10), enabled=True) as spec:
+            spec.start(PREDICTION)
+            await asyncio.sleep(0)
+            assert await spec.take("resource_agent") is None
+            task = spec.task
+        await asyncio.sleep(0)
+        return task
+
+    task = run_sync(turn())
+
+    assert task.cancelled()
+    stats = speculation.speculation_stats()
+    assert stats["started"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.0
+
+
+def test_no_speculation_when_disabled_unlikely_or_follow_up():
+    calls = []
+
+    async def turn(prediction, enabled=True):
+        with Speculation(prefetchers(calls), enabled=enabled) as spec:
+            spec.start(prediction)
+            return spec.task
+
+    assert run_sync(turn(PREDICTION, enabled=False)) is None
+    assert run_sync(turn(dict(PREDICTION, probability=0.1))) is None
+    assert run_sync(turn(dict(PREDICTION, reason="follow-up question"))) is None
+    assert calls == []
+
+
+def test_loads_are_reused_for_reworded_subqueries_with_params(offline, monkeypatch):
+    with offline(speculate=True, fast_routing=False) as fakes:
+        question = "When is the thesis proposal form due?"
+        parsed = {"delegate": True, "subqueries": [{
+            "agent": "forms_agent", "query": "thesis proposal form deadline",
+            "params": {"tags": ["thesis", "forms"]}}]}
+        monkeypatch.setattr(coordinator, "ask_coordinator_async", fake_router(parsed))
+
+        history = coordinator.process_message(question, [], user_id=1)
+        stats = speculation.speculation_stats()
+
+    assert stats["hits"] == 1 and stats["misses"] == 0
+    assert fakes.supabase.queries["KnowledgeBase"] == 1
+    assert "extract_relevant_tags" not in fakes.llm.calls
+    assert history[-1]["content"]
+
+
+def fake_router(parsed):
+    async def ask_coordinator_async(user_message, history):
+        return json.dumps(parsed)
+
+    return ask_coordinator_async
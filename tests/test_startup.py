@@ -0,0 +1,57 @@
+import degree_agent
+import startup
+from resource_agent import ResourceAgent
+
+
+RESOURCES = [{"id": 1, "title": "Thesis guide", "description": "", "url": "", "tags": ["Thesis"]}]
+
+
+def test_resource_agent_loads_resources_on_first_use(monkeypatch):
+    calls = []
+
+    async def fake_load(self):
+        calls.append(1)
+        return [] if len(calls) == 1 else RESOURCES
+
+    monkeypatch.setattr(ResourceAgent, "_load_resources_from_supabase_async", fake_load)
+
+    agent = ResourceAgent()
+    assert calls == []
+
+    # A failed (empty) load is retried on the next use, a good one is kept
+    assert agent.resources_list == []
+    assert agent.resources_list == RESOURCES
+    assert agent.resources_list == RESOURCES
+    assert len(calls) == 2
+    assert agent.available_tags == {"thesis"}
+
+
+def test_degree_kb_cache_loads_once(monkeypatch):
+    calls = []
+
+    async def fake_load():
+        calls.append(1)
+        return [{"title": "Thesis"}]
+
+    monkeypatch.setattr(degree_agent, "KB_CACHE", None)
+    monkeypatch.setattr(degree_agent, "load_knowledge_base_from_supabase_async", fake_load)
+
+    assert degree_agent.get_kb_cache() == [{"title": "Thesis"}]
+    assert degree_agent.get_kb_cache() == [{"title": "Thesis"}]
+    assert len(calls) == 1
+
+
+def test_warm_up_times_each_loader_and_survives_failures(monkeypatch):
+    monkeypatch.setattr(startup, "timings", [])
+    loaded = []
+
+    async def good():
+        loaded.append("good")
+
+    async def bad():
+        raise ConnectionError("offline")
+
+    startup.warm_up_in_background({"bad": bad, "good": good}).join(timeout=10)
+
+    assert loaded == ["good"]
+    assert set(startup.startup_report()["loader"]) == {"bad", "good"}
@@ -0,0 +1,100 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import tracing
+from async_runtime import run_sync
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+
+
+def read_spans(path):
+    tracing.flush()
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_spans_share_request_id_and_nest(trace_file):
+
+    async def turn():
+        with tracing.span("turn"):
+            with tracing.span("llm", call_site="ask_coordinator") as s:
+                tracing.record_usage(s, SimpleNamespace(
+                    usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5)))
+            await asyncio.gather(
+                agent("forms_agent"), agent("degree_planning_agent"))
+
+    async def agent(name):
+        with tracing.span("agent", agent=name):
+            await asyncio.sleep(0)
+
+    request_id = tracing.start_request()
+    run_sync(turn())
+
+    spans = {s["attrs"].get("call_site") or s["attrs"].get("agent") or s["name"]: s
+             for s in read_spans(trace_file)}
+    assert {s["request_id"] for s in spans.values()} == {request_id}
+    root = spans["turn"]
+    assert root["parent_id"] is None
+    for child in ("ask_coordinator", "forms_agent", "degree_planning_agent"):
+        assert spans[child]["parent_id"] == root["span_id"]
+    assert spans["ask_coordinator"]["attrs"]["prompt_tokens"] == 10
+
+
+def test_span_records_errors(trace_file):
+
+    tracing.start_request("req-1")
+    try:
+        with tracing.span("http", provider="arxiv"):
+            raise TimeoutError("slow")
+    except TimeoutError:
+        pass
+
+    [record] = read_spans(trace_file)
+    assert record["request_id"] == "req-1"
+    assert record["error"] == "TimeoutError: slow"
+
+
+def test_nothing_is_written_when_disabled(trace_file, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+
+    with tracing.span("turn"):
+        pass
+    tracing.flush()
+
+    assert not trace_file.exists()
+
+
+def test_trace_file_is_rotated_past_its_size_limit(trace_file, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_FILE_MAX_BYTES", 500)
+
+    for i in range(20):
+        with tracing.span("supabase", table="Courses", row=i):
+            pass
+
+    assert len(read_spans(trace_file)) < 20
+    rotated = trace_file.with_name("traces.jsonl.1")
+    assert rotated.exists() and rotated.stat().st_size < 1000
+
+
+def test_summarize_traces_reports_percentiles_per_stage(trace_file):
+    with open(trace_file, "w", encoding="utf-8") as f:
+        for ms in range(1, 101):
+            f.write(json.dumps({
+                "name": "llm", "duration_ms": ms,
+                "attrs": {"call_site": "synthesize_response", "completion_tokens": 1},
+            }) + "\n")
+        f.write(json.dumps({"name": "supabase", "duration_ms": 7, "attrs": {"table": "Courses"}}) + "\n")
+
+    summary = tracing.summarize_traces(str(trace_file))
+    llm = summary["llm:synthesize_response"]
+    assert llm["count"] == 100
+    assert llm["p50_ms"] == 51
+    assert llm["p95_ms"] == 95
+    assert llm["tokens"] == 100
+    assert summary["supabase:Courses"]["p95_ms"] == 7
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+
+import coordinator
+import turn_deadline
+from async_runtime import run_sync
+from turn_deadline import DeadlineExceeded, remaining_time, stage_deadline, start_deadline, time_allowance
+
+
+def test_stage_deadline_leaves_reserve_and_restores():
+    async def turn():
+        start_deadline(10)
+        with stage_deadline(reserve=4) as stage:
+            inner = time_allowance(60)
+        return stage, inner, remaining_time()
+
+    stage, inner, after = run_sync(turn())
+
+    assert 5.9 < stage <= 6 and inner <= 6
+    assert after > 9.9
+
+
+def test_no_deadline_outside_a_turn():
+    async def outside():
+        return remaining_time(), time_allowance(15)
+
+    assert run_sync(outside()) == (None, 15)
+
+
+def test_calls_are_not_started_without_time_left():
+    async def turn():
+        start_deadline(0)
+        time_allowance(15, "arxiv fetch")
+
+    with pytest.raises(DeadlineExceeded, match="arxiv fetch"):
+        run_sync(turn())
+
+
+def test_slow_agent_is_cut_off_and_synthesis_notes_it(monkeypatch, offline):
+    monkeypatch.setattr(turn_deadline, "TURN_DEADLINE_SECONDS", 2)
+    monkeypatch.setattr(coordinator, "SYNTHESIS_RESERVE_SECONDS", 1)
+    run_subquery = coordinator.run_subquery_async
+
+    async def slow_resources(agent, query, **kwargs):
+        if agent == "resource_agent":
+            await asyncio.sleep(30)
+        return await run_subquery(agent, query, **kwargs)
+
+    monkeypatch.setattr(coordinator, "run_subquery_async", slow_resources)
+    question = "What classes should I take and what research tools help with my thesis?"
+
+    with offline(llm_latency=0.001, http_latency=0.001):
+        parsed = {"delegate": True, "subqueries": [
+            {"agent": "degree_planning_agent", "query": question},
+            {"agent": "resource_agent", "query": question},
+        ]}
+        monkeypatch.setattr(coordinator, "fast_route", lambda *args: {"parsed": parsed})
+        prompts = []
+        build = coordinator.build_synthesis_messages
+        monkeypatch.setattr(coordinator, "build_synthesis_messages",
+                            lambda *args: prompts.append(build(*args)) or prompts[-1])
+
+        started = time.monotonic()
+        history = coordinator.process_message(question, [], user_id=1)
+        elapsed = time.monotonic() - started
+
+    assert elapsed < 3
+    assert history[-1]["content"]
+    synthesis_input = prompts[-1][-1]["content"]
+    assert "research resources could not be gathered in time" in synthesis_input
+    assert "did not finish in time" in synthesis_input
+
+
+def test_agent_timeout_is_the_turn_budget_minus_the_reserve(monkeypatch):
+    monkeypatch.setattr(turn_deadline, "TURN_DEADLINE_SECONDS", 1.5)
+    monkeypatch.setattr(coordinator, "SYNTHESIS_RESERVE_SECONDS", 1)
+
+    async def slow(agent, query, **kwargs):
+        await asyncio.sleep(30)
+
+    monkeypatch.setattr(coordinator, "run_subquery_async", slow)
+    parsed = {"subqueries": [{"agent": "resource_agent", "query": "papers"}]}
+
+    # Outside a turn the derived limit applies
+    started = time.monotonic()
+    _, failed = coordinator.gather_agent_responses(parsed, "papers")
+    assert failed == ["resource_agent"] and time.monotonic() - started < 1
+
+    # Inside a turn, the time actually left before the reserve applies
+    async def turn():
+        start_deadline(1.2)
+        started = time.monotonic()
+        _, failed = await coordinator.gather_agent_responses_async(parsed, "papers")
+        return failed, time.monotonic() - started
+
+    failed, elapsed = run_sync(turn())
+    assert failed == ["resource_agent"] and elapsed < 0.4
+
+
+def test_routing_gets_its_own_share_of_the_turn(monkeypatch, offline):
+    monkeypatch.setattr(coordinator, "ROUTING_TIMEOUT_SECONDS", 2)
+    seen = []
+
+    async def router(user_message, history):
+        seen.append(turn_deadline.remaining_time())
+        return "Could you tell me more about what you need?"
+
+    monkeypatch.setattr(coordinator, "ask_coordinator_async", router)
+    with offline(fast_routing=False):
+        coordinator.process_message("Hi there", [], user_id=1)
+
+    assert 0 < seen[0] <= 2
+
+
+def test_degree_agent_lets_a_missed_deadline_through(monkeypatch):
+    import degree_agent
+
+    async def out_of_time(*args, **kwargs):
+        raise DeadlineExceeded("no time left in this turn for answer_kb_query")
+
+    monkeypatch.setattr(degree_agent, "KB_CACHE", [{"title": "Units", "content": "45 units."}])
+    monkeypatch.setattr(degree_agent, "chat_completion", out_of_time)
+    monkeypatch.setattr(degree_agent, "select_async", out_of_time)
+
+    with pytest.raises(DeadlineExceeded):
+        run_sync(degree_agent.answer_kb_query_async("How many units?"))
+    with pytest.raises(DeadlineExceeded):
+        run_sync(degree_agent.load_filtered_courses_async(["500"], None))
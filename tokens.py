@@ -0,0 +1,29 @@
+import math
+from typing import List, Dict, Any
+
+# Rough token estimates for budgeting prompts before they are sent. GPT-style
+# tokenizers average about four characters of English text per token; the
+# per-message overhead covers role and formatting tokens.
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text) -> int:
+    if not text:
+        return 0
+    return math.ceil(len(str(text)) / CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(
+        estimate_tokens(m.get("content")) + MESSAGE_OVERHEAD_TOKENS for m in messages
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    text = str(text or "")
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0].rstrip() + "..."
@@ -0,0 +1,224 @@
+import contextvars
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+# Span-based latency tracing. A request id is set once per chat turn and
+# flows through contextvars into every agent, LLM call, Supabase query and
+# HTTP fetch. With TRACING_ENABLED=1, each finished span is queued and a
+# background writer appends it to TRACE_FILE as one JSON line, so the event
+# loop never touches the file. The file is rotated to TRACE_FILE.1 once it
+# passes TRACE_FILE_MAX_BYTES.
+#
+# Summarize a trace file with:
+#   python tracing.py [traces.jsonl]
+
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "0") == "1"
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+TRACE_FILE_MAX_BYTES = int(os.environ.get("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Spans waiting for the writer; past this, new spans are dropped
+TRACE_QUEUE_SIZE = 10000
+
+current_request_id = contextvars.ContextVar("current_request_id", default=None)
+current_span_id = contextvars.ContextVar("current_span_id", default=None)
+
+pending: "queue.Queue" = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+writer_lock = threading.Lock()
+writer_thread = None
+dropped = 0
+
+
+def new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def start_request(request_id: Optional[str] = None) -> str:
+    """Start a new trace for this context and return its request id."""
+    request_id = request_id or new_id()
+    current_request_id.set(request_id)
+    current_span_id.set(None)
+    return request_id
+
+
+def get_request_id() -> Optional[str]:
+    return current_request_id.get()
+
+
+def export(record: Dict[str, Any]):
+    global dropped
+    if not TRACING_ENABLED:
+        return
+    ensure_writer()
+    try:
+        pending.put_nowait((TRACE_FILE, json.dumps(record, default=str)))
+    except queue.Full:
+        dropped += 1
+
+
+def write_traces():
+    # One handle stays open per trace file; it is reopened when TRACE_FILE
+    # changes or the file is rotated
+    path, handle = None, None
+    while True:
+        target, line = pending.get()
+        try:
+            if target != path or (handle is not None and handle.tell() >= TRACE_FILE_MAX_BYTES):
+                if handle is not None:
+                    handle.close()
+                if target == path:
+                    os.replace(target, f"{target}.1")
+                path, handle = target, open(target, "a", encoding="utf-8")
+            handle.write(line + "\n")
+            if pending.empty():
+                handle.flush()
+        except OSError as e:
+            print(f"[TRACE] Could not write {target}: {e}")
+            path, handle = None, None
+        finally:
+            pending.task_done()
+
+
+def ensure_writer():
+    global writer_thread
+    if writer_thread is not None:
+        return
+    with writer_lock:
+        if writer_thread is None:
+            writer_thread = threading.Thread(target=write_traces, name="trace-writer", daemon=True)
+            writer_thread.start()
+
+
+def flush():
+    """Wait until every exported span is on disk."""
+    if writer_thread is not None:
+        pending.join()
+
+
+class Span:
+    """
+    Times a block of work. Use as a context manager in sync or async code:
+
+        with span("llm", call_site="ask_coordinator") as s:
+            response = await ...
+            s.set(completion_tokens=...)
+    """
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.span_id = new_id()
+        self.parent_id = None
+        self.request_id = None
+        self.started_at = None
+        self.started = None
+        self.token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self):
+        self.request_id = current_request_id.get()
+        self.parent_id = current_span_id.get()
+        self.token = current_span_id.set(self.span_id)
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        try:
+            current_span_id.reset(self.token)
+        except ValueError:
+            # Exited from a different context (e.g. an abandoned generator)
+            pass
+        record = {
+            "request_id": self.request_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.started_at,
+            "duration_ms": round(duration_ms, 3),
+            "attrs": self.attrs,
+        }
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        export(record)
+        return False
+
+
+def span(name: str, **attrs) -> Span:
+    return Span(name, **attrs)
+
+
+def record_usage(s: Span, response) -> Span:
+    """Copy token counts from an OpenAI response (or final stream chunk) onto a span."""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        s.set(
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+        )
+    return s
+
+
+# Summarizer ------------------------------------------------------------------
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def stage_name(record: Dict[str, Any]) -> str:
+    attrs = record.get("attrs") or {}
+    detail = attrs.get("call_site") or attrs.get("agent") or attrs.get("table") or attrs.get("provider")
+    return f"{record['name']}:{detail}" if detail else record["name"]
+
+
+def summarize_traces(path: str = TRACE_FILE) -> Dict[str, Dict[str, float]]:
+    flush()
+    durations = defaultdict(list)
+    tokens = defaultdict(int)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            stage = stage_name(record)
+            durations[stage].append(record["duration_ms"])
+            attrs = record.get("attrs") or {}
+            tokens[stage] += (attrs.get("prompt_tokens") or 0) + (attrs.get("completion_tokens") or 0)
+    return {
+        stage: {
+            "count": len(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "tokens": tokens[stage],
+        }
+        for stage, values in durations.items()
+    }
+
+
+def print_summary(path: str = TRACE_FILE):
+    summary = summarize_traces(path)
+    print(f"{'stage':<45} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'tokens':>10}")
+    for stage, row in sorted(summary.items(), key=lambda item: -item[1]["p95_ms"]):
+        print(
+            f"{stage:<45} {row['count']:>7} {row['p50_ms']:>10.1f} "
+            f"{row['p95_ms']:>10.1f} {row['tokens']:>10}")
+
+
+if __name__ == "__main__":
+    print_summary(sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE)
@@ -0,0 +1,82 @@
+import contextlib
+import contextvars
+import os
+import time
+from typing import Optional
+
+# Per-turn deadline. process_message starts one for every turn and each
+# stage runs inside a tighter scope cut from what is left: routing gets at
+# most ROUTING_TIMEOUT_SECONDS, and routing and the agents always leave time
+# for synthesis. Outbound calls (LLM, HTTP, Supabase) take their timeout
+# from the time remaining instead of a fixed value, which keeps one slow
+# agent from holding up the whole turn.
+#
+# Each agent has its own limit (coordinator.AGENT_TIMEOUTS), cut down to
+# what is left before the synthesis reserve. With no turn running (a direct
+# handle_delegation call) TURN_DEADLINE_SECONDS minus the reserve is what
+# is left.
+
+TURN_DEADLINE_SECONDS = float(os.environ.get("TURN_DEADLINE_SECONDS", "30"))
+
+# Kept back for the coordinator's synthesis call at the end of the turn
+SYNTHESIS_RESERVE_SECONDS = float(os.environ.get("SYNTHESIS_RESERVE_SECONDS", "8"))
+
+# The most routing may take, so a slow router still leaves the agents time
+ROUTING_TIMEOUT_SECONDS = float(os.environ.get("ROUTING_TIMEOUT_SECONDS", "8"))
+
+# No outbound call is started with less time than this
+MIN_CALL_TIMEOUT = 0.5
+
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised instead of starting a call the turn no longer has time for."""
+
+
+def start_deadline(seconds: Optional[float] = None) -> float:
+    """Set the deadline for the current turn. Returns it as a monotonic time."""
+    deadline = time.monotonic() + (TURN_DEADLINE_SECONDS if seconds is None else seconds)
+    current_deadline.set(deadline)
+    return deadline
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None outside a turn."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+@contextlib.contextmanager
+def stage_deadline(reserve: float = 0.0, limit: Optional[float] = None):
+    """
+    Run a stage with a tighter deadline: at most `limit` seconds, ending
+    `reserve` seconds before the enclosing deadline. Tasks created inside
+    the block inherit it.
+    """
+    now = time.monotonic()
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline = max(deadline - reserve, now)
+    if limit is not None:
+        deadline = now + limit if deadline is None else min(deadline, now + limit)
+    token = current_deadline.set(deadline)
+    try:
+        yield remaining_time()
+    finally:
+        current_deadline.reset(token)
+
+
+def time_allowance(default: Optional[float], call: str = "call") -> Optional[float]:
+    """
+    Timeout for an outbound call: the default, cut down to the time left.
+    Raises DeadlineExceeded when too little is left to be worth starting.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return default
+    if remaining < MIN_CALL_TIMEOUT:
+        raise DeadlineExceeded(f"no time left in this turn for {call}")
+    return remaining if default is None else min(default, remaining)